@@ -1,2 +1,2 @@
-from . import algorithm
 from .tools import handler, validate, parse
+from . import algorithm
\ No newline at end of file
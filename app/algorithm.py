@@ -1,3 +1,35 @@
+from .tools.cache import deterministic, memoize_answer
+from .tools.deadline import checkpoint
+from .symbolic.complexity import ComplexityError, get_limits
+from .symbolic.incremental import preview_incremental
+from .symbolic.normalize import parse_expression, parse_unevaluated
+from .symbolic.numeric import equivalent
+from .symbolic.parser import ParseError
+from .symbolic.render import render, render_options, render_text
+
+@memoize_answer
+def parse_answer(answer, params):
+    """
+    Function used to prepare the answer before any response is graded against it.
+    ---
+    The same answer and params are sent with the response of every student answering
+    a question, so any work that only depends on them (e.g. parsing the answer into
+    an expression) should be done here. The result is cached in the container and
+    reused by later requests with the same answer and params, so it must not be
+    modified by grading_function().
+    """
+
+    return parse_expression(answer) if isinstance(answer, str) else answer
+
+def preview(expression, options=()) -> dict:
+    """
+    Function used to show how a response was understood, in LaTeX and in SymPy syntax,
+    and in MathML if the render options ask for it (see `symbolic/render.py`).
+    """
+
+    return render(expression, options)
+
+@deterministic
 def grading_function(response, answer, params):
     """
     Function used to grade a student response.
@@ -17,8 +49,86 @@ def grading_function(response, answer, params):
     split into many) is entirely up to you. All that matters are the 
     return types and that grading_function() is the main function used 
     to output the grading response.
+
+    The @deterministic decorator lets the handler reuse the result for a
+    repeated response, answer and params. Remove it if the result can
+    change between calls (e.g. random sampling without a fixed seed).
+
+    A text response is parsed into a SymPy expression and returned under
+    `preview`. If it can't be parsed, `is_correct` is false and the preview
+    has the error and its position instead. With a `session` token in
+    `params`, only the part of the response edited since the last request of
+    the session is built again (see `symbolic/incremental.py`). The
+    `render` options in `params` change how the preview is written, e.g.
+    `{"mathml": true}` adds it in MathML.
+
+    With `equivalence` set to "numeric" or "symbolic" in `params`, the
+    response is also compared with the answer, and `is_correct` says whether
+    they are equal. The numeric method compares them at random points (see
+    `symbolic/numeric.py`) and only simplifies them symbolically if that is
+    inconclusive. Only text and numbers can be compared: any other response
+    or answer is rejected with an error.
+
+    Responses that would take too long to evaluate, e.g. `9^9^9^9`, are
+    rejected with an error instead (see `symbolic/complexity.py`). With
+    `mode` set to "preview" in the `complexity` params, those with too large
+    numbers get an unevaluated preview and the error under `complexity`.
     """
+    method = params.get("equivalence") if isinstance(params, dict) else None
+
+    if not isinstance(response, str):
+        if method in ("numeric", "symbolic"):
+            is_equivalent, method = equivalent(response, parse_answer(answer, params), params, method)
+
+            return {
+                "is_correct": bool(is_equivalent),
+                "method": method
+            }
+
+        return {
+            "is_correct": True
+        }
+
+    session = params.get("session") if isinstance(params, dict) else None
+    options = render_options(params)
+    limits = get_limits(params)
+
+    try:
+        if isinstance(session, str):
+            response_preview = preview_incremental(session, response, options, limits)
+        else:
+            response_preview = render_text(response, options, limits)
+    except ParseError as e:
+        return {
+            "is_correct": False,
+            "preview": {"error": str(e), "position": e.position}
+        }
+    except ComplexityError as e:
+        if limits.mode != "preview" or not e.previewable:
+            raise
+
+        # Sorting the terms of the preview would evaluate them
+        options = tuple(sorted({**dict(options), "order": "none"}.items()))
+
+        return {
+            "is_correct": False,
+            "preview": preview(parse_unevaluated(response, limits), options),
+            "complexity": e.error
+        }
+
+    checkpoint()
+
+    if method in ("numeric", "symbolic"):
+        parsed_answer = parse_answer(answer, params)
+        is_equivalent, method = equivalent(parse_expression(response, limits), parsed_answer, params, method)
+
+        return {
+            "is_correct": bool(is_equivalent),
+            "preview": response_preview,
+            "method": method
+        }
 
     return {
-        "is_correct": True
-    }
\ No newline at end of file
+        "is_correct": True,
+        "preview": response_preview
+    }
@@ -0,0 +1,114 @@
+"""
+    Cold-start benchmark for importing app.tools.handler and handling a first request.
+
+    Each sample imports the handler in a fresh interpreter and grades one request,
+    which is what a new Lambda container does before its first response. Schemas are
+    loaded on first use, so they are part of the timing. The "local" run reads the
+    schemas bundled in tools/schemas/, the "url" run fetches them over HTTP.
+
+    Usage (from the repository root):
+        python -m app.benchmarks.cold_start [--runs N] [--latency-ms MS] [--remote]
+
+    Without --remote the URL run is served by a local HTTP server that delays each
+    response by --latency-ms, so the benchmark works offline. With --remote the
+    REQUEST_SCHEMA_URL and RESPONSE_SCHEMA_URL environment variables are used as-is.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import threading
+import functools
+import http.server
+
+from ..tools import store
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); from app.tools.handler import handler; "
+    "handler({'body': {'response': 'x', 'answer': 'x'}}); "
+    "print(time.perf_counter() - start)"
+)
+
+
+class DelayedHandler(http.server.SimpleHTTPRequestHandler):
+    latency_s = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency_s)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_schemas(latency_ms):
+    """
+    Function to serve the bundled schemas over HTTP on a free local port.
+    ---
+    Returns the server, so it can be shut down, and its base URL.
+    """
+    handler = functools.partial(DelayedHandler, directory=store.SCHEMA_DIR)
+    DelayedHandler.latency_s = latency_ms / 1000
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def time_import(env, runs):
+    """
+    Function to time the first request of `runs` fresh interpreters.
+    ---
+    Returns a list of the times in milliseconds.
+    """
+    timings = []
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=REPO_ROOT, env=env, check=True, capture_output=True, text=True)
+
+        timings.append(1000 * float(output.stdout.strip().splitlines()[-1]))
+
+    return timings
+
+
+def summarise(name, timings):
+    return (f"{name:<6} runs={len(timings):<4} "
+            f"min={min(timings):8.2f}ms "
+            f"median={statistics.median(timings):8.2f}ms "
+            f"max={max(timings):8.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--remote", action="store_true")
+    args = parser.parse_args(argv)
+
+    local_env = dict(os.environ, SCHEMA_SOURCE="local")
+    url_env = dict(os.environ, SCHEMA_SOURCE="url")
+
+    server = None
+
+    if not args.remote:
+        server, base_url = serve_schemas(args.latency_ms)
+        url_env["REQUEST_SCHEMA_URL"] = f"{base_url}/request.json"
+        url_env["RESPONSE_SCHEMA_URL"] = f"{base_url}/response.json"
+
+    try:
+        print(summarise("local", time_import(local_env, args.runs)))
+        print(summarise("url", time_import(url_env, args.runs)))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+    Benchmark of the incremental preview against previewing the whole response.
+
+    For responses of increasing length, the last term is typed one character at a
+    time, and then a character is inserted in the middle of the response. Each
+    keystroke is previewed in full, as without a session, and incrementally, as with
+    a session token, so the time per keystroke can be compared. The limits on the
+    size of a response are raised, so the longest responses aren't rejected.
+
+    Usage (from the repository root):
+        python -m app.benchmarks.incremental [--terms N [N ...]]
+"""
+import math
+import time
+import argparse
+import statistics
+
+from ..symbolic.complexity import DEFAULT_LIMITS, Limits
+from ..symbolic.incremental import preview_incremental
+from ..symbolic.normalize import expression_cache
+from ..symbolic.parser import ParseError
+from ..symbolic.render import render_cache, render_text
+
+LIMITS = Limits(math.inf, math.inf, math.inf, DEFAULT_LIMITS.max_digits,
+                DEFAULT_LIMITS.max_exponent, DEFAULT_LIMITS.max_factorial)
+
+
+def keystrokes(terms):
+    """
+    Function to return the responses sent while editing a response of `terms` terms.
+    """
+    text = " + ".join(f"{i + 1}x^{i % 7}y" for i in range(terms))
+    typed = [text + " + sin(x"[:n] for n in range(1, 9)] + [text + " + sin(x)"]
+
+    middle = len(typed[-1]) // 2
+    typed.append(typed[-1][:middle] + "3" + typed[-1][middle:])
+
+    return text, typed
+
+
+def time_keystrokes(function, typed):
+    """
+    Function to return the median time per keystroke in milliseconds.
+    """
+    timings = []
+
+    for text in typed:
+        start = time.perf_counter()
+
+        try:
+            function(text)
+        except ParseError:
+            pass
+
+        timings.append(1000 * (time.perf_counter() - start))
+
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--terms", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args(argv)
+
+    print(f"{'terms':>6} {'full':>12} {'incremental':>12} {'speed-up':>9}")
+
+    for terms in args.terms:
+        text, typed = keystrokes(terms)
+
+        expression_cache.clear()
+        render_cache.clear()
+        full = time_keystrokes(lambda t: render_text(t, (), LIMITS), typed)
+
+        expression_cache.clear()
+        render_cache.clear()
+        preview_incremental(f"benchmark-{terms}", text, (), LIMITS)
+        incremental = time_keystrokes(lambda t: preview_incremental(f"benchmark-{terms}", t, (), LIMITS), typed)
+
+        print(f"{terms:>6} {full:10.3f}ms {incremental:10.3f}ms {full / incremental:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+    Benchmark of decoding and encoding request and response payloads.
+
+    Compares the standard library's json module with the backend selected by
+    tools/codec.py, for grade_batch bodies from 1 KB to 10 MB.
+
+    Usage (from the repository root):
+        python -m app.benchmarks.json_backend [--repeat R]
+"""
+import json
+import argparse
+import timeit
+
+from ..tools import codec
+
+SIZES = [1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024]
+
+
+def batch_body(size):
+    """
+    Function to build a JSON-encoded grade_batch body of about `size` bytes.
+    """
+    item = {"response": "2*x^2 + 3*sin(theta) - sqrt(y)/4", "params": {"strict": True, "n": 3}}
+    item_size = len(json.dumps(item)) + 2
+    items = [dict(item, response=f"{item['response']} + {i}") for i in range(max(1, size // item_size))]
+
+    return json.dumps({"answer": "x^2", "params": {}, "items": items})
+
+
+def best_time(function, repeat):
+    number = max(1, int(0.2 / max(timeit.timeit(function, number=1), 1e-6)))
+
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"backend: {codec.BACKEND}")
+    print(f"{'size':>10} {'json.loads':>12} {'codec.loads':>12} {'json.dumps':>12} {'codec.dumps':>12}")
+
+    for size in SIZES:
+        text = batch_body(size)
+        content = json.loads(text)
+
+        timings = [
+            best_time(lambda: json.loads(text), args.repeat),
+            best_time(lambda: codec.loads(text), args.repeat),
+            best_time(lambda: json.dumps(content).encode("utf-8"), args.repeat),
+            best_time(lambda: codec.dumps(content), args.repeat),
+        ]
+
+        print(f"{len(text):>10} " + " ".join(f"{1000 * t:10.3f}ms" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+"""
+    Load-generation benchmark of the handler's throughput.
+
+    Replays a weighted mix of events through one of the entry points:
+        - inprocess: `handler()` called directly, one event at a time.
+        - server: POSTed to the HTTP server (tools/server.py), by `--concurrency`
+            client threads with keep-alive connections. A server is started with
+            `--workers` worker processes, unless `--url` points to a running one.
+        - stream: written as NDJSON and graded by the stream grader
+            (tools/stream.py). It only grades, so only the `grade` events are sent,
+            and latency can't be measured per request. Each run starts a new pool of
+            workers, which is part of the time measured.
+
+    The events in the mix are:
+        grade: a valid request, with one of `--distinct` different responses, so the
+            caches see a realistic mix of hits and misses.
+        large: a valid request with a response of a few hundred terms, different
+            every time, so it is never served from a cache.
+        batch: a grade_batch request of 20 items.
+        malformed: a body that isn't valid JSON.
+        invalid: a body that fails the request schema.
+        healthcheck: the healthcheck command.
+
+    The report has the requests per second, latency percentiles (overall and per kind
+    of event), the memory allocated per request and the peak RSS of this process and
+    of its child processes. Allocations are measured with tracemalloc in this process
+    for `--alloc-sample` of the events, separately from the timed run, as tracing
+    slows everything down: `peak_bytes` is the most allocated while handling one
+    request, and `retained_bytes` what was still allocated after it (e.g. in caches).
+
+    Results can be saved with `--output` and compared with a previous run with
+    `--compare`, e.g. between two commits:
+        python -m app.benchmarks.load --output before.json
+        git checkout other-branch
+        python -m app.benchmarks.load --compare before.json
+
+    Usage (from the repository root):
+        python -m app.benchmarks.load [--mode inprocess|server|stream] [--requests N]
+            [--mix grade=80,large=5,...] [--concurrency C] [--workers W] [--url URL]
+            [--distinct N] [--seed S] [--warmup N] [--alloc-sample N]
+            [--output FILE] [--compare FILE]
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import datetime
+import threading
+import subprocess
+import tracemalloc
+import http.client
+import urllib.parse
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ..tools.handler import handler
+from ..tools.server import GradingServer
+from ..tools.stream import grade_stream
+
+DEFAULT_MIX = {"grade": 80, "large": 5, "batch": 5, "malformed": 4, "invalid": 5, "healthcheck": 1}
+
+PERCENTILES = (50, 90, 95, 99)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def random_response(rng) -> str:
+    """
+    Function to return a random polynomial-like response of a few terms.
+    """
+    terms = [f"{rng.randint(1, 9)}{rng.choice('xyz')}^{rng.randint(1, 4)}" for _ in range(rng.randint(1, 4))]
+
+    return " + ".join(terms + [rng.choice(["sin(x)", "sqrt(y)", "1/z", "2"])])
+
+
+def build_events(mix, count, distinct=200, seed=0) -> list:
+    """
+    Function to return `count` (kind, event) pairs drawn from the weighted `mix`.
+    ---
+    The same arguments always give the same events, so runs can be compared.
+    """
+    rng = random.Random(seed)
+    responses = [random_response(rng) for _ in range(distinct)]
+
+    def large():
+        return " + ".join(f"{rng.randint(1, 99)} x^{k}" for k in range(1, 200))
+
+    makers = {
+        "grade": lambda: {"response": rng.choice(responses), "answer": rng.choice(responses)},
+        "large": lambda: {"response": large(), "answer": "x"},
+        "batch": lambda: {"answer": rng.choice(responses),
+                          "items": [{"response": rng.choice(responses)} for _ in range(20)]},
+        "malformed": lambda: '{"response": "x", "answer": ',
+        "invalid": lambda: {"response": rng.choice(responses)},
+        "healthcheck": lambda: {},
+    }
+    commands = {"batch": "grade_batch", "healthcheck": "healthcheck"}
+
+    unknown = set(mix) - set(makers)
+
+    if unknown:
+        raise ValueError(f"Unknown kinds of event: {sorted(unknown)}, expected some of {sorted(makers)}")
+
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    events = []
+
+    for kind in kinds:
+        body = makers[kind]()
+        events.append((kind, {
+            "headers": {"command": commands.get(kind, "grade")},
+            "body": body if isinstance(body, str) else json.dumps(body)
+        }))
+
+    return events
+
+
+def parse_mix(text) -> dict:
+    """
+    Function to read a mix like "grade=80,batch=5" into a dictionary of weights.
+    """
+    mix = {}
+
+    for item in filter(None, text.split(",")):
+        kind, _, weight = item.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+
+    return mix
+
+
+def summarise(latencies) -> dict:
+    """
+    Function to return the mean, percentiles and maximum of latencies in seconds, in ms.
+    """
+    if not latencies:
+        return None
+
+    samples = sorted(latencies)
+
+    def rank(percentile):
+        return samples[min(len(samples) - 1, round(percentile / 100 * (len(samples) - 1)))]
+
+    summary = {"mean": sum(samples) / len(samples)}
+    summary.update({f"p{percentile}": rank(percentile) for percentile in PERCENTILES})
+    summary["max"] = samples[-1]
+
+    return {name: round(1000 * value, 3) for (name, value) in summary.items()}
+
+
+def run_inprocess(events, args) -> list:
+    """
+    Function to handle every event in this process, returning (kind, latency, is_error).
+    """
+    samples = []
+
+    for (kind, event) in events:
+        start = time.perf_counter()
+        response = handler(event)
+        samples.append((kind, time.perf_counter() - start, "error" in response))
+
+    return samples
+
+
+def run_server(events, args) -> list:
+    """
+    Function to POST every event to the server from `args.concurrency` client threads.
+    """
+    url = urllib.parse.urlsplit(args.url)
+    local = threading.local()
+
+    def send(item):
+        kind, event = item
+
+        if not hasattr(local, "connection"):
+            local.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=300)
+
+        start = time.perf_counter()
+        local.connection.request("POST", url.path or "/", body=event["body"].encode(), headers=event["headers"])
+        response = json.loads(local.connection.getresponse().read())
+
+        return (kind, time.perf_counter() - start, "error" in response)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        return list(pool.map(send, events))
+
+
+def run_stream(events, args) -> list:
+    """
+    Function to grade the `grade` events with the stream grader.
+    ---
+    Returns one sample for the whole run, as the grader doesn't time each request.
+    """
+    lines = b"".join(event["body"].encode() + b"\n" for (_, event) in events)
+    sink = io.BytesIO()
+
+    start = time.perf_counter()
+    graded = grade_stream(io.BytesIO(lines), sink, workers=args.workers or None)
+    elapsed = time.perf_counter() - start
+
+    errors = sum(b'"error"' in line for line in sink.getvalue().splitlines())
+
+    return [("stream", elapsed, errors, graded)]
+
+
+def measure_allocations(events) -> dict:
+    """
+    Function to handle each event under tracemalloc and return its memory use per request.
+    ---
+    Tracing is started for each request, which also works on Python 3.8 where the peak
+    can't be reset.
+    """
+    peaks, retained = [], []
+
+    if not events or tracemalloc.is_tracing():
+        return None
+
+    for (_, event) in events:
+        tracemalloc.start()
+        handler(event)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        peaks.append(peak)
+        retained.append(current)
+
+    peaks.sort()
+
+    return {
+        "requests": len(events),
+        "peak_bytes": {
+            "mean": round(sum(peaks) / len(peaks)),
+            "p50": peaks[len(peaks) // 2],
+            "p95": peaks[min(len(peaks) - 1, round(0.95 * (len(peaks) - 1)))],
+            "max": peaks[-1]
+        },
+        "retained_bytes": round(sum(retained) / len(retained))
+    }
+
+
+def peak_rss() -> dict:
+    """
+    Function to return the peak RSS in bytes of this process and of its largest finished child.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    }
+
+
+def git_commit():
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    return output.stdout.strip() or None
+
+
+def run(args) -> dict:
+    """
+    Function to run the benchmark described by the command line arguments.
+    """
+    mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX)
+    events = build_events(mix, args.warmup + args.requests, args.distinct, args.seed)
+    warmup, events = events[:args.warmup], events[args.warmup:]
+
+    if args.mode == "stream":
+        warmup = [item for item in warmup if item[0] == "grade"]
+        events = [item for item in events if item[0] == "grade"]
+
+    server = thread = None
+
+    if args.mode == "server" and args.url is None:
+        server = GradingServer(("127.0.0.1", 0), workers=args.workers or None, quiet=True)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        args.url = f"http://127.0.0.1:{server.server_port}/"
+
+    runner = {"inprocess": run_inprocess, "server": run_server, "stream": run_stream}[args.mode]
+
+    try:
+        if args.mode != "stream":
+            runner(warmup, args)
+
+        start = time.perf_counter()
+        samples = runner(events, args)
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+    rss = peak_rss()
+
+    if args.mode != "inprocess":
+        # Allocations are measured in this process, which has to be warmed up too
+        run_inprocess(warmup, args)
+
+    allocations = measure_allocations(events[:args.alloc_sample])
+
+    if args.mode == "stream":
+        (_, _, errors, graded) = samples[0]
+        latency, by_kind = None, {"grade": {"requests": graded, "errors": errors, "latency_ms": None}}
+    else:
+        latency = summarise([seconds for (_, seconds, _) in samples])
+        by_kind = {
+            kind: {
+                "requests": sum(1 for (k, _, _) in samples if k == kind),
+                "errors": sum(1 for (k, _, error) in samples if k == kind and error),
+                "latency_ms": summarise([seconds for (k, seconds, _) in samples if k == kind])
+            }
+            for kind in sorted({kind for (kind, _, _) in samples})
+        }
+
+    return {
+        "version": 1,
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "mode": args.mode, "requests": len(events), "warmup": len(warmup), "mix": mix,
+            "distinct": args.distinct, "seed": args.seed, "concurrency": args.concurrency,
+            "workers": args.workers, "url": args.url if server is None else None
+        },
+        "results": {
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(events) / elapsed, 1) if elapsed else None,
+            "latency_ms": latency,
+            "by_kind": by_kind,
+            "allocations": allocations,
+            "peak_rss_bytes": rss
+        }
+    }
+
+
+def print_report(report):
+    results = report["results"]
+    config = report["config"]
+
+    print(f"{config['mode']}: {config['requests']} requests in {results['seconds']}s, "
+          f"{results['requests_per_second']} req/s")
+
+    print(f"\n{'kind':<12} {'requests':>8} {'errors':>7} {'mean':>9} {'p50':>9} "
+          f"{'p95':>9} {'p99':>9} {'max':>9}")
+
+    rows = list(results["by_kind"].items())
+
+    if results["latency_ms"] is not None:
+        rows.append(("all", {"requests": config["requests"], "errors": sum(
+            kind["errors"] for kind in results["by_kind"].values()), "latency_ms": results["latency_ms"]}))
+
+    for (kind, row) in rows:
+        latency = row["latency_ms"] or {}
+        columns = " ".join(
+            f"{latency[name]:7.2f}ms" if name in latency else f"{'-':>9}"
+            for name in ("mean", "p50", "p95", "p99", "max"))
+
+        print(f"{kind:<12} {row['requests']:>8} {row['errors']:>7} {columns}")
+
+    allocations = results["allocations"]
+
+    if allocations is not None:
+        peak = allocations["peak_bytes"]
+        print(f"\nallocated per request: p50 {peak['p50'] / 1024:.1f}KiB, p95 {peak['p95'] / 1024:.1f}KiB, "
+              f"max {peak['max'] / 1024:.1f}KiB, retained {allocations['retained_bytes'] / 1024:.1f}KiB "
+              f"(over {allocations['requests']} requests)")
+
+    rss = results["peak_rss_bytes"]
+
+    if rss is not None:
+        print(f"peak RSS: {rss['self'] / 2 ** 20:.1f}MiB, children {rss['children'] / 2 ** 20:.1f}MiB")
+
+
+def compare(report, baseline):
+    """
+    Function to print the change of each headline number from a saved baseline.
+    """
+    def change(path):
+        values = []
+
+        for results in (baseline["results"], report["results"]):
+            for key in path:
+                results = results.get(key) if isinstance(results, dict) else None
+
+            values.append(results)
+
+        before, after = values
+
+        if not before or after is None:
+            return f"{'-':>10}"
+
+        return f"{100 * (after - before) / before:+9.1f}%"
+
+    print(f"\nchange from {baseline.get('commit') or 'baseline'} ({baseline['timestamp']}):")
+
+    for (name, path) in [
+            ("req/s", ["requests_per_second"]), ("p50", ["latency_ms", "p50"]),
+            ("p95", ["latency_ms", "p95"]), ("p99", ["latency_ms", "p99"]),
+            ("alloc p50", ["allocations", "peak_bytes", "p50"]),
+            ("peak RSS", ["peak_rss_bytes", "self"])]:
+        print(f"{name:<10} {change(path)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--mode", choices=["inprocess", "server", "stream"], default="inprocess")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--mix", default=None, help="Weights of each kind of event, e.g. grade=80,batch=5.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--url", default=None, help="URL of a running server to send requests to.")
+    parser.add_argument("--distinct", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--alloc-sample", type=int, default=200)
+    parser.add_argument("--output", default=None, help="File to save the results to, as JSON.")
+    parser.add_argument("--compare", default=None, help="Results saved by a previous run.")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
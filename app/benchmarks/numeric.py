@@ -0,0 +1,68 @@
+"""
+    Benchmark of numeric against symbolic equivalence checking.
+
+    Each response of a corpus of typical answers is compared with its answer using
+    both methods. As when grading, the answer's function is already compiled and the
+    response's isn't, so the time includes compiling one expression.
+
+    Usage (from the repository root):
+        python -m app.benchmarks.numeric [--repeat N]
+"""
+import time
+import argparse
+import statistics
+
+from ..symbolic.normalize import parse_expression
+from ..symbolic.numeric import equivalent, function_cache
+
+CORPUS = [
+    ("x^2 + 2x + 1", "(x+1)^2"), ("2 sin(x) cos(x)", "sin(2x)"), ("exp(2 log(x))", "x^2"),
+    ("(x^3 - 1)/(x - 1)", "x^2 + x + 1"), ("1/(1 + tan(x)^2)", "cos(x)^2"),
+    ("(a + b)^3", "a^3 + 3a^2 b + 3a b^2 + b^3"), ("sqrt(x) sqrt(x)", "x"),
+    ("x^2 + 2x", "(x+1)^2"), ("sin(x)^2", "1 - cos(x)^2"), ("1/(x - 1) - 1/(x + 1)", "2/(x^2 - 1)"),
+]
+
+
+def time_method(method, response, answer, repeat):
+    """
+    Function to return the median time in milliseconds to compare `response` with `answer`.
+    """
+    timings = []
+
+    for _ in range(repeat):
+        function_cache.clear()
+        equivalent(answer, answer, {}, method)
+
+        start = time.perf_counter()
+        result, used = equivalent(response, answer, {}, method)
+        timings.append(1000 * (time.perf_counter() - start))
+
+    return statistics.median(timings), result, used
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'response':>24} {'answer':>28} {'numeric':>10} {'symbolic':>10} {'result':>7}")
+    totals = {"numeric": 0.0, "symbolic": 0.0}
+
+    for (response, answer) in CORPUS:
+        expressions = parse_expression(response), parse_expression(answer)
+        numeric, result, used = time_method("numeric", *expressions, args.repeat)
+        symbolic, expected, _ = time_method("symbolic", *expressions, args.repeat)
+
+        totals["numeric"] += numeric
+        totals["symbolic"] += symbolic
+        mark = "" if result == expected else " (differs)"
+
+        print(f"{response:>24} {answer:>28} {numeric:8.3f}ms {symbolic:8.3f}ms {str(result):>7}"
+              f"{'' if used == 'numeric' else ' (symbolic)'}{mark}")
+
+    print(f"{'total':>53} {totals['numeric']:8.3f}ms {totals['symbolic']:8.3f}ms "
+          f"{totals['symbolic'] / totals['numeric']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
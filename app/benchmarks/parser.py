@@ -0,0 +1,69 @@
+"""
+    Benchmark of the throughput of the expression parser, in characters per second.
+
+    For typical short responses, long sums, deeply nested expressions, text pasted
+    with Unicode operators and Greek letters, and invalid responses (which report the
+    position of the error), the texts are tokenized alone and then parsed into trees.
+
+    Usage (from the repository root):
+        python -m app.benchmarks.parser [--number N] [--repeat R]
+"""
+import argparse
+import timeit
+
+from ..symbolic.parser import ParseError, parse, tokenize
+
+TEXTS = {
+    "short": ["2x^2 - 3x + 1", "sin(x)^2 + cos(x)^2", "(a + b)/(a - b)", "e^(i pi) + 1", "n!/(k!(n - k)!)",
+              "sqrt(x^2 + y^2)", "-b/(2a)", "3.14 r^2", "log(x, 2) - ln x", "x**3 * y**-2"],
+    "long": [" + ".join(f"{k}x^{k % 7} y" for k in range(1, 300))],
+    "nested": ["(" * 60 + "x + 1" + ")^2" * 60, "sin(" * 40 + "x" + ")" * 40],
+    "pasted": ["2πr²", "α × β ÷ √γ", "a² − b²", "µ·(ϕ + 1)³", "Σx − ∞"],
+    "invalid": ["2x +", "(x + 1", "x $ y", "sin()", "x^ 2 + (y + * z)"],
+}
+
+
+def parse_all(texts):
+    for text in texts:
+        try:
+            parse(text)
+        except ParseError:
+            pass
+
+
+def tokenize_all(texts):
+    for text in texts:
+        try:
+            tokenize(text)
+        except ParseError:
+            pass
+
+
+def throughput(function, texts, number, repeat):
+    """
+    Function to return the best throughput of `function` in millions of characters per second.
+    """
+    characters = number * sum(len(text) for text in texts)
+    best = min(timeit.repeat(lambda: function(texts), number=number, repeat=repeat))
+
+    return characters / best / 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'texts':<9} {'characters':>10} {'tokenize':>15} {'parse':>15}")
+
+    for name, texts in TEXTS.items():
+        tokens = throughput(tokenize_all, texts, args.number, args.repeat)
+        trees = throughput(parse_all, texts, args.number, args.repeat)
+        characters = sum(len(text) for text in texts)
+
+        print(f"{name:<9} {characters:>10} {tokens:>9.2f} Mch/s {trees:>9.2f} Mch/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+    Benchmark of the overhead of grading in the sandbox's worker processes.
+
+    Compares calling the grading function in-process with sending the same call to a
+    SandboxPool, for a small request and a larger one, so the cost of the round trip
+    and of pickling the arguments and result can be seen.
+
+    Usage (from the repository root):
+        python -m app.benchmarks.sandbox [--number N] [--repeat R] [--workers W]
+"""
+import argparse
+import timeit
+
+from ..algorithm import grading_function
+from ..tools.sandbox import SandboxPool
+
+REQUESTS = {
+    "small": ("x + y", "y + x", {}),
+    "large": (" + ".join(f"x_{i}" for i in range(1000)), "x", {"symbols": list(range(1000))}),
+}
+
+
+def time_per_call(function, number, repeat):
+    """
+    Function to return the best time per call in microseconds.
+    """
+    return 1e6 * min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    pool = SandboxPool(grading_function, workers=args.workers, max_requests=10 ** 9)
+
+    try:
+        print(f"{'request':<8} {'in-process':>12} {'sandbox':>12} {'overhead':>12}")
+
+        for name, (response, answer, params) in REQUESTS.items():
+            local = time_per_call(
+                lambda: grading_function(response, answer, params), args.number, args.repeat)
+            isolated = time_per_call(
+                lambda: pool.grade(response, answer, params), args.number, args.repeat)
+
+            print(f"{name:<8} {local:10.2f}us {isolated:10.2f}us {isolated - local:10.2f}us")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
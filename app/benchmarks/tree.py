@@ -0,0 +1,115 @@
+"""
+    Benchmark of the memory used by each cached expression, with tuple and interned keys.
+
+    A warm container keeps the canonical tree of each expression as the key of the
+    `expressions` cache, and its SymPy expression as the value. For batches of
+    near-identical responses, such as a class answering the same question, the
+    bytes per entry are measured with tracemalloc for the keys as trees of tuples
+    (before) and as interned nodes (after), for the SymPy values, and for the values
+    converted to nodes with `from_sympy`. The time to make a key from the text is also
+    reported, for a response whose nodes are already interned.
+
+    Usage (from the repository root):
+        python -m app.benchmarks.tree [--count N [N ...]] [--seed S]
+"""
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+
+from ..symbolic.complexity import parse_checked
+from ..symbolic.normalize import canonical, structural_key, to_sympy
+from ..symbolic.tree import from_sympy, nodes
+
+TERMS = ["x", "x^2", "x^3", "y", "x y", "sin(x)", "cos(x)", "e^x", "sqrt(x)", "(x + 1)", "ln(x)", "1"]
+
+
+def responses(count, seed):
+    """
+    Function to return `count` different responses made of the same few terms.
+    """
+    rng = random.Random(seed)
+    texts = set()
+
+    while len(texts) < count:
+        terms = [f"{rng.choice(['', '-', '2', '3', '5', '1/2 '])}{rng.choice(TERMS)}"
+                 for _ in range(rng.randint(1, 5))]
+        texts.add(" + ".join(terms))
+
+    return sorted(texts)
+
+
+def allocated(function, items):
+    """
+    Function to return the results of `function` for each item, and the bytes they hold.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+
+    results = [function(item) for item in items]
+
+    gc.collect()
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return results, end - start
+
+
+def time_per_call(function, items, repeat=5):
+    """
+    Function to return the best time per call in microseconds.
+    """
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for item in items:
+            function(item)
+
+        timings.append(time.perf_counter() - start)
+
+    return 1e6 * min(timings) / len(items)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--count", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Import SymPy and fill its caches of common numbers and names first
+    to_sympy(structural_key(" + ".join(TERMS)))
+
+    print(f"{'count':>6} {'tuple keys':>11} {'node keys':>10} {'SymPy':>8} {'as nodes':>9} "
+          f"{'before':>8} {'after':>8} {'tuple key':>10} {'node key':>9}")
+
+    for count in args.count:
+        texts = responses(count, args.seed)
+
+        tuple_time = time_per_call(lambda text: canonical(parse_checked(text)), texts)
+
+        tuple_keys, tuple_bytes = allocated(lambda text: canonical(parse_checked(text)), texts)
+        del tuple_keys
+
+        node_keys, node_bytes = allocated(structural_key, texts)
+        node_time = time_per_call(structural_key, texts)
+        expressions, sympy_bytes = allocated(to_sympy, node_keys)
+        converted, converted_bytes = allocated(from_sympy, expressions)
+
+        before, after = (tuple_bytes + sympy_bytes) / count, (node_bytes + sympy_bytes) / count
+
+        print(f"{count:>6} {tuple_bytes / count:>10.0f}B {node_bytes / count:>9.0f}B "
+              f"{sympy_bytes / count:>7.0f}B {converted_bytes / count:>8.0f}B "
+              f"{before:>7.0f}B {after:>7.0f}B {tuple_time:>8.1f}us {node_time:>7.1f}us")
+
+        del node_keys, expressions, converted
+
+    gc.collect()
+    print(f"\nInterned nodes left: {len(nodes)}")
+
+
+if __name__ == "__main__":
+    main()
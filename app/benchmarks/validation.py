@@ -0,0 +1,67 @@
+"""
+    Microbenchmark of the cost of validating one request and one response.
+
+    Compares the generic jsonschema validator against the compiled fast path in
+    tools/compiler.py, for valid bodies (which the fast path accepts on its own) and
+    invalid ones (which fall back to jsonschema for the error message). The last
+    column is the cost of accepting a valid body by its shape fingerprint instead,
+    which is how schemas the compiler doesn't support are sped up (tools/shapes.py).
+
+    Usage (from the repository root):
+        python -m app.benchmarks.validation [--number N] [--repeat R]
+"""
+import argparse
+import timeit
+
+from ..tools import validate as v
+from ..tools.shapes import analyse, fingerprint
+
+BODIES = {
+    "request/valid": (
+        v.request_validator, v.request_check,
+        {"response": "x + y", "answer": "y + x", "params": {"strict": True}}),
+    "request/invalid": (
+        v.request_validator, v.request_check,
+        {"response": "x + y", "answer": None}),
+    "response/valid": (
+        v.response_validator, v.response_check,
+        {"command": "grade", "result": {"is_correct": True, "feedback": "Well done."}}),
+    "response/invalid": (
+        v.response_validator, v.response_check,
+        {"command": "grade", "result": {"feedback": "Well done."}}),
+    "batch/valid": (
+        v.batch_response_validator, v.batch_response_check,
+        {"command": "grade_batch", "result": {"results": [
+            {"result": {"is_correct": i % 2 == 0, "feedback": "Well done."}} for i in range(20)]}}),
+}
+
+
+def time_per_call(function, number, repeat):
+    """
+    Function to return the best time per call in microseconds.
+    """
+    return 1e6 * min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--number", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'body':<18} {'jsonschema':>12} {'compiled':>12} {'speedup':>8} {'shape hit':>12}")
+
+    for name, (validator, check, body) in BODIES.items():
+        full = time_per_call(lambda: v.validate(validator, body), args.number, args.repeat)
+        fast = time_per_call(lambda: v.validate(validator, body, check), args.number, args.repeat)
+
+        shape = analyse(validator.schema)
+        accepted = {fingerprint(body, shape)} if validator.is_valid(body) else set()
+        hit = time_per_call(lambda: fingerprint(body, shape) in accepted, args.number, args.repeat)
+        hit = f"{hit:10.2f}us" if accepted else f"{'-':>12}"
+
+        print(f"{name:<18} {full:10.2f}us {fast:10.2f}us {full / fast:7.1f}x {hit}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+    Benchmark of time to first response with and without the warm-up snapshot.
+
+    Each sample starts a fresh interpreter, imports the handler (the container's init)
+    and grades one request, for a response in the snapshot, one that isn't and one
+    compared numerically with its answer. The snapshot is built first, into a
+    temporary file. Three ways of starting are compared: WARMUP=off, the default
+    WARMUP=snapshot, and WARMUP=full, which moves the rest of the warm-up into init.
+
+    Usage (from the repository root):
+        python -m app.benchmarks.warmup [--runs N]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from ..tools.snapshot import build_snapshot
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REQUESTS = {
+    "common": {"response": "x^2 + 1", "answer": "x"},
+    "uncommon": {"response": "sin(3q) + q^5", "answer": "q"},
+    "numeric": {"response": "2 sin(x) cos(x)", "answer": "sin(2x)", "params": {"equivalence": "numeric"}},
+}
+
+SNIPPET = (
+    "import sys, time; start = time.perf_counter(); from app.tools.handler import handler; "
+    "init = time.perf_counter(); handler({{'body': {body}}}); "
+    "print(init - start, time.perf_counter() - init)"
+)
+
+
+def time_first_response(env, body, runs):
+    """
+    Function to return the init and first response times of `runs` fresh interpreters, in ms.
+    """
+    samples = []
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(body=json.dumps(body))],
+            cwd=REPO_ROOT, env=env, check=True, capture_output=True, text=True)
+
+        init, first = output.stdout.split()
+        samples.append((1000 * float(init), 1000 * float(first)))
+
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "snapshot.bin")
+        size = build_snapshot(path)
+
+        print(f"snapshot: {size} bytes\n")
+        print(f"{'request':<10} {'WARMUP':<9} {'init':>10} {'first':>10} {'total':>10}")
+
+        for (name, body) in REQUESTS.items():
+            for mode in ("off", "snapshot", "full"):
+                env = dict(os.environ, WARMUP=mode, SNAPSHOT_FILE=path)
+                samples = time_first_response(env, body, args.runs)
+
+                init = statistics.median([init for (init, _) in samples])
+                first = statistics.median([first for (_, first) in samples])
+                total = statistics.median([init + first for (init, first) in samples])
+
+                print(f"{name:<10} {mode:<9} {init:8.1f}ms {first:8.1f}ms {total:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+    Symbolic expressions used to preview and grade student responses.
+"""
@@ -0,0 +1,297 @@
+"""
+    Guard against responses that would take too long to evaluate.
+
+    SymPy evaluates numbers as soon as an expression is built, so a short response
+    like `9^9^9^9` or `100000!` can take minutes and use all the memory, and deeply
+    nested ones overflow the stack of the parser. Before an expression is built, its
+    text and then the tree from `parse` are checked in one pass against limits:
+        max_length (int): characters in the response, 10000 by default.
+        max_nodes (int): nodes in the tree, 2000 by default.
+        max_depth (int): depth of the tree, 100 by default.
+        max_digits (int): digits of any number the expression evaluates, 4000 by
+            default, under the 4300 digits Python converts to text since 3.11. The
+            number of digits is estimated from the numbers written in the response,
+            so it is an upper bound.
+        max_exponent (int): exponent of a power of anything but a number, 10000 by
+            default, e.g. `x^100000`.
+        max_factorial (int): argument of a factorial, 1000 by default.
+
+    The defaults can be set with the `COMPLEXITY_MAX_...` environment variables, and
+    overridden by the `complexity` dictionary in `params`, which can also set `mode`
+    to "preview" to show an unevaluated preview of responses over the limits on
+    numbers, rather than only returning an error.
+"""
+import math
+
+from ..tools.cache import env_number
+from ..tools.errors import GradingError
+from .parser import ParseError, parse
+
+LIMITS = ("max_length", "max_nodes", "max_depth", "max_digits", "max_exponent", "max_factorial")
+
+# Limits on the size of the response, which can't be previewed either
+SIZE_LIMITS = frozenset(["max_length", "max_nodes", "max_depth"])
+
+DESCRIPTIONS = {
+    "max_length": "number of characters",
+    "max_nodes": "number of terms and operators",
+    "max_depth": "depth of nesting",
+    "max_digits": "number of digits of a number",
+    "max_exponent": "exponent of a power",
+    "max_factorial": "argument of a factorial"
+}
+
+
+class Limits:
+    __slots__ = LIMITS + ("mode",)
+
+    def __init__(self, max_length, max_nodes, max_depth, max_digits, max_exponent, max_factorial,
+                 mode="reject"):
+        self.max_length = max_length
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.max_digits = max_digits
+        self.max_exponent = max_exponent
+        self.max_factorial = max_factorial
+        self.mode = mode
+
+    def sizes(self) -> "Limits":
+        """
+        Function to return a copy of the limits that only limits the size of a response.
+        """
+        return Limits(self.max_length, self.max_nodes, self.max_depth,
+                      math.inf, math.inf, math.inf, self.mode)
+
+
+DEFAULT_LIMITS = Limits(
+    max_length=env_number("COMPLEXITY_MAX_LENGTH", 10000),
+    max_nodes=env_number("COMPLEXITY_MAX_NODES", 2000),
+    max_depth=env_number("COMPLEXITY_MAX_DEPTH", 100),
+    max_digits=env_number("COMPLEXITY_MAX_DIGITS", 4000),
+    max_exponent=env_number("COMPLEXITY_MAX_EXPONENT", 10000),
+    max_factorial=env_number("COMPLEXITY_MAX_FACTORIAL", 1000))
+
+
+class ComplexityError(GradingError):
+    """
+    Raised when a response is over one of the limits.
+    ---
+    `limit` is the name of the limit, and `value` the size estimated for the response,
+    or None if it is too large to write down.
+    """
+    def __init__(self, limit, value, maximum):
+        if value is not None and not math.isfinite(value):
+            value = None
+        elif value is not None:
+            value = round(value)
+
+        if value is None:
+            size = "too large to count"
+        else:
+            size = f"{value}" if limit in SIZE_LIMITS else f"about {value}"
+
+        super().__init__({
+            "message": "The response is too complex to grade.",
+            "description": f"The {DESCRIPTIONS[limit]} in the response is {size}, over the limit of {maximum}.",
+            "limit": limit,
+            "value": value,
+            "maximum": maximum
+        })
+        self.limit = limit
+
+    def __reduce__(self):
+        return (type(self), (self.limit, self.error["value"], self.error["maximum"]))
+
+    @property
+    def previewable(self) -> bool:
+        return self.limit not in SIZE_LIMITS
+
+
+def get_limits(params) -> Limits:
+    """
+    Function to return the limits set by the `complexity` dictionary in `params`.
+    ---
+    Limits that aren't positive integers are left at their defaults.
+    """
+    settings = params.get("complexity") if isinstance(params, dict) else None
+
+    if not isinstance(settings, dict):
+        return DEFAULT_LIMITS
+
+    values = {name: getattr(DEFAULT_LIMITS, name) for name in LIMITS}
+
+    for name in LIMITS:
+        value = settings.get(name)
+
+        if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+            values[name] = value
+
+    return Limits(**values, mode="preview" if settings.get("mode") == "preview" else "reject")
+
+
+def number_magnitude(text) -> float:
+    """
+    Function to return an upper bound on log10 of a number as written in a response.
+    """
+    mantissa, _, exponent = text.partition("e")
+    digits = mantissa.split(".")[0].lstrip("0")
+    exponent = max(float(exponent), 0.0) if exponent else 0.0
+
+    if len(digits) > 15:
+        return float(len(digits)) + exponent
+
+    return (math.log10(int(digits)) if digits else 0.0) + exponent
+
+
+def power_value(magnitude) -> float:
+    return math.inf if magnitude > 300 else 10.0 ** magnitude
+
+
+class Checker:
+    """
+    Class used to measure a tree from `parse` against the limits.
+    ---
+    `measure` returns an upper bound on log10 of the absolute value of a subtree made
+    only of numbers, which SymPy would evaluate, or None for one with names (SymPy
+    leaves powers of `pi` and `e` unevaluated too) or functions other than factorial.
+    """
+    __slots__ = ("limits", "nodes", "depth")
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.nodes = 0
+        self.depth = 0
+
+    def measure(self, tree, depth):
+        self.nodes += 1
+        self.depth = max(self.depth, depth)
+        limits = self.limits
+
+        if self.nodes > limits.max_nodes:
+            raise ComplexityError("max_nodes", self.nodes, limits.max_nodes)
+
+        if depth > limits.max_depth:
+            raise ComplexityError("max_depth", depth, limits.max_depth)
+
+        kind = tree[0]
+
+        if kind == "num":
+            magnitude = number_magnitude(tree[1])
+        elif kind == "sym":
+            return None
+        elif kind == "neg":
+            return self.measure(tree[1], depth + 1)
+        elif kind in ("add", "mul"):
+            magnitude = self.measure_operation(kind, tree[1], depth)
+        elif kind == "pow":
+            magnitude = self.measure_power(tree[1], tree[2], depth)
+        else:
+            magnitude = self.measure_function(tree[1], tree[2], depth)
+
+        if magnitude is not None and magnitude > limits.max_digits:
+            raise ComplexityError("max_digits", magnitude, limits.max_digits)
+
+        return magnitude
+
+    def measure_operation(self, kind, operands, depth):
+        magnitudes = [self.measure(operand, depth + 1) for operand in operands]
+
+        if None in magnitudes:
+            return None
+
+        if kind == "add":
+            return max(magnitudes) + math.log10(len(magnitudes))
+
+        return sum(magnitudes)
+
+    def measure_power(self, base, exponent, depth):
+        base = self.measure(base, depth + 1)
+        exponent = self.measure(exponent, depth + 1)
+
+        if exponent is None:
+            return None
+
+        if base is None:
+            if exponent > math.log10(self.limits.max_exponent):
+                raise ComplexityError("max_exponent", power_value(exponent), self.limits.max_exponent)
+
+            return None
+
+        # Powers of 0 and 1 are evaluated at once, whatever the exponent
+        return 0.0 if base == 0 else base * power_value(exponent)
+
+    def measure_function(self, name, arguments, depth):
+        arguments = [self.measure(argument, depth + 1) for argument in arguments]
+
+        if name != "factorial" or not arguments or arguments[0] is None:
+            return None
+
+        argument = power_value(arguments[0])
+
+        if arguments[0] > math.log10(self.limits.max_factorial):
+            raise ComplexityError("max_factorial", argument, self.limits.max_factorial)
+
+        return argument * math.log10(argument) if argument > 1 else 0.0
+
+
+def check_length(text, limits=DEFAULT_LIMITS):
+    if len(text) > limits.max_length:
+        raise ComplexityError("max_length", len(text), limits.max_length)
+
+
+def check_tree(tree, limits=DEFAULT_LIMITS):
+    """
+    Function to raise ComplexityError if a tree from `parse` is over the limits.
+    """
+    Checker(limits).measure(tree, 1)
+
+
+def measure_tree(tree, limits=DEFAULT_LIMITS) -> tuple:
+    """
+    Function to check a tree like `check_tree`, and return its number of nodes, its
+    depth and the magnitude from `Checker.measure`.
+    """
+    checker = Checker(limits)
+    magnitude = checker.measure(tree, 1)
+
+    return checker.nodes, checker.depth, magnitude
+
+
+def parse_checked(text, limits=DEFAULT_LIMITS):
+    """
+    Function to parse a response, raising ComplexityError if it is over the limits.
+    ---
+    Raises ParseError if the response isn't a valid expression.
+    """
+    check_length(text, limits)
+
+    try:
+        tree = parse(text)
+    except RecursionError:
+        raise ComplexityError("max_depth", None, limits.max_depth) from None
+
+    check_tree(tree, limits)
+
+    return tree
+
+
+def check_response(response, params):
+    """
+    Function to raise ComplexityError if grading would reject a response as too complex.
+    ---
+    This lets a response be turned away before it is graded, e.g. where a deadline
+    can't stop one long call into C code. Responses that aren't text or aren't valid
+    expressions are left to the grading function, as are those it previews instead.
+    """
+    if not isinstance(response, str):
+        return
+
+    limits = get_limits(params)
+
+    try:
+        parse_checked(response, limits)
+    except ParseError:
+        pass
+    except ComplexityError as e:
+        if limits.mode != "preview" or not e.previewable:
+            raise
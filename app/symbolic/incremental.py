@@ -0,0 +1,695 @@
+"""
+    Incremental preview of long expressions.
+
+    While a student types, the whole response is sent on every keystroke. When the
+    request has a `session` token in its params, the response is split into its
+    top-level terms, which are kept for the session. On the next request, only the
+    terms overlapping the edited span are parsed, checked against the complexity
+    limits and built again as SymPy expressions, and spliced in between the unchanged
+    terms of the previous response.
+
+    The session also keeps what the preview is made from, so the unchanged terms
+    aren't looked at again:
+        - running totals of the sizes of the terms, which are checked against the
+          limits of the whole response,
+        - the coefficient of each term once like terms are combined, as `Add` does,
+        - those combined terms, in the order SymPy's printers write the terms of a sum,
+          with their previews.
+    The preview is joined from the previews of the combined terms, as the printers
+    join them, so only the terms whose coefficients changed are rendered again.
+
+    The preview is the same as without a session, including the errors for invalid
+    responses and those over the complexity limits. A response SymPy adds up or
+    prints differently, with decimal or infinite coefficients or of two terms or
+    fewer, is added up and rendered whole, as is any response over the limits (to
+    find the same error). A session with a different previous response, render
+    options or limits gives the same preview, just less quickly.
+"""
+import math
+import bisect
+import threading
+from itertools import islice
+
+from ..tools.cache import LRUCache, env_number, register
+from .complexity import DEFAULT_LIMITS, LIMITS, ComplexityError, Limits, check_length, measure_tree, parse_checked
+from .normalize import canonical, key_expression
+from .parser import LETTERS, SUPERSCRIPTS, ParseError, Parser, tokenize
+from .render import render
+from .tree import intern
+
+# Characters that can end an operand, so a `+` or `-` after them is binary
+OPERAND_END = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.)!") | {
+    character for character, (kind, _) in LETTERS.items() if kind == "sym"} | {
+    chr(character) for character in SUPERSCRIPTS}
+
+# Characters of the names and numbers the tokenizer reads
+NAME_CHARACTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.")
+
+UNLIMITED = Limits(*[math.inf] * len(LIMITS))
+
+session_cache = register("sessions", LRUCache(
+    maxsize=env_number("SESSION_CACHE_SIZE", 1024),
+    ttl=env_number("SESSION_TTL", 600, float)))
+
+
+class Term:
+    """
+    Class used to keep a parsed top-level term of a response.
+    ---
+    `start` is the index of its operator, or of its text for the first term, and `end`
+    the index just after it. `expression` is the term with its sign, e.g. `-y` for the
+    term `- y`, and `parts` the (rest, coefficient) of each of the terms it adds, or
+    None if `Add` treats one of them specially (see `term_parts`). `nodes`, `depth` and
+    `numeric` are measured on its tree as part of the response, and `exact` is False
+    for a term whose tree isn't the same there, which SymPy adds up the same way.
+    """
+    __slots__ = ("sign", "start", "end", "tree", "nodes", "depth", "numeric", "exact", "expression", "parts")
+
+    def __init__(self, sign, start, end, tree):
+        self.sign = sign
+        self.start = start
+        self.end = end
+        self.tree = tree
+
+    def measure(self, limits):
+        """
+        Function to check the term against the limits, as part of the whole response.
+        ---
+        Raises ComplexityError if the term alone is over the `limits`.
+        """
+        tree = ("neg", self.tree) if self.sign == "-" else self.tree
+
+        # A term like `x2e-1` is a sum, which `parse` adds to the response's own
+        self.exact = self.tree[0] != "add"
+        self.nodes, self.depth, magnitude = measure_tree(tree, limits if self.exact else UNLIMITED)
+        self.numeric = magnitude is not None
+
+    def build(self):
+        expression = key_expression(intern(canonical(self.tree)))
+
+        self.expression = -expression if self.sign == "-" else expression
+        self.parts = term_parts(self.expression)
+        self.tree = None
+
+
+class Entry:
+    """
+    Class used to keep a term of the sum, once like terms are combined, with its previews.
+    ---
+    `first` and `rest` are the (latex, sympy, mathml) written for the term at the start
+    of the sum and after another term. Entries are ordered like the terms the printers
+    write, and `orderable` is False if SymPy can't order this one (e.g. a coefficient
+    too large for a float), for which the sum is rendered whole.
+    """
+    __slots__ = ("expression", "order", "number", "monomial", "coefficient", "orderable", "first", "rest")
+
+    def __init__(self, expression, options):
+        self.expression = expression
+        self.order = dict(options).get("order")
+        self.number = expression.is_Number
+        self.orderable = True
+
+        if self.order is None:
+            try:
+                self.monomial, self.coefficient = monomial_key(expression)
+            except (TypeError, ValueError, OverflowError):
+                self.orderable = False
+
+        self.first, self.rest = term_previews(expression, options)
+
+    def __lt__(self, other):
+        if self.order is None:
+            order = compare_monomials(self.monomial, other.monomial)
+
+            if order != 0:
+                return order < 0
+
+            if self.coefficient != other.coefficient:
+                return self.coefficient < other.coefficient
+
+        # Like the arguments of `Add`, with the number first
+        if self.number != other.number:
+            return self.number
+
+        return self.expression.compare(other.expression) < 0
+
+
+class Session:
+    __slots__ = ("response", "terms", "options", "limits", "lock", "nodes", "depths", "numeric",
+                 "inexact", "special", "coefficients", "entries", "unordered", "sorted", "previews")
+
+    def __init__(self, options, limits):
+        self.response = ""
+        self.terms = []
+        self.options = options
+        self.limits = limits
+        self.lock = threading.Lock()
+
+        # Running totals of the terms
+        self.nodes = 0
+        self.depths = {}
+        self.numeric = 0
+        self.inexact = 0
+        self.special = 0
+
+        # Coefficients and entries of the combined terms, by the rest of the term
+        self.coefficients = {}
+        self.entries = {}
+        self.unordered = set()
+
+        # Orderable entries in order, and their previews after another term
+        self.sorted = []
+        self.previews = ([], [], [])
+
+
+def limits_key(limits) -> tuple:
+    return tuple(getattr(limits, name) for name in LIMITS)
+
+
+"""
+    Splitting a response into terms.
+"""
+
+
+def exponent_sign(text, index) -> bool:
+    """
+    Function to return whether the `+` or `-` at `index` may be the sign of the exponent of a number.
+    ---
+    Such as in `2e-1`. It may also be a binary operator after a name like `x2e`, which
+    is then kept in the same term, as the term is parsed as a whole either way.
+    """
+    return (1 < index < len(text) - 1 and text[index - 1] in "eE"
+            and text[index - 2] in "0123456789." and text[index + 1] in "0123456789")
+
+
+def is_function(text, end) -> bool:
+    """
+    Function to return whether the token ending at `text[end]` is the name of a function.
+    ---
+    A `+` or `-` after it is then the sign of its argument, as in `sin -x`, which is
+    invalid, so it stays in the same term for the error to be the same.
+    """
+    start = end
+
+    while start > 0 and text[start - 1] in NAME_CHARACTERS:
+        start -= 1
+
+    try:
+        return tokenize(text[start:end + 1])[0][-2] == "fn"
+    except ParseError:
+        return False
+
+
+def split_terms(text, start=0, end=None):
+    """
+    Function to split `text[start:end]` at its top-level binary `+` and `-`.
+    ---
+    Returns a list of (sign, start, end) spans, where `sign` is "" for the first term
+    of the response and `start` is the index of the operator for the others, or None
+    if the parentheses in the span aren't balanced. A span that doesn't start at the
+    beginning of the response must start at the operator of a term.
+    """
+    end = len(text) if end is None else end
+    spans = []
+    depth = 0
+
+    if start > 0:
+        sign = previous = text[start]
+        span_start, last, start = start, start, start + 1
+    else:
+        sign = previous = ""
+        span_start = last = start
+
+    for index in range(start, end):
+        character = text[index]
+
+        if character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+
+            if depth < 0:
+                return None
+        elif character in "+-" and depth == 0 and previous in OPERAND_END and not exponent_sign(text, index) \
+                and not (previous in NAME_CHARACTERS and is_function(text, last)):
+            spans.append((sign, span_start, index))
+            sign, span_start = character, index
+
+        if not character.isspace():
+            previous, last = character, index
+
+    if depth != 0:
+        return None
+
+    spans.append((sign, span_start, end))
+
+    return spans
+
+
+def parse_terms(response, spans, limits=DEFAULT_LIMITS) -> list:
+    """
+    Function to parse the terms of `response` at `spans`.
+    ---
+    Raises ParseError with the position in the whole response if a term is invalid. As
+    for the whole response, every term is tokenized before any is parsed, so an
+    unexpected character is reported before an error in an earlier term.
+    """
+    parsers = []
+
+    for (sign, start, end) in spans:
+        text_start = start + len(sign)
+
+        try:
+            parsers.append(Parser(response[text_start:end]))
+        except ParseError as e:
+            raise ParseError(e.message, text_start + e.position)
+
+    terms = []
+
+    for parser, (sign, start, end) in zip(parsers, spans):
+        try:
+            tree = parser.parse()
+        except ParseError as e:
+            raise ParseError(e.message, start + len(sign) + e.position)
+        except RecursionError:
+            raise ComplexityError("max_depth", None, limits.max_depth) from None
+
+        terms.append(Term(sign, start, end, tree))
+
+    return terms
+
+
+def common_prefix(first, second) -> int:
+    """
+    Function to return the length of the common prefix of two strings.
+    ---
+    The prefix is found by bisection, so only O(log n) slices are compared in Python.
+    """
+    low, high = 0, min(len(first), len(second))
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if first[:middle] == second[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+def common_suffix(first, second, limit) -> int:
+    low, high = 0, min(len(first), len(second), limit)
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if first[len(first) - middle:] == second[len(second) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+def count_terms(terms, before) -> int:
+    """
+    Function to return the number of terms at the start of `terms` for which `before` is true.
+    """
+    low, high = 0, len(terms)
+
+    while low < high:
+        middle = (low + high) // 2
+
+        if before(terms[middle]):
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+
+def edited_spans(previous, response):
+    """
+    Function to return the terms of the `previous` response to replace, and the spans of their replacements.
+    ---
+    Returns the indices `first` and `last` of the terms to replace, `terms[first:last]`,
+    and the spans of `response` to parse instead. These are the terms overlapping the
+    edit, and one term on either side of it, as an edit can join or split terms at
+    their boundary.
+    """
+    old, terms = previous.response, previous.terms
+
+    if not terms:
+        return 0, 0, split_terms(response) or [("", 0, len(response))]
+
+    prefix = common_prefix(old, response)
+    suffix = common_suffix(old, response, min(len(old), len(response)) - prefix)
+    edit_start, edit_end = prefix, len(old) - suffix
+
+    first = min(count_terms(terms, lambda term: term.end < edit_start), len(terms) - 1)
+    last = min(max(first, count_terms(terms, lambda term: term.start <= edit_end)), len(terms) - 1)
+    first = max(first - 1, 0)
+
+    spans = split_terms(response, terms[first].start, terms[last].end + len(response) - len(old))
+
+    # The rest of the response is balanced, so the whole of it isn't either
+    if spans is None:
+        return 0, len(terms), [("", 0, len(response))]
+
+    return first, last + 1, spans
+
+
+"""
+    Combining like terms, as `Add` does.
+"""
+
+
+def term_parts(expression):
+    """
+    Function to return the (rest, coefficient) of each of the terms an expression adds.
+    ---
+    Like terms have the same rest, e.g. `x y` for `3 x y`, and their coefficients are
+    added up. Returns None if `Add` treats one of the terms specially, e.g. one with a
+    decimal coefficient, which depends on the order the terms are added in.
+    """
+    import sympy
+
+    parts = []
+
+    for term in sympy.Add.make_args(expression):
+        if term.is_Number:
+            coefficient, rest = term, sympy.S.One
+        elif term.is_Mul:
+            coefficient, rest = term.as_coeff_Mul()
+        else:
+            coefficient, rest = sympy.S.One, term
+
+        if not coefficient.is_Rational or term is sympy.zoo or not term.is_commutative:
+            return None
+
+        parts.append((rest, coefficient))
+
+    return parts
+
+
+def combine(rest, coefficient):
+    """
+    Function to return the term with a rest and coefficient, as `Add` makes it, or None for a zero coefficient.
+    """
+    import sympy
+
+    if coefficient.is_zero:
+        return None
+
+    if rest is sympy.S.One:
+        return coefficient
+
+    if coefficient is sympy.S.One:
+        return rest
+
+    if rest.is_Mul:
+        return rest._new_rawargs(coefficient, *rest.args)
+
+    if rest.is_Add:
+        return sympy.Mul(coefficient, rest, evaluate=False)
+
+    return sympy.Mul(coefficient, rest)
+
+
+"""
+    Ordering and previews of the terms, as SymPy's printers write a sum.
+"""
+
+
+def monomial_key(expression) -> tuple:
+    """
+    Function to return the monomial and coefficient key `Expr.as_ordered_terms` sorts a term by.
+    ---
+    The monomial is a list of (sort key, exponent) of its generators, in order.
+    """
+    from sympy import default_sort_key
+
+    [(_, ((real, imaginary), monomial, _))], generators = expression.as_terms()
+
+    return ([(default_sort_key(generator), exponent) for generator, exponent in zip(generators, monomial)],
+            ((bool(imaginary), imaginary), (real, imaginary)))
+
+
+def compare_monomials(first, second) -> int:
+    """
+    Function to compare two monomials like `Expr.as_ordered_terms`, where higher powers come first.
+    ---
+    The exponents are compared generator by generator, in the order of the generators
+    of both, where a generator only one of them has is to the power 0 in the other.
+    """
+    i = j = 0
+
+    while i < len(first) or j < len(second):
+        if j == len(second) or (i < len(first) and first[i][0] < second[j][0]):
+            exponents = first[i][1], 0
+            i += 1
+        elif i == len(first) or second[j][0] < first[i][0]:
+            exponents = 0, second[j][1]
+            j += 1
+        else:
+            exponents = first[i][1], second[j][1]
+            i += 1
+            j += 1
+
+        if exponents[0] != exponents[1]:
+            return -1 if exponents[0] > exponents[1] else 1
+
+    return 0
+
+
+def term_previews(expression, options) -> tuple:
+    """
+    Function to return the previews of a term at the start of a sum and after another term.
+    ---
+    Each is a tuple of (latex, sympy, mathml), where mathml is None unless the options
+    ask for it. A term the printers write with a minus sign after another term, such
+    as `-x`, is written as the negated term after " - ".
+    """
+    from sympy import Mod
+    from sympy.printing.precedence import PRECEDENCE, precedence
+
+    rendered = render(expression, options)
+    negative = expression.could_extract_minus_sign()
+    shown = render(-expression, options) if negative else rendered
+
+    def latex(term, text):
+        if term.is_Add or term.is_Relational or term.has(Mod):
+            return r"\left(%s\right)" % text
+
+        return text
+
+    text = rendered["sympy"]
+    sign = "-" if text.startswith("-") and not expression.is_Add else "+"
+    text = text[1:] if sign == "-" else text
+
+    if precedence(expression) < PRECEDENCE["Add"] or expression.is_Add:
+        text = f"({text})"
+
+    mathml = rendered.get("mathml")
+
+    first = (latex(expression, rendered["latex"]), text if sign == "+" else "-" + text, mathml)
+    rest = ((" - " if negative else " + ") + latex(-expression if negative else expression, shown["latex"]),
+            f" {sign} {text}",
+            None if mathml is None else ("<mo>-</mo>" if negative else "<mo>+</mo>") + shown["mathml"])
+
+    return first, rest
+
+
+"""
+    Sessions.
+"""
+
+
+def check_totals(session, response, limits, removed, added):
+    """
+    Function to check the response against the limits from the totals of its terms.
+    ---
+    Whenever the totals aren't enough to tell, or the response is over a limit, the
+    whole response is checked, which raises the same error as without a session.
+    """
+    count = len(session.terms) - len(removed) + len(added)
+    nodes = session.nodes + sum(term.nodes for term in added) - sum(term.nodes for term in removed)
+    numeric = session.numeric + sum(term.numeric for term in added) - sum(term.numeric for term in removed)
+    inexact = session.inexact + sum(not term.exact for term in added) - sum(not term.exact for term in removed)
+
+    depths = dict(session.depths)
+    count_depths(depths, removed, -1)
+    count_depths(depths, added, 1)
+
+    # The terms of a sum are one level deeper in its tree, under one more node
+    extra = 1 if count > 1 else 0
+
+    if inexact or (extra and numeric == count) or nodes + extra > limits.max_nodes \
+            or max(depths, default=0) + extra > limits.max_depth:
+        parse_checked(response, limits)
+
+
+def count_depths(depths, terms, change):
+    for term in terms:
+        depths[term.depth] = depths.get(term.depth, 0) + change
+
+        if depths[term.depth] == 0:
+            del depths[term.depth]
+
+
+def changed_entries(session, removed, added) -> dict:
+    """
+    Function to return the new coefficient and entry of each rest whose coefficient changes.
+    """
+    import sympy
+
+    changes = {}
+
+    for terms, sign in ((removed, -1), (added, 1)):
+        for term in terms:
+            for (rest, coefficient) in term.parts or ():
+                changes[rest] = changes.get(rest, sympy.S.Zero) + sign * coefficient
+
+    entries = {}
+
+    for rest, change in changes.items():
+        if change != 0:
+            coefficient = session.coefficients.get(rest, sympy.S.Zero) + change
+            expression = combine(rest, coefficient)
+            entries[rest] = (coefficient, None if expression is None else Entry(expression, session.options))
+
+    return entries
+
+
+def update_session(session, response, first, last, added, entries):
+    """
+    Function to splice the new terms and entries into a session.
+    ---
+    This only changes Python lists and dictionaries, so it can't fail halfway.
+    """
+    terms = session.terms
+    removed = terms[first:last]
+    offset = len(response) - len(session.response)
+
+    for term in terms[last:]:
+        term.start += offset
+        term.end += offset
+
+    terms[first:last] = added
+    session.response = response
+
+    session.nodes += sum(term.nodes for term in added) - sum(term.nodes for term in removed)
+    session.numeric += sum(term.numeric for term in added) - sum(term.numeric for term in removed)
+    session.inexact += sum(not term.exact for term in added) - sum(not term.exact for term in removed)
+    session.special += sum(term.parts is None for term in added) - sum(term.parts is None for term in removed)
+    count_depths(session.depths, removed, -1)
+    count_depths(session.depths, added, 1)
+
+    for rest, (coefficient, entry) in entries.items():
+        remove_entry(session, session.entries.pop(rest, None))
+
+        if entry is None:
+            session.coefficients.pop(rest, None)
+        else:
+            session.coefficients[rest] = coefficient
+            session.entries[rest] = entry
+            add_entry(session, entry)
+
+
+def add_entry(session, entry):
+    if not entry.orderable:
+        session.unordered.add(entry)
+        return
+
+    index = bisect.bisect_right(session.sorted, entry)
+    session.sorted.insert(index, entry)
+
+    for previews, preview in zip(session.previews, entry.rest):
+        previews.insert(index, preview)
+
+
+def remove_entry(session, entry):
+    if entry is None:
+        return
+
+    if not entry.orderable:
+        session.unordered.discard(entry)
+        return
+
+    index = bisect.bisect_left(session.sorted, entry)
+
+    while session.sorted[index] is not entry:
+        index += 1
+
+    del session.sorted[index]
+
+    for previews in session.previews:
+        del previews[index]
+
+
+def session_preview(session) -> dict:
+    """
+    Function to return the preview of the response of a session.
+    """
+    import sympy
+
+    entries = session.sorted
+
+    if session.special or session.unordered:
+        return render(sympy.Add(*[term.expression for term in session.terms]), session.options)
+
+    if len(entries) <= 2:
+        # SymPy orders a sum like `1 - x` of two terms specially
+        return render(sympy.Add(*[entry.expression for entry in entries]), session.options)
+
+    latex, text, mathml = session.previews
+    first = entries[0].first
+    preview = {
+        "latex": first[0] + "".join(islice(latex, 1, None)),
+        "sympy": first[1] + "".join(islice(text, 1, None))
+    }
+
+    if first[2] is not None:
+        preview["mathml"] = "<mrow>" + first[2] + "".join(islice(mathml, 1, None)) + "</mrow>"
+
+    return preview
+
+
+def preview_incremental(session, response, options=(), limits=DEFAULT_LIMITS) -> dict:
+    """
+    Function to preview a response, reusing the terms parsed for the same session.
+    ---
+    Returns the same dictionary as `render.render_text`, with `latex` and `sympy` (and
+    `mathml` if the render options from `render_options` ask for it), or raises
+    ParseError or ComplexityError like it.
+    """
+    check_length(response, limits)
+
+    state = session_cache.get(session)
+
+    if state is None or state.options != options or state.limits != limits_key(limits):
+        state = Session(options, limits_key(limits))
+
+    with state.lock:
+        first, last, spans = edited_spans(state, response)
+        added = parse_terms(response, spans, limits)
+
+        try:
+            for term in added:
+                term.measure(limits)
+        except ComplexityError:
+            # Some error is raised for the whole response, which may be another
+            parse_checked(response, limits)
+            raise
+
+        check_totals(state, response, limits, state.terms[first:last], added)
+
+        for term in added:
+            term.build()
+
+        entries = changed_entries(state, state.terms[first:last], added)
+        update_session(state, response, first, last, added, entries)
+        session_cache.put(session, state)
+
+        return session_preview(state)
@@ -0,0 +1,164 @@
+"""
+    Canonical forms of parsed expressions, and a cache of their SymPy expressions.
+
+    Expressions that only differ in whitespace, redundant parentheses, the order of
+    the terms of a sum or the factors of a product, or how those are grouped, like
+    `x+y` and `(y) + x`, have the same canonical tree. The tree is interned as a
+    `Node` (see `tree.py`), so the keys share their identical subtrees and compare by
+    identity, and is used as the key of `expression_cache`, which keeps the SymPy
+    expressions built from the most recently used trees.
+
+    Sums and products are only reordered and regrouped when the expression has no
+    decimal numbers, since floating point addition and multiplication aren't
+    associative: `(0.1 + 0.2) + 0.3` and `0.1 + (0.2 + 0.3)` keep different keys.
+    Every other change leaves the SymPy expression the same, because SymPy sorts and
+    flattens the arguments of `Add` and `Mul` itself.
+
+    Responses are checked against the limits of `complexity` before they are built.
+"""
+import sys
+
+from ..tools.cache import LRUCache, env_number, register
+from .complexity import DEFAULT_LIMITS, parse_checked
+from .tree import Node, intern
+from .tree import to_sympy as build
+
+expression_cache = register("expressions", LRUCache(
+    maxsize=env_number("EXPRESSION_CACHE_SIZE", 1024),
+    maxbytes=env_number("EXPRESSION_CACHE_BYTES", 8 * 1024 * 1024)))
+
+
+def has_decimals(tree) -> bool:
+    kind = tree[0]
+
+    if kind == "num":
+        return "." in tree[1] or "e" in tree[1]
+
+    if kind == "sym":
+        return False
+
+    return any(has_decimals(child) for child in children(tree))
+
+
+def children(tree) -> tuple:
+    kind = tree[0]
+
+    if kind in ("add", "mul"):
+        return tree[1]
+
+    if kind == "neg":
+        return (tree[1],)
+
+    if kind == "pow":
+        return (tree[1], tree[2])
+
+    if kind == "call":
+        return tree[2]
+
+    return ()
+
+
+def canonical(tree, reorder=None):
+    """
+    Function to return the canonical form of a tree from `parse`.
+    ---
+    Nested sums and products are flattened, and their operands sorted, unless
+    `reorder` is False or the tree has decimal numbers.
+    """
+    if reorder is None:
+        reorder = not has_decimals(tree)
+
+    kind = tree[0]
+
+    if kind in ("num", "sym"):
+        return tree
+
+    if kind == "neg":
+        return ("neg", canonical(tree[1], reorder))
+
+    if kind == "pow":
+        return ("pow", canonical(tree[1], reorder), canonical(tree[2], reorder))
+
+    if kind == "call":
+        return ("call", tree[1], tuple(canonical(a, reorder) for a in tree[2]))
+
+    operands = [canonical(operand, reorder) for operand in tree[1]]
+
+    if reorder:
+        flattened = []
+
+        for operand in operands:
+            if operand[0] == kind:
+                flattened.extend(operand[1])
+            else:
+                flattened.append(operand)
+
+        operands = sorted(flattened)
+
+    return (kind, tuple(operands))
+
+
+def structural_key(text: str, limits=DEFAULT_LIMITS):
+    """
+    Function to return the key shared by every way of writing the same expression.
+    ---
+    The key is the interned node of the canonical tree. Raises ComplexityError if the
+    text is over the `limits`.
+    """
+    return intern(canonical(parse_checked(text, limits)))
+
+
+def to_sympy(tree, evaluate=True):
+    """
+    Function to build the SymPy expression for a tree from `parse`, or a node.
+    ---
+    With `evaluate` False, the expression is kept as written, e.g. `2^100` isn't
+    worked out.
+    """
+    return build(tree if isinstance(tree, Node) else intern(tree), evaluate)
+
+
+def parse_unevaluated(text: str, limits=DEFAULT_LIMITS):
+    """
+    Function to parse an expression into a SymPy expression without evaluating it.
+    ---
+    Only the size of the text is checked against the `limits`, so this can be used
+    to preview a response with numbers too large to evaluate.
+    """
+    return to_sympy(parse_checked(text, limits.sizes()), evaluate=False)
+
+
+def expression_size(expression) -> int:
+    """
+    Function to estimate the memory used by a SymPy expression, in bytes.
+    ---
+    Subexpressions shared between parts of the expression are counted every time.
+    """
+    import sympy
+
+    return sum(sys.getsizeof(node) for node in sympy.preorder_traversal(expression))
+
+
+def parse_expression(text: str, limits=DEFAULT_LIMITS):
+    """
+    Function to parse an expression into a SymPy expression, reusing a cached one
+    for any earlier expression with the same canonical form.
+    ---
+    Raises ParseError if the text isn't a valid expression, and ComplexityError if
+    it is over the `limits`. The expression returned may be shared with other
+    callers, which is safe as SymPy expressions are immutable.
+    """
+    return key_expression(structural_key(text, limits))
+
+
+def key_expression(key):
+    """
+    Function to return the SymPy expression for a key from `structural_key`.
+    """
+    expression = expression_cache.get(key)
+
+    if expression is None:
+        expression = to_sympy(key)
+        expression_cache.put(key, expression, expression_size(expression))
+
+    return expression
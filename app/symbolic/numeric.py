@@ -0,0 +1,195 @@
+"""
+    Numeric equivalence checking of two expressions.
+
+    Both expressions are compiled once with `sympy.lambdify` into functions that
+    evaluate a whole NumPy array of points at a time, and are compared at a batch of
+    random points. A point where the values differ by more than the tolerance proves
+    the expressions are different. If they agree everywhere they are taken to be
+    equivalent, unless too few points could be evaluated or only one expression is
+    defined at some of them, in which case the check is inconclusive.
+
+    The points are drawn from a generator with a fixed seed, so the same request
+    always gets the same result. Params used:
+        samples (int): number of points, 64 by default, and at most
+            `NUMERIC_MAX_SAMPLES` (4096 by default), as every point takes memory.
+        domain: [low, high] for every symbol, or a dictionary of symbol name to
+            [low, high], [-10, 10] by default. Bounds that aren't finite numbers
+            with low < high are replaced by the default.
+        tolerance (float): relative tolerance, 1e-8 by default.
+        absolute_tolerance (float): absolute tolerance, 1e-12 by default.
+        seed (int): seed of the generator, 0 by default.
+    A negative tolerance is rejected with an error.
+
+    Only text and numbers are compared, and both are parsed with `parse` (see
+    `parser.py`) and checked against the complexity limits, as SymPy's own parser
+    evaluates Python code.
+"""
+import math
+
+from ..tools.cache import LRUCache, env_number, register
+from ..tools.deadline import checkpoint
+from ..tools.errors import GradingError
+from .complexity import DEFAULT_LIMITS
+from .normalize import parse_expression
+
+DEFAULT_DOMAIN = (-10.0, 10.0)
+
+MAX_SAMPLES = env_number("NUMERIC_MAX_SAMPLES", 4096)
+
+# Compiled functions, keyed by expression and the symbols they take
+function_cache = register("numeric", LRUCache(maxsize=env_number("NUMERIC_CACHE_SIZE", 256)))
+
+
+def compile_expression(expression, symbols):
+    """
+    Function to return a vectorized NumPy function evaluating `expression` at `symbols`.
+    """
+    key = (expression, symbols)
+    function = function_cache.get(key)
+
+    if function is None:
+        import sympy
+
+        function = sympy.lambdify(symbols, expression, modules="numpy")
+        function_cache.put(key, function)
+
+    return function
+
+
+def get_number(params, name, default, cast=float):
+    value = params.get(name, default)
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return default
+
+    return cast(value)
+
+
+def get_tolerance(params, name, default) -> float:
+    tolerance = get_number(params, name, default)
+
+    if tolerance < 0:
+        raise GradingError({
+            "message": "The numeric params are invalid.",
+            "description": f"`{name}` must not be negative, but is {tolerance}."
+        })
+
+    return tolerance
+
+
+def get_domain(params, name) -> tuple:
+    domain = params.get("domain", DEFAULT_DOMAIN)
+
+    if isinstance(domain, dict):
+        domain = domain.get(name, DEFAULT_DOMAIN)
+
+    try:
+        low, high = (float(bound) for bound in domain)
+    except (TypeError, ValueError, OverflowError):
+        return DEFAULT_DOMAIN
+
+    # The width must be finite too, for the generator to draw points from it
+    return (low, high) if low < high and math.isfinite(high - low) else DEFAULT_DOMAIN
+
+
+def evaluate(function, points, samples):
+    import numpy
+
+    with numpy.errstate(all="ignore"):
+        values = numpy.asarray(function(*points), dtype=complex)
+
+    return numpy.broadcast_to(values, (samples,))
+
+
+def numeric_equivalent(first, second, params):
+    """
+    Function to compare two SymPy expressions at random points.
+    ---
+    Returns True if they agree within the tolerance at every point, False if they
+    differ at any point, or None if the check is inconclusive.
+    """
+    import numpy
+
+    samples = min(max(1, get_number(params, "samples", 64, int)), MAX_SAMPLES)
+    rtol = get_tolerance(params, "tolerance", 1e-8)
+    atol = get_tolerance(params, "absolute_tolerance", 1e-12)
+    seed = abs(get_number(params, "seed", 0, int))
+
+    symbols = tuple(sorted(first.free_symbols | second.free_symbols, key=lambda s: s.name))
+    generator = numpy.random.default_rng(seed)
+    points = [generator.uniform(*get_domain(params, s.name), size=samples) for s in symbols]
+
+    try:
+        first_values = evaluate(compile_expression(first, symbols), points, samples)
+        second_values = evaluate(compile_expression(second, symbols), points, samples)
+    except Exception:
+        return None
+
+    first_finite = numpy.isfinite(first_values)
+    second_finite = numpy.isfinite(second_values)
+    both = first_finite & second_finite
+
+    close = numpy.isclose(first_values[both], second_values[both], rtol=rtol, atol=atol)
+
+    if not close.all():
+        return False
+
+    if (first_finite != second_finite).any() or both.sum() < samples / 2:
+        return None
+
+    return True
+
+
+def symbolic_equivalent(first, second) -> bool:
+    import sympy
+
+    return sympy.simplify(first - second) == 0
+
+
+def to_expression(value, name, limits=DEFAULT_LIMITS):
+    """
+    Function to return the SymPy expression for an expression, its text or a number.
+    ---
+    Raises GradingError for anything else, such as lists, and ParseError or
+    ComplexityError for text that isn't a valid expression or is over the `limits`.
+    """
+    import sympy
+
+    if isinstance(value, sympy.Basic):
+        return value
+
+    if isinstance(value, str):
+        return parse_expression(value, limits)
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        try:
+            return parse_expression(repr(value), limits)
+        except ValueError:
+            # Integers too long to write down
+            pass
+
+    raise GradingError({
+        "message": f"The {name} can't be compared.",
+        "description": f"The {name} must be an expression or a finite number, not {type(value).__name__}."
+    })
+
+
+def equivalent(first, second, params, method="numeric"):
+    """
+    Function to return whether two expressions are equal, and the method that decided it.
+    ---
+    `first` is the response and `second` the answer, given as SymPy expressions,
+    text or numbers (see `to_expression`). With the "numeric" method, expressions are
+    only simplified symbolically if the numeric check is inconclusive.
+    """
+    first, second = to_expression(first, "response"), to_expression(second, "answer")
+
+    if method == "numeric":
+        result = numeric_equivalent(first, second, params)
+
+        if result is not None:
+            return result, "numeric"
+
+        checkpoint()
+
+    return symbolic_equivalent(first, second), "symbolic"
@@ -0,0 +1,293 @@
+"""
+    Parser for the expressions typed by students.
+
+    `parse` turns text such as `2x^2 - sin x` into a tree of tuples:
+        ("num", text)               a number, as it was written
+        ("sym", name)               a name
+        ("add", (terms...))         a sum, where `a - b` is `a + (-b)`
+        ("mul", (factors...))       a product, written with `*` or implied
+        ("neg", operand)            a negation
+        ("pow", base, exponent)     a power, written with `^` or `**`
+        ("call", name, (args...))   a function applied to its arguments
+
+    Parentheses and whitespace don't appear in the tree. `a / b` is parsed as
+    `a * b^(-1)` and `n!` as `factorial(n)`. A known function name can be applied
+    without parentheses, e.g. `sin x^2` is `sin(x^2)`, and a product can be implied
+    by writing two terms next to each other, e.g. `2x(y + 1)`. Numbers can be written
+    in scientific notation, e.g. `1e5` or `2.5E-3`, so `2e-1` is 0.2 rather than
+    `2 e - 1`, whereas `2e` and `2e^x` are products with `e`.
+
+    Text pasted from elsewhere is also understood: Greek letters are read as their
+    names (`2πr` is `2 pi r`), `×`, `·`, `÷` and `−` as the ASCII operators, `√` as
+    `sqrt`, `∞` as `oo` and superscript digits as powers (`x²` is `x^2`). A Greek
+    letter is a name on its own, so `αx` is a product, whereas `ax` is one name.
+
+    Every lookup the tokenizer and parser make is in the tables below, built once on
+    import. The tokens are kept as two lists of kinds and values, and their positions
+    are only worked out when there is an error to report.
+"""
+import re
+
+FUNCTIONS = frozenset([
+    "sin", "cos", "tan", "sec", "csc", "cot", "asin", "acos", "atan",
+    "sinh", "cosh", "tanh", "exp", "log", "ln", "sqrt", "abs", "factorial"
+])
+
+# Most arguments each function takes, where that isn't one
+ARGUMENTS = {**{name: 1 for name in FUNCTIONS}, "log": 2}
+
+GREEK = ("alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa",
+         "lambda", "mu", "nu", "xi", "omicron", "pi", "rho", "sigma", "tau", "upsilon", "phi",
+         "chi", "psi", "omega")
+
+# Kind of the token for each name, which is "sym" for any name not in the table
+NAMES = {name: "fn" for name in FUNCTIONS}
+
+# Kind and value of the token for each character that stands for a name on its own
+LETTERS = {
+    **{chr(0x3B1 + i + (i > 16)): ("sym", name) for i, name in enumerate(GREEK)},
+    **{chr(0x391 + i + (i > 16)): ("sym", name.capitalize()) for i, name in enumerate(GREEK)},
+    "ς": ("sym", "sigma"), "ϵ": ("sym", "epsilon"), "ϑ": ("sym", "theta"), "ϕ": ("sym", "phi"),
+    "µ": ("sym", "mu"), "∞": ("sym", "oo"), "√": ("fn", "sqrt"),
+}
+
+# Kind of the token for each operator, which is the ASCII operator it stands for
+OPERATORS = {
+    **{operator: operator for operator in "+-*/^(),!"},
+    "**": "^", "×": "*", "·": "*", "⋅": "*", "÷": "/", "∕": "/", "−": "-",
+}
+
+SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹", "0123456789")
+
+TOKEN = re.compile(r"\s*(?:((?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|([A-Za-z_][A-Za-z0-9_]*)|(\*\*|[-+*/^(),!×·⋅÷∕−])"
+                   r"|([⁰¹²³⁴⁵⁶⁷⁸⁹]+)|(\S))")
+
+# Kinds of the tokens a term starts with, after which a product is implied
+TERM_STARTS = frozenset(["num", "sym", "fn", "("])
+
+MINUS_ONE = ("neg", ("num", "1"))
+
+
+class ParseError(ValueError):
+    def __init__(self, message, position):
+        super().__init__(f"{message} at position {position}.")
+        self.message = message
+        self.position = position
+
+
+def tokenize(text):
+    """
+    Function to split text into lists of the kinds and values of its tokens.
+    ---
+    The kind of a number is "num", of a name "sym", of a function name "fn", and of an
+    operator the ASCII operator. The lists end with an "end" token.
+    """
+    kinds = []
+    values = []
+
+    for number, name, operator, superscript, other in TOKEN.findall(text):
+        if name:
+            kinds.append(NAMES.get(name, "sym"))
+            values.append(name)
+        elif number:
+            kinds.append("num")
+            values.append(number.lower())
+        elif operator:
+            kinds.append(OPERATORS[operator])
+            values.append(operator)
+        elif superscript:
+            kinds += ("^", "num")
+            values += (superscript, superscript.translate(SUPERSCRIPTS))
+        elif other in LETTERS:
+            kind, value = LETTERS[other]
+            kinds.append(kind)
+            values.append(value)
+        else:
+            position = positions(text)[len(kinds)]
+            raise ParseError(f"Unexpected character '{other}'", position)
+
+    kinds.append("end")
+    values.append(None)
+
+    return kinds, values
+
+
+def positions(text) -> list:
+    """
+    Function to return the position in `text` of each of the tokens from `tokenize`.
+    """
+    result = []
+
+    for match in TOKEN.finditer(text):
+        start = match.start(match.lastindex)
+        result += (start, start) if match.lastindex == 4 else (start,)
+
+    result.append(len(text.rstrip()))
+
+    return result
+
+
+class Parser:
+    """
+    Class used to parse the tokens of a text by recursive descent.
+    ---
+    From loosest to tightest, the levels are sums, products, and operands, which are
+    signs, powers (right-associative), factorials and single terms.
+    """
+    __slots__ = ("text", "kinds", "values", "index")
+
+    def __init__(self, text):
+        self.text = text
+        self.kinds, self.values = tokenize(text)
+        self.index = 0
+
+    def unexpected(self) -> ParseError:
+        position = positions(self.text)[self.index]
+
+        if self.kinds[self.index] == "end":
+            return ParseError("Unexpected end of expression", position)
+
+        return ParseError(f"Unexpected '{self.values[self.index]}'", position)
+
+    def parse(self):
+        tree = self.sum()
+
+        if self.kinds[self.index] != "end":
+            raise self.unexpected()
+
+        return tree
+
+    def sum(self):
+        kinds = self.kinds
+        term = self.product()
+        kind = kinds[self.index]
+
+        if kind != "+" and kind != "-":
+            return term
+
+        terms = [term]
+
+        while kind == "+" or kind == "-":
+            self.index += 1
+            term = self.product()
+            terms.append(term if kind == "+" else ("neg", term))
+            kind = kinds[self.index]
+
+        return ("add", tuple(terms))
+
+    def product(self):
+        kinds = self.kinds
+        factor = self.operand()
+        kind = kinds[self.index]
+
+        if kind != "*" and kind != "/" and kind not in TERM_STARTS:
+            return factor
+
+        factors = [factor]
+
+        while True:
+            if kind == "*":
+                self.index += 1
+                factors.append(self.operand())
+            elif kind == "/":
+                self.index += 1
+                factors.append(("pow", self.operand(), MINUS_ONE))
+            elif kind in TERM_STARTS:
+                factors.append(self.operand())
+            else:
+                break
+
+            kind = kinds[self.index]
+
+        return ("mul", tuple(factors))
+
+    def operand(self):
+        """
+        Function to parse a term with any signs before it, and any factorials and power after it.
+        """
+        kinds, values = self.kinds, self.values
+        index = self.index
+        signs = 0
+
+        while kinds[index] == "-" or kinds[index] == "+":
+            if kinds[index] == "-":
+                signs += 1
+            index += 1
+
+        kind = kinds[index]
+
+        if kind == "num" or kind == "sym":
+            tree = (kind, values[index])
+            self.index = index + 1
+        elif kind == "fn":
+            self.index = index + 1
+            tree = self.call(values[index])
+        elif kind == "(":
+            self.index = index + 1
+            tree = self.sum()
+
+            if kinds[self.index] != ")":
+                raise self.unexpected()
+
+            self.index += 1
+        else:
+            self.index = index
+            raise self.unexpected()
+
+        while kinds[self.index] == "!":
+            self.index += 1
+            tree = ("call", "factorial", (tree,))
+
+        if kinds[self.index] == "^":
+            self.index += 1
+            tree = ("pow", tree, self.operand())
+
+        for _ in range(signs):
+            tree = ("neg", tree)
+
+        return tree
+
+    def call(self, name):
+        """
+        Function to parse the arguments of a function, in parentheses or not.
+        ---
+        Raises ParseError at the function's name if it is given too many arguments.
+        """
+        kinds = self.kinds
+        start = self.index - 1
+
+        if kinds[self.index] != "(":
+            # Without parentheses, the argument is a power, which can't have a sign
+            if kinds[self.index] == "-" or kinds[self.index] == "+":
+                raise self.unexpected()
+
+            return ("call", name, (self.operand(),))
+
+        self.index += 1
+        arguments = [self.sum()]
+
+        while kinds[self.index] == ",":
+            self.index += 1
+            arguments.append(self.sum())
+
+        if kinds[self.index] != ")":
+            raise self.unexpected()
+
+        self.index += 1
+
+        if len(arguments) > ARGUMENTS[name]:
+            position = positions(self.text)[start]
+            match = TOKEN.match(self.text, position)
+            maximum = ARGUMENTS[name]
+
+            raise ParseError(f"Expected at most {maximum} argument{'s' * (maximum > 1)} for "
+                             f"'{match.group(match.lastindex)}'", position)
+
+        return ("call", name, tuple(arguments))
+
+
+def parse(text: str):
+    """
+    Function to parse an expression, raising ParseError if it isn't valid.
+    """
+    return Parser(text).parse()
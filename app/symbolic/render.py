@@ -0,0 +1,185 @@
+"""
+    Cache of the previews rendered for SymPy expressions.
+
+    Rendering an expression in LaTeX and MathML takes longer than parsing it, and the
+    same expressions are rendered again and again, by every student answering a
+    question and on every keystroke. Renders are kept in `render_cache`, keyed by the
+    expression and the render options, and counted by the size of their strings.
+
+    Expressions from `parse_expression` are already canonical: every way of writing
+    the same expression gives the same SymPy expression, so shares its renders.
+
+    If `RENDER_CACHE_DIR` is set (e.g. to a directory in `/tmp`), renders are also
+    written there, so they are kept when the process is restarted in a warm container
+    and shared between the processes of the stream grader.
+
+    The previews of `COMMON_EXPRESSIONS`, and of any other expression rendered when
+    the warm-up snapshot is built, are saved in it by their structural key (see
+    `tools/warmup.py`). `render_text` returns those without building the expression,
+    so a new container answers common responses before it has even imported SymPy.
+"""
+import os
+
+from ..tools.cache import DiskCache, LRUCache, canonical_key, env_number, register
+from ..tools.deadline import checkpoint
+from ..tools.warmup import register_snapshot
+from .complexity import DEFAULT_LIMITS
+from .normalize import expression_cache, key_expression, parse_expression, structural_key
+from .tree import intern, to_tuple
+
+# Options of `params["render"]`, and the values each one can take
+OPTIONS = {
+    "mathml": (True, False),
+    "mul_symbol": (None, "ldot", "dot", "times"),
+    "inv_trig_style": ("abbreviated", "full", "power"),
+    "fold_short_frac": (True, False),
+    "ln_notation": (True, False),
+    "order": (None, "none")
+}
+
+LATEX_OPTIONS = ("mul_symbol", "inv_trig_style", "fold_short_frac", "ln_notation", "order")
+
+render_cache = register("renders", LRUCache(
+    maxsize=env_number("RENDER_CACHE_SIZE", 4096),
+    maxbytes=env_number("RENDER_CACHE_BYTES", 8 * 1024 * 1024)))
+
+disk_cache = None
+
+if os.environ.get("RENDER_CACHE_DIR", "").strip():
+    disk_cache = register("renders_disk", DiskCache(
+        os.environ["RENDER_CACHE_DIR"].strip(),
+        maxbytes=env_number("RENDER_CACHE_DIR_BYTES", 64 * 1024 * 1024)))
+
+
+# Responses common enough to be worth rendering when a container is warmed up
+COMMON_EXPRESSIONS = (
+    [str(n) for n in range(21)] + list("abcnrtxyz") + ["-1", "1/2", "-x", "pi", "2pi", "pi/2", "e"]
+    + ["2x", "x/2", "1/x", "x^2", "x^3", "x^-1", "x^2 + 1", "x^2 - 1", "x + 1", "x - 1", "2x + 1",
+       "(x + 1)^2", "x^2 + 2x + 1", "(x + 1)(x - 1)", "x y", "x + y", "x - y", "a + b", "(a + b)^2",
+       "a^2 + b^2", "a^2 + 2a b + b^2", "sqrt(x)", "sqrt(2)", "abs(x)", "x!", "1/(1 + x)"]
+    + ["sin(x)", "cos(x)", "tan(x)", "exp(x)", "e^x", "e^(-x)", "x e^x", "log(x)", "ln(x)",
+       "sin(x)^2", "cos(x)^2", "sin(x)^2 + cos(x)^2", "sin(2x)", "cos(2x)", "2sin(x)cos(x)",
+       "-sin(x)", "-cos(x)", "1/cos(x)^2", "1/x^2", "-1/x^2", "2x e^(x^2)", "3x^2", "4x^3"]
+)
+
+# Previews loaded from the warm-up snapshot, keyed by structural key and render options
+snapshot_previews = {}
+
+
+def is_allowed(value, choices) -> bool:
+    # Compared by identity for True, False and None, so 1 isn't taken for True
+    return any(value is choice or (isinstance(value, str) and value == choice) for choice in choices)
+
+
+def render_options(params) -> tuple:
+    """
+    Function to return the render options in `params` as a hashable, sorted tuple.
+    ---
+    Unknown options, and options with values they can't take, are left out.
+    """
+    options = params.get("render") if isinstance(params, dict) else None
+
+    if not isinstance(options, dict):
+        return ()
+
+    return tuple(sorted(
+        (name, value) for name, value in options.items()
+        if name in OPTIONS and is_allowed(value, OPTIONS[name])))
+
+
+def render_uncached(expression, options=()) -> dict:
+    import sympy
+
+    settings = dict(options)
+    rendered = {
+        "latex": sympy.latex(expression, **{n: settings[n] for n in LATEX_OPTIONS if n in settings}),
+        "sympy": sympy.sstr(expression, order=settings.get("order"))
+    }
+
+    if settings.get("mathml"):
+        rendered["mathml"] = sympy.mathml(expression, printer="presentation", order=settings.get("order"))
+
+    return rendered
+
+
+def rendered_size(rendered) -> int:
+    # The key only refers to the expression, which is counted in `expression_cache`
+    return sum(len(text) for text in rendered.values())
+
+
+def render(expression, options=()) -> dict:
+    """
+    Function to return the preview of a SymPy expression, with `latex` and `sympy`,
+    and `mathml` if the options ask for it.
+    ---
+    The dictionary returned is a new copy, so the caller may change it.
+    """
+    key = (expression, options)
+    rendered = render_cache.get(key)
+
+    if rendered is None:
+        disk_key = None
+
+        if disk_cache is not None:
+            import sympy
+
+            disk_key = canonical_key("render", sympy.srepr(expression), options)
+            rendered = disk_cache.get(disk_key)
+
+        if rendered is None:
+            rendered = render_uncached(expression, options)
+
+            if disk_key is not None:
+                disk_cache.put(disk_key, rendered)
+
+        render_cache.put(key, rendered, rendered_size(rendered))
+
+    return dict(rendered)
+
+
+def render_text(text, options=(), limits=DEFAULT_LIMITS) -> dict:
+    """
+    Function to return the preview of the expression written in `text`.
+    ---
+    Raises ParseError or ComplexityError like `parse_expression`. A preview from the
+    warm-up snapshot is returned without building the expression.
+    """
+    key = structural_key(text, limits)
+    rendered = snapshot_previews.get((key, options))
+
+    if rendered is not None:
+        return dict(rendered)
+
+    expression = key_expression(key)
+    checkpoint()
+
+    return render(expression, options)
+
+
+"""
+    Warm-up snapshot.
+"""
+
+
+def warm_previews():
+    for text in COMMON_EXPRESSIONS:
+        render(parse_expression(text))
+
+
+def dump_previews() -> list:
+    """
+    Function to return the (structural key, options, preview) of every cached preview.
+    ---
+    The keys are written as tuples, which `marshal` can write, and interned again when loaded.
+    """
+    keys = {expression: to_tuple(key) for (key, expression) in expression_cache.items()}
+
+    return [(keys[expression], options, rendered)
+            for ((expression, options), rendered) in render_cache.items() if expression in keys]
+
+
+def load_previews(previews):
+    snapshot_previews.update({(intern(key), options): rendered for (key, options, rendered) in previews})
+
+
+register_snapshot("previews", dump_previews, load_previews, warm_previews)
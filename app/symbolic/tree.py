@@ -0,0 +1,283 @@
+"""
+    Interned expression trees, shared between every expression a container keeps.
+
+    The previews of thousands of students keep near-identical expressions in the warm
+    caches: `x`, `2`, `x^2` and `sin(x)` appear in most of them. A `Node` has the
+    kind, value and children of a tree from `parse`:
+        Node("num", text)                   a number, which may be negative or `p/q`
+        Node("sym", name)                   a name
+        Node("add" or "mul", None, (operands...))
+        Node("neg", None, (operand,))
+        Node("pow", None, (base, exponent))
+        Node("call", name, (args...))       `name` is the SymPy class if it has no name
+        Node("atom", (srepr, atom))         any other SymPy atom, such as a Float
+    and nodes are hash-consed: `node` returns the existing node for the same kind,
+    value and children if there is one, so every identical subtree, name and number
+    is stored once and two trees are equal only if they are the same object. A
+    node is only kept by the table while something else refers to it, so trees
+    evicted from a cache are freed.
+
+    `to_sympy` builds the SymPy expression for a node, and `from_sympy` the node for
+    a SymPy expression, which `to_sympy(..., evaluate=False)` turns back into an
+    identical expression. SymPy is only imported by these two functions.
+"""
+import sys
+import weakref
+
+# Names that SymPy calls something else, or treats as constants
+SYMPY_NAMES = {"ln": "log", "abs": "Abs"}
+CONSTANTS = {"pi": "pi", "e": "E", "oo": "oo"}
+
+# Weak references to every node that is referred to, by its kind, value and children.
+# This is a WeakValueDictionary without its method calls, as every node is looked up.
+nodes = {}
+
+
+def remove(reference):
+    # Unless the node was made again after it was freed
+    if nodes.get(reference.key) is reference:
+        del nodes[reference.key]
+
+
+class Node:
+    """
+    Class used to represent one interned node of an expression tree.
+    ---
+    Nodes must only be made with `node`, and never changed, as they are shared.
+    """
+    __slots__ = ("kind", "value", "children", "__weakref__")
+
+    def __init__(self, kind, value, children):
+        self.kind = kind
+        self.value = value
+        self.children = children
+
+    def __repr__(self):
+        return f"Node({self.kind!r}, {self.value!r}, {self.children!r})"
+
+    def __reduce__(self):
+        # Copies and unpickled nodes are interned again
+        return (node, (self.kind, self.value, self.children))
+
+
+def node(kind: str, value=None, children: tuple = ()) -> Node:
+    """
+    Function to return the node with a kind, value and children, making it if there isn't one.
+    """
+    key = (kind, value, children)
+    reference = nodes.get(key)
+
+    if reference is not None:
+        result = reference()
+
+        if result is not None:
+            return result
+
+    result = Node(kind, value, children)
+    nodes[key] = weakref.KeyedRef(result, remove, key)
+
+    return result
+
+
+def intern(tree) -> Node:
+    """
+    Function to return the node for a tree of tuples from `parse`.
+    """
+    kind = tree[0]
+
+    if kind in ("num", "sym"):
+        return node(kind, sys.intern(tree[1]))
+
+    if kind in ("add", "mul"):
+        return node(kind, None, tuple([intern(operand) for operand in tree[1]]))
+
+    if kind == "neg":
+        return node(kind, None, (intern(tree[1]),))
+
+    if kind == "pow":
+        return node(kind, None, (intern(tree[1]), intern(tree[2])))
+
+    return node(kind, sys.intern(tree[1]), tuple([intern(argument) for argument in tree[2]]))
+
+
+def to_tuple(tree: Node):
+    """
+    Function to return the tree of tuples for a node, as from `parse`.
+    """
+    kind = tree.kind
+
+    if kind in ("num", "sym"):
+        return (kind, tree.value)
+
+    if kind in ("add", "mul"):
+        return (kind, tuple(to_tuple(operand) for operand in tree.children))
+
+    if kind == "neg":
+        return (kind, to_tuple(tree.children[0]))
+
+    if kind == "pow":
+        return (kind, to_tuple(tree.children[0]), to_tuple(tree.children[1]))
+
+    if kind == "call" and isinstance(tree.value, str):
+        return (kind, tree.value, tuple(to_tuple(argument) for argument in tree.children))
+
+    raise TypeError(f"A {kind} node from SymPy has no tuple form")
+
+
+"""
+    Conversion to and from SymPy.
+"""
+
+
+def to_sympy(tree: Node, evaluate=True):
+    """
+    Function to build the SymPy expression for a node.
+    ---
+    With `evaluate` False, the expression is kept as written, e.g. `2^100` isn't
+    worked out. Each subtree shared within the tree is only built once.
+    """
+    built = {}
+
+    def build(tree):
+        expression = built.get(tree)
+
+        if expression is not None:
+            return expression
+
+        if tree.kind in ("num", "sym", "atom"):
+            expression = sympy_atom(tree.kind, tree.value)
+        else:
+            arguments = [build(child) for child in tree.children]
+            expression = sympy_operation(tree.kind, tree.value, arguments, evaluate)
+
+        built[tree] = expression
+
+        return expression
+
+    return build(tree)
+
+
+def sympy_atom(kind, value):
+    import sympy
+
+    if kind == "atom":
+        return value[1]
+
+    if kind == "sym":
+        return getattr(sympy, CONSTANTS[value]) if value in CONSTANTS else sympy.Symbol(value)
+
+    if "/" in value:
+        return sympy.Rational(value)
+
+    if "." in value or "e" in value:
+        return sympy.Float(value)
+
+    return sympy.Integer(value)
+
+
+def sympy_operation(kind, value, arguments, evaluate):
+    import sympy
+
+    if kind == "add":
+        return sympy.Add(*arguments, evaluate=evaluate)
+
+    if kind == "mul":
+        return sympy.Mul(*arguments, evaluate=evaluate)
+
+    if kind == "neg":
+        return -arguments[0] if evaluate else sympy.Mul(sympy.S.NegativeOne, arguments[0], evaluate=False)
+
+    if kind == "pow":
+        return sympy.Pow(*arguments, evaluate=evaluate)
+
+    function = getattr(sympy, SYMPY_NAMES.get(value, value)) if isinstance(value, str) else value
+
+    return function(*arguments, evaluate=evaluate)
+
+
+def from_sympy(expression) -> Node:
+    """
+    Function to return the node for a SymPy expression.
+    ---
+    `to_sympy(from_sympy(expression), evaluate=False)` is identical to `expression`.
+    Raises TypeError for expressions that aren't atoms, sums, products, powers or
+    functions, such as matrices or equations.
+    """
+    import sympy
+
+    constants = {id(getattr(sympy, name)): symbol for symbol, name in CONSTANTS.items()}
+    converted = {}
+
+    def convert(expression):
+        # By identity, as SymPy doesn't tell apart everything a node does
+        result = converted.get(id(expression))
+
+        if result is not None:
+            return result
+
+        if not isinstance(expression, sympy.Basic):
+            raise TypeError(f"Can't convert {type(expression).__name__} to a node")
+
+        if expression.is_Atom:
+            result = atom_node(expression, constants)
+        else:
+            result = operation_node(expression, convert)
+
+        converted[id(expression)] = result
+
+        return result
+
+    return convert(expression)
+
+
+def atom_node(expression, constants) -> Node:
+    """
+    Function to return the node for a SymPy atom, given the ids of the constants' atoms.
+    """
+    import sympy
+
+    if isinstance(expression, sympy.Integer):
+        return node("num", str(expression.p))
+
+    if isinstance(expression, sympy.Rational):
+        return node("num", f"{expression.p}/{expression.q}")
+
+    if type(expression) is sympy.Symbol and expression.name not in CONSTANTS \
+            and expression == sympy.Symbol(expression.name):
+        return node("sym", sys.intern(expression.name))
+
+    if id(expression) in constants:
+        return node("sym", constants[id(expression)])
+
+    return node("atom", (sympy.srepr(expression), expression))
+
+
+def operation_node(expression, convert) -> Node:
+    """
+    Function to return the node for a SymPy expression that isn't an atom, converting
+    its arguments with `convert`.
+    """
+    import sympy
+
+    arguments = expression.args
+
+    if isinstance(expression, sympy.Add):
+        return node("add", None, tuple(convert(argument) for argument in arguments))
+
+    if isinstance(expression, sympy.Mul) and len(arguments) == 2 and arguments[0] is sympy.S.NegativeOne:
+        return node("neg", None, (convert(arguments[1]),))
+
+    if isinstance(expression, sympy.Mul):
+        return node("mul", None, tuple(convert(argument) for argument in arguments))
+
+    if isinstance(expression, sympy.Pow):
+        return node("pow", None, (convert(arguments[0]), convert(arguments[1])))
+
+    if isinstance(expression, sympy.Function):
+        function = expression.func
+        name = function.__name__
+        value = sys.intern(name) if getattr(sympy, name, None) is function else function
+
+        return node("call", value, tuple(convert(argument) for argument in arguments))
+
+    raise TypeError(f"Can't convert {type(expression).__name__} to a node")
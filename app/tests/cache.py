@@ -0,0 +1,150 @@
+import unittest
+from unittest import mock
+
+from ..tools import cache
+from ..tools.cache import LRUCache, canonical_key
+from ..tools.handler import handler
+
+class TestLRUCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        lru = LRUCache(maxsize=2)
+        lru.put("a", 1)
+
+        self.assertEqual(lru.get("a"), 1)
+        self.assertEqual(lru.get("b"), None)
+        self.assertEqual((lru.hits, lru.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize=2)
+        lru.put("a", 1)
+        lru.put("b", 2)
+        lru.get("a")
+        lru.put("c", 3)
+
+        self.assertEqual(lru.get("b"), None)
+        self.assertEqual(lru.get("a"), 1)
+        self.assertEqual(lru.get("c"), 3)
+        self.assertEqual(lru.evictions, 1)
+
+    def test_ttl_expires_entries(self):
+        lru = LRUCache(maxsize=2, ttl=10)
+
+        with mock.patch.object(cache.time, "monotonic", return_value=100):
+            lru.put("a", 1)
+            self.assertEqual(lru.get("a"), 1)
+
+        with mock.patch.object(cache.time, "monotonic", return_value=111):
+            self.assertEqual(lru.get("a"), None)
+
+        self.assertEqual(lru.expirations, 1)
+        self.assertEqual(len(lru), 0)
+
+    def test_evicts_over_memory_budget(self):
+        lru = LRUCache(maxsize=10, maxbytes=100)
+        lru.put("a", 1, 40)
+        lru.put("b", 2, 40)
+        lru.put("c", 3, 40)
+
+        self.assertEqual(lru.get("a"), None)
+        self.assertEqual(lru.nbytes, 80)
+
+        lru.put("d", 4, 101)
+        self.assertEqual(lru.get("d"), None)
+        self.assertEqual(len(lru), 2)
+
+    def test_zero_size_stores_nothing(self):
+        lru = LRUCache(maxsize=0)
+        lru.put("a", 1)
+
+        self.assertEqual(lru.get("a"), None)
+
+    def test_canonical_key_ignores_key_order(self):
+        self.assertEqual(
+            canonical_key("x", {"a": 1, "b": [1, 2]}),
+            canonical_key("x", {"b": [1, 2], "a": 1}))
+
+        self.assertNotEqual(canonical_key("x", {"a": 1}), canonical_key("x", {"a": 2}))
+        self.assertNotEqual(canonical_key("1", {}), canonical_key(1, {}))
+
+    def test_memoize_answer(self):
+        calls = []
+
+        @cache.memoize_answer
+        def parse(answer, params):
+            calls.append(answer)
+            return [answer]
+
+        with mock.patch.object(cache, "answer_cache", LRUCache(maxsize=8)):
+            first = parse("x + y", {"a": 1, "b": 2})
+            second = parse("x + y", {"b": 2, "a": 1})
+            parse("x - y", {})
+
+            self.assertIs(first, second)
+            self.assertEqual(calls, ["x + y", "x - y"])
+            self.assertEqual(cache.answer_cache.stats()["hits"], 1)
+
+    def test_call_memoized_deterministic(self):
+        calls = []
+
+        @cache.deterministic
+        def grade(response, answer, params):
+            calls.append(response)
+            return {"is_correct": response == answer, "feedback": [response]}
+
+        with mock.patch.object(cache, "result_cache", LRUCache(maxsize=8, maxbytes=1024)):
+            first = cache.call_memoized(grade, "x", "x", {"a": 1, "b": 2})
+            first["feedback"].append("modified")
+            second = cache.call_memoized(grade, "x", "x", {"b": 2, "a": 1})
+
+            self.assertEqual(calls, ["x"])
+            self.assertEqual(second, {"is_correct": True, "feedback": ["x"]})
+            self.assertEqual(cache.result_cache.hits, 1)
+
+    def test_sessions_share_cache_entries(self):
+        answers, results = LRUCache(maxsize=8), LRUCache(maxsize=8)
+
+        with mock.patch.object(cache, "answer_cache", answers), \
+                mock.patch.object(cache, "result_cache", results):
+            for session, response in [("first", "x + 1"), ("second", "x + 1"), ("third", "x + 2")]:
+                handler({"body": {"response": response, "answer": "1 + x",
+                                  "params": {"equivalence": "symbolic", "session": session}}})
+
+        self.assertEqual((len(answers), answers.hits), (1, 1))
+        self.assertEqual((len(results), results.hits), (2, 1))
+        self.assertEqual(cache.shared_params({"session": "s", "grading_timeout": 1, "n": 2}), {"n": 2})
+
+    def test_call_memoized_skips_nondeterministic_and_failed_calls(self):
+        calls = []
+
+        def grade(response, answer, params):
+            calls.append(response)
+            return {"is_correct": True}
+
+        @cache.deterministic
+        def failing_grade(response, answer, params):
+            calls.append(response)
+            raise ValueError()
+
+        with mock.patch.object(cache, "result_cache", LRUCache(maxsize=8)):
+            for function in (grade, grade, failing_grade, failing_grade):
+                try:
+                    cache.call_memoized(function, "x", "y", {})
+                except ValueError:
+                    pass
+
+            self.assertEqual(len(calls), 4)
+            self.assertEqual(len(cache.result_cache), 0)
+
+    def test_healthcheck_reports_caches(self):
+        response = handler({"headers": {"command": "healthcheck"}})
+        caches = response.get("result").get("caches")
+
+        self.assertIn("answers", caches)
+        self.assertIn("results", caches)
+        self.assertEqual(
+            set(caches["answers"]),
+            {"size", "maxsize", "bytes", "maxbytes", "ttl", "hits", "misses", "hit_rate",
+             "evictions", "expirations"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import json
+from unittest import mock
+
+from ..tools import codec
+from ..tools.parse import load_body
+
+MALFORMED = [
+    "", " ", "{", "}", "{}}}{{{[][] this is not json.", '{"a": 1,}', '{"a" 1}', "[1, 2",
+    '{"response": "x",\n "answer": y}', "\n\n  [1,\n 2,,]", '"unterminated', "nul", "tru",
+    '{"a": 1e400', "[01]", '{"a": "\\x"}', "﻿{}", '{"a": 1}\n{"b": 2}',
+]
+
+ACCEPTED = [
+    "{}", "[]", '{"response": "x + y", "answer": "y + x", "params": {"n": 1.5}}',
+    '{"a": NaN, "b": Infinity, "c": -Infinity}', '{"a": 1e400}',
+    '{"big": 123456789012345678901234567890}', '{"max": 18446744073709551615}',
+    '"\\ud800"', '{"a": 1, "a": 2}', '{"s": "\\u00e9\\u4e2d"}', "-0", "1E-5",
+]
+
+class TestJSONBackend(unittest.TestCase):
+    def expected_error(self, text):
+        try:
+            json.loads(text)
+        except json.JSONDecodeError as e:
+            return (e.msg, e.lineno, e.colno)
+
+        self.fail(f"{text!r} should not be valid JSON")
+
+    def check_backend(self, backend):
+        with mock.patch.object(codec, "BACKEND", backend):
+            for text in MALFORMED:
+                with self.subTest(backend=backend, text=text):
+                    body, error = load_body(text)
+                    thrown = error["error_thrown"]
+
+                    self.assertIsNone(body)
+                    self.assertEqual(
+                        (thrown["message"], thrown["location"]["line"], thrown["location"]["column"]),
+                        self.expected_error(text))
+
+            for text in ACCEPTED:
+                with self.subTest(backend=backend, text=text):
+                    body, error = load_body(text)
+
+                    self.assertIsNone(error)
+                    self.assertEqual(repr(body), repr(json.loads(text)))
+
+            body, error = load_body(None)
+            self.assertEqual(error["message"], "Request body is not text.")
+
+    def test_json_backend(self):
+        self.check_backend("json")
+
+    @unittest.skipIf(codec.orjson is None, "orjson is not installed")
+    def test_orjson_backend(self):
+        self.check_backend("orjson")
+
+    def test_dumps_round_trip(self):
+        values = [
+            {"command": "grade", "result": {"is_correct": True, "feedback": "é 中"}},
+            {1: "non-string key"}, {"big": 2 ** 70}, [1.5, -0.0, None, "\ud800"],
+        ]
+
+        for backend in ("json", "orjson") if codec.orjson else ("json",):
+            with mock.patch.object(codec, "BACKEND", backend):
+                for value in values:
+                    with self.subTest(backend=backend, value=value):
+                        self.assertEqual(
+                            json.loads(codec.dumps(value)), json.loads(json.dumps(value)))
+
+if __name__ == "__main__":
+    unittest.main()
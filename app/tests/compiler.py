@@ -0,0 +1,163 @@
+import unittest
+import random
+import copy
+import jsonschema
+from unittest import mock
+
+from ..tools import validate as v
+from ..tools.compiler import compile_schema
+from . import requests, responses
+
+VALUES = [None, True, False, 0, 1, 1.0, 1.5, "", "grade", "healthcheck", "x", [], [1], {}]
+
+def record_bodies(test_case, module, function_name):
+    """
+    Function to collect every body a TestCase passes to a validation function.
+    """
+    bodies = []
+    function = getattr(module, function_name)
+
+    def recorder(body):
+        bodies.append(body)
+        return function(body)
+
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(test_case)
+
+    with mock.patch.object(module, function_name, recorder):
+        suite.run(unittest.TestResult())
+
+    return bodies
+
+def random_bodies(seed, keys, nested_keys, count):
+    """
+    Function to generate bodies from a fixed pool of keys and values of every type.
+    """
+    rng = random.Random(seed)
+    bodies = []
+
+    for _ in range(count):
+        body = {}
+
+        for key in rng.sample(keys, rng.randint(0, len(keys))):
+            if rng.random() < 0.3:
+                value = {
+                    k: rng.choice(VALUES)
+                    for k in rng.sample(nested_keys, rng.randint(0, len(nested_keys)))
+                }
+            else:
+                value = rng.choice(VALUES)
+
+            body[key] = value
+
+        bodies.append(body)
+
+    return bodies
+
+def mutated_bodies(seed, bodies, count):
+    """
+    Function to generate bodies close to valid ones by changing, adding or dropping
+    a single key somewhere in a copy of one of `bodies`.
+    """
+    rng = random.Random(seed)
+    mutated = []
+
+    for _ in range(count):
+        body = copy.deepcopy(rng.choice(bodies))
+        target = body
+
+        while rng.random() < 0.5:
+            nested = [value for value in target.values() if isinstance(value, dict)]
+
+            if not nested:
+                break
+
+            target = rng.choice(nested)
+
+        action = rng.choice(["change", "add", "drop"])
+
+        if action == "drop" and target:
+            del target[rng.choice(list(target))]
+        elif action == "change" and target:
+            target[rng.choice(list(target))] = rng.choice(VALUES)
+        else:
+            target[rng.choice(["hello", "message", "is_correct", "command"])] = rng.choice(VALUES)
+
+        mutated.append(body)
+
+    return mutated
+
+class TestCompiledValidation(unittest.TestCase):
+    request_keys = ["response", "answer", "params", "hello"]
+    response_keys = ["command", "result", "error", "hello"]
+    result_keys = ["message", "is_correct", "tests_passed", "successes", "failures", "errors"]
+
+    def assertAgrees(self, validator, check, bodies):
+        self.assertIsNotNone(check)
+
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(check(body), validator.is_valid(body))
+                self.assertEqual(
+                    v.validate(validator, body, check), v.validate(validator, body))
+
+    def test_request_cases(self):
+        bodies = record_bodies(requests.TestRequestValidation, requests, "validate_request")
+        self.assertNotEqual(len(bodies), 0)
+        self.assertAgrees(v.request_validator, v.request_check, bodies)
+
+    def test_response_cases(self):
+        bodies = record_bodies(responses.TestResponseValidation, responses, "validate_response")
+        self.assertNotEqual(len(bodies), 0)
+        self.assertAgrees(v.response_validator, v.response_check, bodies)
+
+    def test_random_requests(self):
+        bodies = random_bodies(0, self.request_keys, self.request_keys, 2000)
+        self.assertAgrees(v.request_validator, v.request_check, bodies)
+
+    def test_random_responses(self):
+        bodies = random_bodies(1, self.response_keys, self.result_keys, 5000)
+        self.assertAgrees(v.response_validator, v.response_check, bodies)
+
+    def test_mutated_requests(self):
+        bodies = [{"response": "x", "answer": "y", "params": {"a": 1}}, {"response": 1, "answer": []}]
+        self.assertAgrees(v.request_validator, v.request_check, mutated_bodies(2, bodies, 2000))
+
+    def test_mutated_responses(self):
+        bodies = [
+            {"command": "grade", "result": {"is_correct": True, "feedback": "x"}},
+            {"command": "healthcheck", "result": {
+                "tests_passed": True, "successes": [], "failures": [], "errors": []}},
+            {"error": {"message": "x", "error_thrown": {"message": "y"}}},
+        ]
+        self.assertAgrees(v.response_validator, v.response_check, mutated_bodies(3, bodies, 5000))
+
+    def test_mutated_batch_responses(self):
+        bodies = [
+            {"command": "grade_batch", "result": {"results": [
+                {"result": {"is_correct": False}}, {"error": {"message": "x"}}]}},
+            {"error": {"message": "x", "error_thrown": {"message": "y"}}},
+        ]
+        self.assertAgrees(v.batch_response_validator, v.batch_response_check, mutated_bodies(8, bodies, 5000))
+
+    def test_mutated_batches(self):
+        bodies = [{"answer": "x", "params": {}, "items": [{"response": "y"}]}, {"items": []}]
+        self.assertAgrees(v.batch_validator, v.batch_check, mutated_bodies(4, bodies, 2000))
+
+    def test_non_object_bodies(self):
+        bodies = [None, True, 1, 1.0, "body", [], [{}]]
+        self.assertAgrees(v.request_validator, v.request_check, bodies)
+        self.assertAgrees(v.response_validator, v.response_check, bodies)
+
+    def test_integer_and_number_types(self):
+        schema = {"properties": {"a": {"type": "integer"}, "b": {"type": ["number", "null"]}}}
+        validator = jsonschema.Draft7Validator(schema)
+        bodies = [{"a": a, "b": b} for a in VALUES for b in VALUES]
+
+        self.assertAgrees(validator, compile_schema(schema), bodies)
+
+    def test_unsupported_keyword(self):
+        self.assertIsNone(compile_schema({"type": "string", "pattern": "^a"}))
+        self.assertIsNone(compile_schema({"enum": [1, True]}))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import json
+import time
+import pickle
+import random
+
+from ..tools.handler import handler
+from ..symbolic.complexity import LIMITS, ComplexityError, check_tree, get_limits, parse_checked
+from ..symbolic.parser import parse
+
+# Inputs that would take minutes or all the memory to evaluate, and the limit that stops each
+ADVERSARIAL = [
+    ("9^9^9^9", "max_digits"), ("9**9**9**9", "max_digits"), ("2^(2^64)", "max_digits"),
+    ("99999^99999", "max_digits"), ("(10^2000)(10^2001)", "max_digits"), ("10^10^10 - 1", "max_digits"),
+    ("1/3^(10^8)", "max_digits"), ("(-7)^(-(10^7))", "max_digits"), ("2^(1000!)", "max_digits"),
+    ("1" * 4001, "max_digits"), ("9^9^9^9 + x", "max_digits"), ("sin(x) + 9^(9^9)", "max_digits"),
+    ("100000!", "max_factorial"), ("factorial(10^6)", "max_factorial"), ("(1000!)!", "max_factorial"),
+    ("(9^3)!!", "max_factorial"), ("x + 1001!", "max_factorial"),
+    ("2.5^(10^9)", "max_digits"), ("999!/998!", "max_digits"),
+    ("x^(10^9)", "max_exponent"), ("(x+1)^99999", "max_exponent"), ("exp(x)^(10^10)", "max_exponent"),
+    ("pi^(10^6)", "max_exponent"), ("sin(x)^(9^9)", "max_exponent"),
+    ("(" * 1000 + "x" + ")" * 1000, "max_depth"), ("sin(" * 500 + "x" + ")" * 500, "max_depth"),
+    ("-" * 150 + "x", "max_depth"), ("x^" * 120 + "x", "max_depth"), ("-(" * 120 + "x" + ")" * 120, "max_depth"),
+    ("+".join(["x"] * 3000), "max_nodes"), ("x " * 2500, "max_nodes"), ("x " * 6000, "max_length"),
+]
+
+# Inputs just under the limits, which are evaluated
+ACCEPTED = [
+    "10^3999", "1000!", "x^10000", "2^3^4", "1^(10^100)", "0^(10^100)", "0.5^(10^9)", "(1/2)^100",
+    "sqrt(10^2000)", "1" * 4000, "999!/998", "(" * 20 + "x" + ")" * 20, "+".join(["x"] * 500), "pi^100",
+]
+
+def grade(response, params=None):
+    body = {"response": response, "answer": "x"}
+
+    if params is not None:
+        body["params"] = params
+
+    return handler({"body": json.dumps(body)})
+
+def fuzz_corpus(seed, count):
+    """
+    Function to return random responses built from large numbers, powers and factorials.
+    """
+    rng = random.Random(seed)
+    atoms = ["9", "99", "999", "10", "2", "1", "0", "2.5", "x", "y", "pi", "1000", "12345678901234567890"]
+
+    def build(depth):
+        if depth == 0 or rng.random() < 0.2:
+            return rng.choice(atoms)
+
+        shape = rng.choice(["pow", "pow", "fact", "mul", "add", "neg", "call", "paren"])
+
+        if shape == "pow":
+            return f"{build(depth - 1)}^{build(depth - 1)}"
+        if shape == "fact":
+            return f"({build(depth - 1)})!"
+        if shape == "mul":
+            return f"{build(depth - 1)}*{build(depth - 1)}"
+        if shape == "add":
+            return f"{build(depth - 1)} + {build(depth - 1)}"
+        if shape == "neg":
+            return f"-{build(depth - 1)}"
+        if shape == "call":
+            return f"{rng.choice(['sin', 'sqrt', 'exp', 'log', 'factorial'])}({build(depth - 1)})"
+
+        return f"({build(depth - 1)})"
+
+    return [build(rng.randint(1, 6)) for _ in range(count)]
+
+class TestComplexityGuard(unittest.TestCase):
+    def test_rejects_adversarial_inputs(self):
+        for (response, limit) in ADVERSARIAL:
+            with self.subTest(response=response[:40]):
+                start = time.perf_counter()
+                error = grade(response)["error"]
+
+                self.assertLess(time.perf_counter() - start, 0.5)
+                self.assertEqual(error["message"], "The response is too complex to grade.")
+                self.assertEqual(error["limit"], limit)
+                self.assertIn("maximum", error)
+
+    def test_accepts_inputs_under_the_limits(self):
+        for response in ACCEPTED:
+            with self.subTest(response=response[:40]):
+                self.assertIn("preview", grade(response)["result"])
+
+    def test_fuzz_corpus(self):
+        for response in fuzz_corpus(0, 300):
+            with self.subTest(response=response):
+                start = time.perf_counter()
+                output = grade(response)
+
+                self.assertLess(time.perf_counter() - start, 1.0)
+
+                if "error" in output:
+                    self.assertIn(output["error"].get("limit"), LIMITS)
+                else:
+                    self.assertIn("preview", output["result"])
+
+    def test_limits_from_params(self):
+        self.assertEqual(grade("x + y + z", {"complexity": {"max_nodes": 3}})["error"]["limit"], "max_nodes")
+        self.assertEqual(grade("2^20", {"complexity": {"max_digits": 5}})["error"]["limit"], "max_digits")
+        self.assertIn("result", grade("1200!", {"complexity": {"max_factorial": 1200}}))
+
+        # Limits that aren't positive integers are ignored
+        limits = get_limits({"complexity": {"max_nodes": -1, "max_depth": True, "max_length": "10"}})
+        self.assertEqual(
+            (limits.max_nodes, limits.max_depth, limits.max_length),
+            (get_limits({}).max_nodes, get_limits({}).max_depth, get_limits({}).max_length))
+
+    def test_preview_mode(self):
+        params = {"complexity": {"mode": "preview"}}
+
+        result = grade("9^9^9^9 + x", params)["result"]
+        self.assertFalse(result["is_correct"])
+        self.assertEqual(result["preview"]["latex"], "9^{9^{9^{9}}} + x")
+        self.assertEqual(result["complexity"]["limit"], "max_digits")
+
+        result = grade("x^(10^9)", {**params, "session": "complexity"})["result"]
+        self.assertEqual(result["preview"]["sympy"], "x**(10**9)")
+
+        # Too large to preview as well
+        self.assertEqual(grade("x " * 6000, params)["error"]["limit"], "max_length")
+
+    def test_batch_items(self):
+        body = {"answer": "x", "items": [{"response": "9^9^9^9"}, {"response": "x"}]}
+        results = handler({"headers": {"command": "grade_batch"}, "body": json.dumps(body)})["result"]["results"]
+
+        self.assertEqual(results[0]["error"]["limit"], "max_digits")
+        self.assertIn("result", results[1])
+
+    def test_error_survives_pickling(self):
+        with self.assertRaises(ComplexityError) as context:
+            parse_checked("100000!")
+
+        copy = pickle.loads(pickle.dumps(context.exception))
+        self.assertEqual(copy.error, context.exception.error)
+
+    def test_guard_is_cheap(self):
+        tree = parse("sin(x)^2/(1 + x^3) + 3x y - sqrt(z) + 2^10 - 5!")
+        count = 2000
+
+        start = time.perf_counter()
+
+        for _ in range(count):
+            check_tree(tree)
+
+        self.assertLess((time.perf_counter() - start) / count, 100e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+import os
+import time
+import asyncio
+import threading
+from unittest import mock
+
+from ..tools import sandbox
+from ..tools.cache import LRUCache
+from ..tools.deadline import GradingTimeout, checkpoint, get_deadline, run_with_deadline
+from ..tools.handler import async_handler
+from .sandbox import grade
+
+def grade_event(params):
+    return {
+        "body": {"response": "x", "answer": "x", "params": params},
+        "headers": {"command": "grade"}
+    }
+
+class TestGradingDeadline(unittest.TestCase):
+    def test_get_deadline(self):
+        with mock.patch.dict(os.environ, {"GRADING_TIMEOUT": "3"}):
+            self.assertEqual(get_deadline({"grading_timeout": 0.5}), 0.5)
+            self.assertEqual(get_deadline({}), 3)
+            self.assertEqual(get_deadline({"grading_timeout": "soon"}), 3)
+            self.assertEqual(get_deadline({"grading_timeout": True}), 3)
+
+        with mock.patch.dict(os.environ, {"GRADING_TIMEOUT": ""}):
+            self.assertIsNone(get_deadline({}))
+
+    def test_finishes_before_deadline(self):
+        result = asyncio.run(run_with_deadline(sum, [1, 2, 3], timeout=5))
+        self.assertEqual(result, 6)
+
+    def test_cancels_after_deadline(self):
+        stopped = threading.Event()
+
+        def spin():
+            try:
+                while True:
+                    try:
+                        checkpoint()
+                    except Exception:
+                        pass
+            finally:
+                stopped.set()
+
+        with self.assertRaises(GradingTimeout):
+            asyncio.run(run_with_deadline(spin, timeout=0.1))
+
+        self.assertTrue(stopped.wait(5))
+
+    def test_async_handler_grades(self):
+        response = asyncio.run(async_handler(grade_event({"grading_timeout": 5})))
+
+        self.assertEqual(response.get("command"), "grade")
+        self.assertTrue(response.get("result").get("is_correct"))
+
+    def test_async_handler_timeout_error(self):
+        def slow_grading_function(response, answer, params):
+            deadline = time.monotonic() + 10
+
+            while time.monotonic() < deadline:
+                checkpoint()
+
+            return {"is_correct": True}
+
+        handler_module = async_handler.__module__
+
+        with mock.patch(f"{handler_module}.grading_function", slow_grading_function):
+            start = time.monotonic()
+            response = asyncio.run(async_handler(grade_event({"grading_timeout": 0.2})))
+
+        self.assertLess(time.monotonic() - start, 5)
+
+        error = response.get("error")
+        self.assertEqual(
+            error.get("message"), "The grading function did not finish before the deadline.")
+        self.assertEqual(error.get("timeout"), 0.2)
+
+    def test_cancelled_request_leaves_caches_usable(self):
+        cache = LRUCache(maxsize=50, maxbytes=1000)
+        stopped = threading.Event()
+
+        def caching_grading_function(response, answer, params):
+            try:
+                for i in range(10 ** 9):
+                    checkpoint()
+                    cache.put(i, [i], i % 7)
+                    cache.get(i // 2)
+            finally:
+                stopped.set()
+
+        handler_module = async_handler.__module__
+
+        with mock.patch(f"{handler_module}.grading_function", caching_grading_function):
+            response = asyncio.run(async_handler(grade_event({"grading_timeout": 0.2})))
+
+        self.assertEqual(response["error"]["timeout"], 0.2)
+        self.assertTrue(stopped.wait(5))
+
+        # The cancelled call never stopped in the middle of an update
+        self.assertEqual(cache.nbytes, sum(nbytes for (_, _, nbytes) in cache._entries.values()))
+        self.assertLessEqual(len(cache), 50)
+        self.assertTrue(cache._lock.acquire(timeout=1))
+        cache._lock.release()
+
+        response = asyncio.run(async_handler(grade_event({"grading_timeout": 5})))
+        self.assertTrue(response["result"]["is_correct"])
+
+    def test_sandbox_enforces_deadline(self):
+        handler_module = async_handler.__module__
+
+        with mock.patch.dict(os.environ, {"GRADING_SANDBOX": "1"}), \
+                mock.patch(f"{handler_module}.grading_function", grade):
+            self.addCleanup(sandbox.close_pool)
+
+            event = grade_event({"grading_timeout": 0.5})
+            event["body"]["response"] = "sleep"
+
+            start = time.monotonic()
+            response = asyncio.run(async_handler(event))
+
+            # The only worker was killed, rather than left sleeping
+            event["body"]["response"] = "x"
+            graded = asyncio.run(async_handler(event))
+            elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 5)
+        self.assertEqual(response["error"]["timeout"], 0.5)
+        self.assertTrue(graded["result"]["is_correct"])
+
+    def test_async_handler_rejects_long_calls_into_c(self):
+        calls = []
+
+        def unguarded_grading_function(response, answer, params):
+            calls.append(threading.get_ident())
+
+            # One call into C that the deadline can't interrupt
+            return {"is_correct": 9 ** 9 ** 9 > 0}
+
+        handler_module = async_handler.__module__
+        threads = threading.active_count()
+
+        with mock.patch(f"{handler_module}.grading_function", unguarded_grading_function):
+            start = time.monotonic()
+            event = grade_event({"grading_timeout": 0.2})
+            event["body"]["response"] = "9^9^9"
+            response = asyncio.run(async_handler(event))
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(response["error"]["limit"], "max_digits")
+        self.assertEqual(calls, [])
+        self.assertLessEqual(threading.active_count(), threads)
+
+    def test_async_handler_other_commands(self):
+        response = asyncio.run(async_handler({"headers": {"command": "not a command"}}))
+
+        self.assertIn("Unknown command", response.get("error").get("message"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -26,5 +26,18 @@ class TestGradingFunction(unittest.TestCase):
         
         self.assertEqual(result.get("is_correct"), True)
 
+    def test_previews_response(self):
+        result = grading_function("2x^2 - sin x", "x", dict())
+
+        self.assertEqual(result.get("is_correct"), True)
+        self.assertEqual(result["preview"]["sympy"], "2*x**2 - sin(x)")
+        self.assertEqual(result["preview"]["latex"], "2 x^{2} - \\sin{\\left(x \\right)}")
+
+    def test_previews_parse_error(self):
+        result = grading_function("x +", "x", dict())
+
+        self.assertEqual(result.get("is_correct"), False)
+        self.assertEqual(result["preview"]["position"], 3)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,5 +1,6 @@
 import unittest
 import pprint
+from unittest import mock
 
 from ..tools.handler import handler
 
@@ -76,6 +77,142 @@ class TestHandlerFunction(unittest.TestCase):
         result = self.__response.get("result")
         self.assertTrue(result.get("is_correct"))
 
+    def test_grade_batch(self):
+        event = {
+            "random": "metadata",
+            "body": {
+                "answer": "world!",
+                "params": {},
+                "items": [
+                    {"response": "hello"},
+                    {"response": "hi"},
+                    {"response": "hey"}
+                ]
+            },
+            "headers": {
+                "command": "grade_batch"
+            }
+        }
+
+        self.__response = handler(event)
+        self.assertEqual(self.__response.get("command"), "grade_batch")
+
+        results = self.__response.get("result").get("results")
+        self.assertEqual(len(results), 3)
+
+        for item in results:
+            self.assertTrue(item.get("result").get("is_correct"))
+
+    def test_grade_batch_item_overrides_shared_fields(self):
+        event = {
+            "body": {
+                "answer": "shared",
+                "params": {"shared": True},
+                "items": [
+                    {"response": "a"},
+                    {"response": "b", "answer": "own"},
+                    {"response": "c", "params": {"own": True}}
+                ]
+            },
+            "headers": {
+                "command": "grade_batch"
+            }
+        }
+
+        with mock.patch(
+                f"{handler.__module__}.grading_function",
+                side_effect=lambda r, a, p: {"is_correct": True, "seen": [r, a, p]}):
+            self.__response = handler(event)
+
+        seen = [item["result"]["seen"] for item in self.__response["result"]["results"]]
+
+        self.assertEqual(seen, [
+            ["a", "shared", {"shared": True}],
+            ["b", "own", {"shared": True}],
+            ["c", "shared", {"shared": True, "own": True}]
+        ])
+
+    def test_grade_batch_bad_items(self):
+        event = {
+            "body": {
+                "answer": "world!",
+                "items": [
+                    {"response": "hello"},
+                    {"answer": "no response"},
+                    "not an object",
+                    {"response": "hi", "hello": "world"}
+                ]
+            },
+            "headers": {
+                "command": "grade_batch"
+            }
+        }
+
+        self.__response = handler(event)
+        results = self.__response.get("result").get("results")
+
+        self.assertTrue(results[0].get("result").get("is_correct"))
+
+        self.assertEqual(
+            results[1].get("error").get("error_thrown").get("message"),
+            "'response' is a required property")
+
+        self.assertEqual(
+            results[2].get("error").get("error_thrown").get("message"),
+            "'not an object' is not of type 'object'")
+
+        self.assertEqual(
+            results[3].get("error").get("error_thrown").get("message"),
+            "Additional properties are not allowed ('hello' was unexpected)")
+
+    def test_grade_batch_grading_errors(self):
+        def grading_function(response, answer, params):
+            if response == "raise":
+                raise ValueError("bad response")
+
+            if response == "invalid":
+                return {"feedback": "no is_correct"}
+
+            return {"is_correct": True}
+
+        event = {
+            "body": {
+                "answer": "world!",
+                "items": [{"response": "raise"}, {"response": "invalid"}, {"response": "ok"}]
+            },
+            "headers": {
+                "command": "grade_batch"
+            }
+        }
+
+        with mock.patch(f"{handler.__module__}.grading_function", grading_function):
+            self.__response = handler(event)
+
+        results = self.__response.get("result").get("results")
+
+        self.assertEqual(results[0].get("error").get("description"), "bad response")
+        self.assertEqual(
+            results[1].get("error").get("error_thrown").get("message"),
+            "'is_correct' is a required property")
+        self.assertTrue(results[2].get("result").get("is_correct"))
+
+    def test_grade_batch_missing_items(self):
+        event = {
+            "body": {
+                "answer": "world!"
+            },
+            "headers": {
+                "command": "grade_batch"
+            }
+        }
+
+        self.__response = handler(event)
+        error = self.__response.get("error")
+
+        self.assertEqual(
+            error.get("message"),
+            "Schema threw an error when validating the batch request body.")
+
     def test_healthcheck(self):
         event = {
             "random": "metadata",
@@ -106,7 +243,7 @@ class TestHandlerFunction(unittest.TestCase):
     
         self.assertEqual(
             error.get("message"),
-            "Unknown command 'not a command'. Only 'grade' and 'healthcheck' are allowed.")
+            "Unknown command 'not a command'. Only 'grade', 'grade_batch' and 'healthcheck' are allowed.")
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
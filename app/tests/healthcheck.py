@@ -0,0 +1,163 @@
+import unittest
+import os
+import sys
+import threading
+from unittest import mock
+
+from ..tools import healthcheck as hc
+from ..tools.healthcheck import BenchmarkRunner, healthcheck, percentiles
+from ..tools.handler import handler
+
+# Only run by the tests below
+class Counted(unittest.TestCase):
+    __test__ = False
+    calls = 0
+
+    def test_counted(self):
+        Counted.calls += 1
+
+class Failing(unittest.TestCase):
+    __test__ = False
+
+    def test_fails(self):
+        self.fail("always fails")
+
+    def test_raises(self):
+        raise RuntimeError("always raises")
+
+# Each of these waits for the other two, so they only pass if run at the same time
+barrier = threading.Barrier(3, timeout=5)
+
+class Concurrent(unittest.TestCase):
+    __test__ = False
+
+    def test_wait(self):
+        barrier.wait()
+
+class ConcurrentToo(Concurrent):
+    pass
+
+class ConcurrentThree(Concurrent):
+    pass
+
+def suite_of(*cases):
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(c) for c in cases])
+
+class TestHealthcheckBenchmark(unittest.TestCase):
+    def setUp(self):
+        hc.clear_cache()
+
+    def test_percentiles(self):
+        latency = percentiles([1000 * n for n in range(100, 0, -1)])
+
+        self.assertEqual(latency, {"min": 1, "median": 50, "p95": 95, "p99": 99})
+        self.assertEqual(percentiles([2500]), {"min": 2.5, "median": 2.5, "p95": 2.5, "p99": 2.5})
+
+    def test_runs_each_test_after_warm_up(self):
+        Counted.calls = 0
+        result = BenchmarkRunner(runs=5, warmup=2).run(suite_of(Counted))
+
+        # Warm-up, timed runs and one run measuring memory
+        self.assertEqual(Counted.calls, 2 + 5 + 1)
+        self.assertTrue(result["tests_passed"])
+
+        success = result["successes"][0]
+        self.assertEqual(success["runs"], 5)
+        self.assertEqual(set(success["latency_us"]), {"min", "median", "p95", "p99"})
+        self.assertEqual(set(success["memory_bytes"]), {"delta", "peak"})
+        self.assertLessEqual(success["latency_us"]["min"], success["latency_us"]["p99"])
+
+    def test_failures_and_errors(self):
+        result = BenchmarkRunner(runs=3).run(suite_of(Failing))
+
+        self.assertFalse(result["tests_passed"])
+        self.assertEqual(result["successes"], [])
+        self.assertEqual([f["name"] for f in result["failures"]], [Failing("test_fails").id()])
+        self.assertEqual([e["name"] for e in result["errors"]], [Failing("test_raises").id()])
+
+    def test_budgets_fail_slow_tests(self):
+        budgets = {"*Counted*": {"p95": 0}, "*Other*": {"p95": 0}}
+        result = BenchmarkRunner(runs=3, budgets=budgets).run(suite_of(Counted))
+
+        self.assertFalse(result["tests_passed"])
+        self.assertEqual(result["successes"], [])
+        self.assertIn("p95 latency", result["failures"][0]["message"])
+
+        result = BenchmarkRunner(runs=3, budgets={"*": {"p99": 1e9}}).run(suite_of(Counted))
+        self.assertTrue(result["tests_passed"])
+
+    def test_plain_healthcheck_is_unchanged(self):
+        with mock.patch.dict(os.environ, {"HEALTHCHECK_RUNS": ""}):
+            result = healthcheck()
+
+        self.assertTrue(result["tests_passed"])
+        self.assertEqual(set(result["successes"][0]), {"name", "time"})
+
+    def test_benchmark_through_handler(self):
+        env = {"HEALTHCHECK_RUNS": "3", "HEALTHCHECK_BUDGETS": '{"*": {"p99": 1e9}}'}
+
+        with mock.patch.dict(os.environ, env):
+            response = handler({"headers": {"command": "healthcheck"}})
+
+        self.assertNotIn("error", response)
+        self.assertTrue(response["result"]["tests_passed"])
+        self.assertTrue(all(s["runs"] == 3 for s in response["result"]["successes"]))
+
+class TestHealthcheckConcurrency(unittest.TestCase):
+    def setUp(self):
+        hc.clear_cache()
+        self.addCleanup(hc.clear_cache)
+
+    def test_suites_run_concurrently(self):
+        barrier.reset()
+
+        with mock.patch.object(hc, "SUITES", (Concurrent, ConcurrentToo, ConcurrentThree)):
+            result = healthcheck(max_age=0)
+
+        self.assertTrue(result["tests_passed"], result)
+        self.assertEqual(len(result["successes"]), 3)
+
+    def test_results_keep_suite_order(self):
+        result = healthcheck(max_age=0)
+        names = [t["name"] for t in result["successes"]]
+
+        self.assertIn("TestRequestValidation", names[0])
+        self.assertIn("TestGradingFunction", names[-1])
+
+    def test_stderr_is_left_alone(self):
+        stderr = sys.stderr
+        healthcheck(max_age=0)
+
+        self.assertIs(sys.stderr, stderr)
+
+    def test_result_is_cached(self):
+        with mock.patch.object(hc, "run_healthcheck", wraps=hc.run_healthcheck) as run:
+            first = healthcheck(max_age=60)
+            first["caches"] = {}
+            second = healthcheck(max_age=60)
+
+            self.assertEqual(run.call_count, 1)
+            self.assertNotIn("caches", second)
+
+            healthcheck(max_age=0)
+            self.assertEqual(run.call_count, 2)
+
+            healthcheck(runs=2, max_age=60)
+            self.assertEqual(run.call_count, 3)
+
+    def test_concurrent_probes_share_one_run(self):
+        with mock.patch.object(hc, "run_healthcheck", wraps=hc.run_healthcheck) as run:
+            threads = [threading.Thread(target=healthcheck, kwargs={"max_age": 60}) for _ in range(8)]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(run.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
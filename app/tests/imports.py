@@ -0,0 +1,81 @@
+import unittest
+import os
+import sys
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PACKAGE = __name__.split(".")[0]
+
+# Modules that must only be imported when a request needs them
+DEFERRED = [
+    "unittest", f"{PACKAGE}.tests", f"{PACKAGE}.tools.healthcheck",
+    "jsonschema", "requests", "multiprocessing", "asyncio", "ctypes", "sympy", "numpy"
+]
+
+def import_profile(code):
+    """
+    Function to run `code` in a fresh interpreter with `-X importtime`.
+    ---
+    Returns a dictionary of each imported module to its self and cumulative import
+    time in microseconds.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, check=True, capture_output=True, text=True)
+
+    profile = {}
+
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+
+    return profile
+
+def report(profile, top=15):
+    """
+    Function to format the slowest imports, by cumulative time, as a table.
+    """
+    slowest = sorted(profile.items(), key=lambda item: -item[1][1])[:top]
+
+    return "\n".join(
+        f"{cumulative:>10}us {self_time:>10}us  {name}"
+        for name, (self_time, cumulative) in slowest)
+
+class TestImportTime(unittest.TestCase):
+    def assertDeferred(self, profile, needed=()):
+        imported = [name for name in DEFERRED if name in profile and name not in needed]
+
+        self.assertEqual(
+            imported, [], f"Imported on the cold path:\n{report(profile)}")
+
+    def test_handler_import(self):
+        profile = import_profile(f"import {PACKAGE}.tools.handler")
+        self.assertDeferred(profile)
+
+        budget_us = 1000 * float(os.environ.get("IMPORT_TIME_BUDGET_MS", 100))
+        _, cumulative_us = profile[f"{PACKAGE}.tools"]
+
+        self.assertLess(
+            cumulative_us, budget_us,
+            f"Importing {PACKAGE}.tools took {cumulative_us}us:\n{report(profile)}")
+
+    def test_first_valid_grade(self):
+        profile = import_profile(
+            f"from {PACKAGE}.tools.handler import handler; "
+            "handler({'body': {'response': 'x', 'answer': 'x'}})")
+
+        # Grading parses the response with SymPy, which imports ctypes itself
+        self.assertDeferred(profile, needed=("sympy", "ctypes"))
+
+    def test_invalid_request_imports_jsonschema(self):
+        profile = import_profile(
+            f"from {PACKAGE}.tools.handler import handler; "
+            "handler({'body': {'answer': 'x'}})")
+
+        self.assertIn("jsonschema", profile)
+
+if __name__ == "__main__":
+    unittest.main()
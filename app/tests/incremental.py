@@ -0,0 +1,155 @@
+import unittest
+import random
+from unittest import mock
+
+import sympy
+
+from ..algorithm import grading_function
+from ..symbolic import incremental
+from ..symbolic.complexity import ComplexityError
+from ..symbolic.incremental import preview_incremental, session_cache
+from ..symbolic.normalize import parse_expression
+from ..symbolic.parser import ParseError, Parser
+from ..symbolic.render import render_text
+from .normalize import SAME, corpus
+
+TERMS = ["x", "2y", "3x^2", "sin(x)", "(a+b)^2", "-z", "x*-y", "2^-1", "n!", "sqrt(x + 1)", "(x - (y + 1))"]
+EDITS = list("xy12+-*^() ") + ["sin(", "+ x", "- (", ")^2"]
+
+def preview_or_error(session, text, preview=preview_incremental):
+    try:
+        return preview(session, text)
+    except ParseError as e:
+        return {"error": str(e), "position": e.position}
+    except ComplexityError as e:
+        return {"complexity": e.error}
+
+def full_preview(session, text):
+    return render_text(text)
+
+def long_expression(rng, count):
+    text = rng.choice(TERMS)
+
+    for _ in range(count - 1):
+        text += rng.choice([" + ", " - ", "+", "-"]) + rng.choice(TERMS)
+
+    return text
+
+def edit(rng, text):
+    position = rng.randint(0, len(text))
+    action = rng.choice(["insert", "delete", "replace"])
+
+    if action == "insert" or not text:
+        return text[:position] + rng.choice(EDITS) + text[position:]
+
+    end = min(len(text), position + rng.randint(1, 4))
+
+    if action == "delete":
+        return text[:position] + text[end:]
+
+    return text[:position] + rng.choice(EDITS) + text[end:]
+
+class TestIncrementalPreview(unittest.TestCase):
+    def setUp(self):
+        session_cache.clear()
+
+    def test_edits_match_fresh_previews(self):
+        rng = random.Random(0)
+
+        for sequence in range(40):
+            text = long_expression(rng, rng.randint(1, 12))
+            session = f"edits-{sequence}"
+
+            for step in range(25):
+                with self.subTest(text=text):
+                    self.assertEqual(
+                        preview_or_error(session, text),
+                        preview_or_error(f"fresh-{sequence}-{step}", text))
+
+                text = edit(rng, text)
+
+    def test_terms_add_up_to_the_expression(self):
+        rng = random.Random(1)
+        text = long_expression(rng, 30)
+
+        for _ in range(50):
+            try:
+                preview_incremental("sum", text)
+            except ParseError:
+                pass
+            else:
+                terms = session_cache.get("sum").terms
+                total = sympy.Add(*[t.expression for t in terms])
+
+                self.assertEqual(total, parse_expression(text))
+
+            text = edit(rng, text)
+
+    def test_only_edited_terms_are_parsed(self):
+        text = " + ".join(f"{i}x^{i}" for i in range(200))
+        preview_incremental("long", text)
+
+        with mock.patch.object(incremental, "Parser", wraps=Parser) as parser:
+            for suffix in [" +", " + s", " + si", " + sin(", " + sin(x", " + sin(x)"]:
+                preview_or_error("long", text + suffix)
+
+            text += " + sin(x)"
+            middle = text.index("100x^100")
+            preview = preview_incremental("long", text[:middle] + "7" + text[middle:])
+
+        self.assertLessEqual(parser.call_count, 6 * 2 + 3)
+        self.assertIn("7100 x^{100}", preview["latex"])
+
+    def test_work_does_not_grow_with_the_response(self):
+        counts = []
+
+        for length in (10, 100, 300):
+            text = " + ".join(f"{i + 1}x^{i % 7}y" for i in range(length))
+            preview_incremental(f"length-{length}", text)
+
+            with mock.patch.object(incremental, "Parser", wraps=Parser) as parser, \
+                    mock.patch.object(incremental, "measure_tree", wraps=incremental.measure_tree) as measure, \
+                    mock.patch.object(incremental, "key_expression", wraps=incremental.key_expression) as build, \
+                    mock.patch.object(incremental, "render", wraps=incremental.render) as render, \
+                    mock.patch.object(incremental, "parse_checked") as parse_checked:
+                for typed in [" + 2x", " + 2x^", " + 2x^8", " + 2x^8 - z", " - z"]:
+                    with self.subTest(length=length, typed=typed):
+                        self.assertEqual(preview_or_error(f"length-{length}", text + typed),
+                                         preview_or_error(None, text + typed, full_preview))
+
+            counts.append((parser.call_count, measure.call_count, build.call_count, render.call_count))
+
+            # Neither the whole response nor the whole sum is looked at
+            parse_checked.assert_not_called()
+            self.assertEqual(max(len(sympy.Add.make_args(call.args[0])) for call in render.call_args_list), 1)
+
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_matches_full_previews(self):
+        rng = random.Random(2)
+        texts = corpus(300) + [form for forms in SAME for form in forms] + [
+            "x - x", "y + x", "a - -b", "y - (a + b) + x", "2x + 3x - x^2", "9^9^9 + x", "x +"]
+
+        for sequence, text in enumerate(texts):
+            session = f"corpus-{sequence}"
+
+            for step in range(3):
+                with self.subTest(text=text):
+                    self.assertEqual(preview_or_error(session, text), preview_or_error(session, text, full_preview))
+
+                text = edit(rng, text)
+
+        self.assertEqual(preview_incremental("order", "y - (a + b) + x")["sympy"], "-a - b + x + y")
+
+    def test_grading_function_session(self):
+        params = {"session": "grading"}
+
+        self.assertEqual(grading_function("x + 2y", "x", params)["preview"]["sympy"], "x + 2*y")
+        self.assertEqual(grading_function("x + 2y^", "x", params)["preview"]["position"], 7)
+        self.assertEqual(grading_function("x + 2y^2", "x", params)["preview"]["sympy"], "x + 2*y**2")
+
+        self.assertIn("grading", session_cache._entries)
+
+
+if __name__ == "__main__":
+    unittest.main()
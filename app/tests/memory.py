@@ -0,0 +1,137 @@
+import unittest
+import tracemalloc
+from unittest import mock
+
+from ..tools import memory, timing
+from ..tools.handler import handler
+
+GRADE_STAGES = {"parse_body", "validate_request", "grading_function", "validate_response"}
+
+def grade_event(headers=None, response="x"):
+    return {
+        "body": {"response": response, "answer": "x"},
+        "headers": {"command": "grade", **(headers or {})}
+    }
+
+class TestMemoryProfiling(unittest.TestCase):
+    def setUp(self):
+        self.log = mock.patch.object(timing, "log").start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(self.stop_tracing)
+
+    def stop_tracing(self):
+        memory.enable(False)
+        memory._previous = None
+        memory._active = 0
+
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def test_debug_header_returns_memory(self):
+        response = handler(grade_event({"debug": "memory"}))
+        usage = response["memory"]
+
+        self.assertTrue(response["result"]["is_correct"])
+        self.assertNotIn("timings", response)
+        self.assertEqual(set(usage["stages"]), GRADE_STAGES)
+        self.assertEqual(set(usage), {"peak", "net", "blocks", "stages", "over_budget"})
+        self.assertGreaterEqual(usage["peak"], usage["stages"]["grading_function"]["peak"])
+
+        # Tracing was only on for the request
+        self.assertFalse(tracemalloc.is_tracing())
+
+        record = self.log.call_args[0][0]
+        self.assertEqual((record["event"], record["command"]), ("memory", "grade"))
+
+    def test_overlapping_requests(self):
+        first = memory.start({"debug": "memory"})
+        second = memory.start({"debug": "memory"})
+
+        # The first to finish leaves tracing on for the other
+        memory.finish(first, "grade")
+        self.assertTrue(tracemalloc.is_tracing())
+
+        third = memory.start({"debug": "memory"})
+        memory.finish(second, "grade")
+        self.assertTrue(tracemalloc.is_tracing())
+
+        usage = memory.finish(third, "grade")
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreaterEqual(usage["peak"], 0)
+
+    def test_memory_and_timings(self):
+        response = handler(grade_event({"debug": "timings, memory"}))
+
+        self.assertEqual(set(response["memory"]["stages"]), GRADE_STAGES)
+        self.assertEqual(set(response["timings"]), GRADE_STAGES | {"total"})
+        self.assertEqual([call[0][0]["event"] for call in self.log.call_args_list], ["timings", "memory"])
+
+    def test_off_by_default(self):
+        response = handler(grade_event())
+
+        self.assertNotIn("memory", response)
+        self.log.assert_not_called()
+        self.assertIs(timing.stage("anything"), timing.NULL_STAGE)
+
+    def test_budget(self):
+        requests, over_budget = memory.counters["requests"], memory.counters["over_budget"]
+
+        with mock.patch.object(memory, "BUDGET_BYTES", 1):
+            usage = handler(grade_event({"debug": "memory"}, response="x^2 + 3x"))["memory"]
+
+        self.assertTrue(usage["over_budget"])
+        self.assertEqual(self.log.call_args[0][0]["budget"], 1)
+        self.assertEqual(memory.counters["requests"] - requests, 1)
+        self.assertEqual(memory.counters["over_budget"] - over_budget, 1)
+
+        with mock.patch.object(memory, "BUDGET_BYTES", 10 ** 12):
+            self.assertFalse(handler(grade_event({"debug": "memory"}))["memory"]["over_budget"])
+
+    @unittest.skipUnless(hasattr(tracemalloc, "reset_peak"), "The peak can't be reset before Python 3.9")
+    def test_peak_of_freed_memory(self):
+        tracker = memory.Tracker()
+
+        tracker.enter()
+        buffer = bytearray(10 ** 6)
+        del buffer
+        tracker.exit("temporary")
+
+        tracker.enter()
+        tracker.exit("empty")
+
+        usage = tracker.result()
+
+        self.assertGreaterEqual(usage["stages"]["temporary"]["peak"], 10 ** 6)
+        self.assertLess(usage["stages"]["temporary"]["net"], 10 ** 5)
+        self.assertLess(usage["stages"]["empty"]["peak"], 10 ** 5)
+        self.assertGreaterEqual(usage["peak"], 10 ** 6)
+
+    def test_healthcheck_report(self):
+        healthcheck = {"headers": {"command": "healthcheck", "debug": "memory"}}
+
+        # Without tracing on for every request, there are no allocation sites to report
+        report = handler(healthcheck)["result"]["memory"]
+        self.assertFalse(report["tracing"])
+        self.assertNotIn("top", report)
+
+        memory.enable()
+
+        with mock.patch.object(memory, "TOP_SITES", 3):
+            handler(grade_event())
+            report = handler(healthcheck)["result"]["memory"]
+
+            self.assertTrue(report["tracing"])
+            self.assertEqual(len(report["top"]), 3)
+            self.assertEqual(set(report["top"][0]), {"site", "bytes", "blocks"})
+            self.assertNotIn("growth", report)
+
+            leak = [bytearray(1000) for _ in range(100)]
+            report = handler(healthcheck)["result"]["memory"]
+
+            self.assertIn(__file__, [site["site"].rsplit(":", 1)[0] for site in report["growth"]])
+            del leak
+
+        self.assertNotIn("memory", handler({"headers": {"command": "healthcheck"}})["result"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+import math
+import cmath
+import random
+from unittest import mock
+
+import sympy
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations, convert_xor
+
+from ..symbolic import normalize
+from ..symbolic.complexity import Limits
+from ..symbolic.normalize import expression_cache, parse_expression, structural_key, to_sympy
+from ..symbolic.parser import ParseError, parse
+
+SAME = [
+    ["x+y", "y + x", "(x)+((y))", " x +y "],
+    ["2x", "2*x", "x*2", "x 2", "(2)(x)"],
+    ["a-b", "-b+a", "a + -b"],
+    ["(a+b)+c", "a+(b+c)", "c+b+a", "b + (c + a)"],
+    ["x/y*z", "z*x/y", "x*(z/y)"],
+    ["x^2", "x**2", "(x)^(2)"],
+    ["sin x + 1", "1 + sin(x)", "(sin(x))+1"],
+    ["n! * m!", "factorial(m) factorial(n)"],
+]
+
+DIFFERENT = [
+    ("x-y", "y-x"), ("x/y", "y/x"), ("x^y^z", "(x^y)^z"), ("-x^2", "(-x)^2"),
+    ("2x", "x2"), ("xy", "x y"), ("x - (y + z)", "x - y + z"), ("sin x y", "sin(x y)"),
+    ("(0.1+0.2)+0.3", "0.1+(0.2+0.3)"), ("0.1*(0.2*0.3)", "(0.1*0.2)*0.3"), ("1.0", "1"),
+    ("x!^2", "(x^2)!"), ("e", "E"), ("2^-1", "2^1"), ("a/b/c", "a/(b/c)"), ("X", "x"),
+]
+
+# The random corpora have powers of powers that the complexity guard would reject
+UNLIMITED = Limits(*[math.inf] * 6)
+
+TRANSFORMATIONS = standard_transformations + (convert_xor,)
+
+def random_expression(rng, depth=0):
+    """
+    Function to write a random expression with explicit operators and random spacing
+    and redundant parentheses.
+    """
+    if depth > 3 or rng.random() < 0.3:
+        text = rng.choice(["x", "y", "z", "a", "0", "1", "2", "3", "12", "0.5", "0.1", "2.5"])
+    else:
+        operator = rng.choice(["+", "-", "*", "/", "^", "neg", "sin", "sqrt"])
+
+        if operator == "neg":
+            text = "-" + random_expression(rng, depth + 1)
+        elif operator in ("sin", "sqrt"):
+            text = f"{operator}({random_expression(rng, depth + 1)})"
+        else:
+            left = random_expression(rng, depth + 1)
+            right = random_expression(rng, depth + 1)
+            space = rng.choice(["", " "])
+            text = f"{left}{space}{operator}{space}{right}"
+
+    # Outer parentheses are always safe, and sometimes redundant
+    return f"({text})" if depth > 0 else text
+
+def corpus(count, seed=0):
+    rng = random.Random(seed)
+    return [random_expression(rng) for _ in range(count)]
+
+class TestExpressionNormalization(unittest.TestCase):
+    def test_equivalent_forms_share_a_key(self):
+        for forms in SAME:
+            with self.subTest(forms=forms):
+                keys = {structural_key(form) for form in forms}
+                self.assertEqual(len(keys), 1)
+
+    def test_different_expressions_have_different_keys(self):
+        for (first, second) in DIFFERENT:
+            with self.subTest(first=first, second=second):
+                self.assertNotEqual(structural_key(first), structural_key(second))
+
+    def test_canonical_form_keeps_the_expression(self):
+        # If the canonical tree gave a different expression, every text sharing its
+        # key would get the wrong one from the cache
+        for text in corpus(1500) + [t for pair in DIFFERENT for t in pair]:
+            with self.subTest(text=text):
+                try:
+                    written = to_sympy(parse(text))
+                except (ZeroDivisionError, ValueError):
+                    continue
+
+                self.assertEqual(to_sympy(structural_key(text, UNLIMITED)), written)
+
+    def test_texts_sharing_a_key_are_equal(self):
+        groups = {}
+
+        for text in corpus(3000, seed=1) + [t for forms in SAME for t in forms]:
+            groups.setdefault(structural_key(text, UNLIMITED), []).append(text)
+
+        merged = [texts for texts in groups.values() if len(texts) > 1]
+        self.assertGreater(len(merged), 10)
+
+        for texts in merged:
+            with self.subTest(texts=texts):
+                expressions = {sympy.srepr(to_sympy(parse(text))) for text in texts}
+                self.assertEqual(len(expressions), 1)
+
+    def test_matches_sympy_parser(self):
+        values = {sympy.Symbol(name): sympy.Rational(i + 2, 7) for (i, name) in enumerate("xyza")}
+
+        for text in corpus(500, seed=2):
+            with self.subTest(text=text):
+                ours = to_sympy(parse(text))
+                theirs = parse_expr(text, transformations=TRANSFORMATIONS)
+
+                if "." not in text:
+                    self.assertEqual(ours, theirs)
+                    continue
+
+                # Decimals may be rounded in a different order, so compare values
+                ours, theirs = complex(ours.subs(values)), complex(theirs.subs(values))
+
+                if not cmath.isfinite(theirs):
+                    self.assertFalse(cmath.isfinite(ours))
+                else:
+                    self.assertAlmostEqual(abs(ours - theirs) / max(1, abs(theirs)), 0, places=9)
+
+    def test_parse_errors(self):
+        for (text, position) in [("x+", 2), ("", 0), ("2 @ x", 2), ("(x", 2), ("x)", 1), ("sin()", 4)]:
+            with self.subTest(text=text):
+                with self.assertRaises(ParseError) as context:
+                    parse(text)
+
+                self.assertEqual(context.exception.position, position)
+
+    def test_cache_hits_for_equivalent_forms(self):
+        expression_cache.clear()
+        hits, misses = expression_cache.hits, expression_cache.misses
+
+        expressions = [parse_expression(form) for form in SAME[3]]
+
+        self.assertEqual(expression_cache.misses - misses, 1)
+        self.assertEqual(expression_cache.hits - hits, len(SAME[3]) - 1)
+        self.assertTrue(all(e is expressions[0] for e in expressions))
+
+    def test_cache_is_bounded(self):
+        cache = normalize.LRUCache(maxsize=1000, maxbytes=20000)
+
+        with mock.patch.object(normalize, "expression_cache", cache):
+            for i in range(200):
+                parse_expression(f"x^{i} + {i}y")
+
+        self.assertLessEqual(cache.nbytes, 20000)
+        self.assertGreater(cache.evictions, 0)
+
+    def test_hit_rate_in_healthcheck(self):
+        from ..tools.handler import handler
+
+        parse_expression("x + y")
+        parse_expression("y + x")
+
+        caches = handler({"headers": {"command": "healthcheck"}})["result"]["caches"]
+
+        self.assertIn("expressions", caches)
+        self.assertGreater(caches["expressions"]["hit_rate"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
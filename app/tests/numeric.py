@@ -0,0 +1,151 @@
+import unittest
+from unittest import mock
+
+from ..algorithm import grading_function
+from ..symbolic import numeric
+from ..symbolic.normalize import parse_expression
+from ..symbolic.numeric import equivalent, function_cache, numeric_equivalent
+from ..tools.errors import GradingError
+from ..tools.handler import handler
+
+EQUAL = [
+    ("(x+1)^2", "x^2 + 2x + 1"), ("sin(x)^2 + cos(x)^2", "1"), ("exp(x) exp(y)", "exp(x + y)"),
+    ("(x^2 - 1)/(x - 1)", "x + 1"), ("2", "4/2"), ("tan(x)", "sin(x)/cos(x)"),
+    ("sqrt(4x^2)", "2 sqrt(x^2)"), ("(a + b)(a - b)", "a^2 - b^2"), ("x/2 + x/3", "5x/6"),
+]
+
+DIFFERENT = [
+    ("(x+1)^2", "x^2 + 1"), ("sin(x)", "cos(x)"), ("sqrt(x^2)", "x"), ("x y", "x + y"),
+    ("1/x", "x"), ("2", "3"), ("exp(x)", "x^2 + x + 1"), ("a^2 - b^2", "(a - b)^2"),
+]
+
+def expressions(first, second):
+    return parse_expression(first), parse_expression(second)
+
+class TestNumericEquivalence(unittest.TestCase):
+    def test_equal_expressions(self):
+        for (first, second) in EQUAL:
+            with self.subTest(first=first, second=second):
+                self.assertTrue(numeric_equivalent(*expressions(first, second), {}))
+
+    def test_different_expressions(self):
+        for (first, second) in DIFFERENT:
+            with self.subTest(first=first, second=second):
+                self.assertFalse(numeric_equivalent(*expressions(first, second), {}))
+
+    def test_agrees_with_symbolic(self):
+        for (first, second) in EQUAL + DIFFERENT:
+            with self.subTest(first=first, second=second):
+                self.assertEqual(
+                    equivalent(*expressions(first, second), {}, "numeric")[0],
+                    equivalent(*expressions(first, second), {}, "symbolic")[0])
+
+    def test_tolerance(self):
+        pair = expressions("x", "x + 0.000001")
+
+        self.assertFalse(numeric_equivalent(*pair, {}))
+        self.assertTrue(numeric_equivalent(*pair, {"tolerance": 1e-3}))
+        self.assertTrue(numeric_equivalent(*pair, {"tolerance": 0, "absolute_tolerance": 1e-5}))
+
+    def test_domain(self):
+        pair = expressions("log(x^2)", "2 log(x)")
+
+        # Only log(x^2) is defined for negative x, so the default domain is inconclusive
+        self.assertIsNone(numeric_equivalent(*pair, {}))
+        self.assertTrue(numeric_equivalent(*pair, {"domain": [0.1, 10]}))
+        self.assertTrue(numeric_equivalent(*pair, {"domain": {"x": [1, 2]}}))
+
+        pair = expressions("sqrt(x^2)", "x")
+        self.assertTrue(numeric_equivalent(*pair, {"domain": [0, 5]}))
+
+    def test_samples_are_limited(self):
+        pair = expressions("(x+1)^2", "x^2 + 2x + 1")
+
+        with mock.patch.object(numeric, "evaluate", wraps=numeric.evaluate) as evaluate:
+            for samples in (3e7, 10 ** 9, float("inf"), float("nan"), -5):
+                self.assertTrue(numeric_equivalent(*pair, {"samples": samples, "seed": -1}))
+
+        self.assertEqual([call.args[2] for call in evaluate.call_args_list],
+                         [numeric.MAX_SAMPLES] * 4 + [64] * 4 + [1] * 2)
+
+    def test_invalid_domains(self):
+        for domain in ([0, float("inf")], [float("nan"), 1], [-1e308, 1e308], [1, 1], [2, 1], ["a", 1],
+                       [1], [10 ** 400, 1], None, {"x": 5}):
+            with self.subTest(domain=domain):
+                self.assertEqual(numeric.get_domain({"domain": domain}, "x"), numeric.DEFAULT_DOMAIN)
+
+        self.assertEqual(numeric.get_domain({"domain": {"x": [0, 1]}}, "x"), (0.0, 1.0))
+
+    def test_inconclusive_falls_back_to_symbolic(self):
+        with mock.patch.object(numeric, "symbolic_equivalent", return_value=False) as symbolic:
+            self.assertEqual(equivalent(*expressions("log(x^2)", "2 log(x)"), {}), (False, "symbolic"))
+            self.assertEqual(equivalent(*expressions("x + x", "2x"), {}), (True, "numeric"))
+
+        self.assertEqual(symbolic.call_count, 1)
+
+    def test_functions_are_compiled_once(self):
+        function_cache.clear()
+        pair = expressions("x^3 - y", "y^2 + x")
+        before = function_cache.stats()
+
+        for seed in range(5):
+            numeric_equivalent(*pair, {"seed": seed})
+
+        after = function_cache.stats()
+        self.assertEqual(after["misses"] - before["misses"], 2)
+        self.assertEqual(after["hits"] - before["hits"], 8)
+
+    def test_grading_function_modes(self):
+        for method in ("numeric", "symbolic"):
+            with self.subTest(method=method):
+                result = grading_function("2x + x", "3x", {"equivalence": method})
+
+                self.assertTrue(result["is_correct"])
+                self.assertEqual(result["method"], method)
+                self.assertEqual(result["preview"]["sympy"], "3*x")
+
+                result = grading_function("2x", "3x", {"equivalence": method})
+                self.assertFalse(result["is_correct"])
+
+        self.assertNotIn("method", grading_function("2x", "3x", {}))
+
+    def test_numbers_are_parsed(self):
+        for method in ("numeric", "symbolic"):
+            with self.subTest(method=method):
+                self.assertTrue(grading_function("x/x", 1, {"equivalence": method})["is_correct"])
+                self.assertTrue(grading_function(0.5, "1/2", {"equivalence": method})["is_correct"])
+                self.assertTrue(grading_function(-2.5e-3, -0.0025, {"equivalence": method})["is_correct"])
+                self.assertFalse(grading_function(3, "2x", {"equivalence": method})["is_correct"])
+
+    def test_only_text_and_numbers_are_compared(self):
+        code = '__import__("os").system("echo PWNED") or x'
+
+        with mock.patch("os.system") as system:
+            for (response, answer) in [("x", [code]), ("x", {"x": code}), ([code], "x"), ({"x": code}, "x"),
+                                       ("x", True), ("x", None), (float("inf"), "x")]:
+                with self.subTest(response=response, answer=answer):
+                    for method in ("numeric", "symbolic"):
+                        with self.assertRaises(GradingError):
+                            grading_function(response, answer, {"equivalence": method})
+
+            for answer in ([code], {"x": code}):
+                body = {"response": "x", "answer": answer, "params": {"equivalence": "numeric"}}
+                error = handler({"body": body})["error"]
+
+                self.assertEqual(error["message"], "The answer can't be compared.")
+
+        system.assert_not_called()
+
+    def test_negative_tolerances(self):
+        pair = expressions("x", "x + 1")
+
+        for name in ("tolerance", "absolute_tolerance"):
+            with self.subTest(name=name):
+                with self.assertRaises(GradingError) as raised:
+                    numeric_equivalent(*pair, {name: -1e-3})
+
+                self.assertIn(f"`{name}` must not be negative", raised.exception.error["description"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import random
+
+from ..algorithm import grading_function
+from ..symbolic.incremental import split_terms
+from ..symbolic.normalize import parse_expression
+from ..symbolic.parser import GREEK, LETTERS, ParseError, parse
+from .normalize import corpus
+
+# Texts and how they are parsed, written as (kind operands...) with numbers and names bare
+CORPUS = [
+    ("x", "x"), ("42", "42"), ("3.14", "3.14"), (".5", ".5"), ("5.", "5."), ("x_1", "x_1"),
+    ("alpha", "alpha"), ("2x", "(mul 2 x)"), ("2 x", "(mul 2 x)"), ("x2", "x2"), ("xy", "xy"),
+    ("x y", "(mul x y)"), ("2x^2", "(mul 2 (pow x 2))"), ("2(x+1)", "(mul 2 (add x 1))"),
+    ("(x+1)(x-1)", "(mul (add x 1) (add x (neg 1)))"), ("x(y)", "(mul x y)"), ("2 3", "(mul 2 3)"),
+    ("2sin x", "(mul 2 (sin x))"), ("sin x", "(sin x)"), ("sin x^2", "(sin (pow x 2))"),
+    ("sin x y", "(mul (sin x) y)"), ("sin(x) y", "(mul (sin x) y)"), ("sin 2x", "(mul (sin 2) x)"),
+    ("log(x)", "(log x)"), ("log(x, 2)", "(log x 2)"), ("cos(sin(x))", "(cos (sin x))"),
+    ("f(x)", "(mul f x)"), ("x^y^z", "(pow x (pow y z))"), ("(x^y)^z", "(pow (pow x y) z)"),
+    ("x**2", "(pow x 2)"), ("-x^2", "(neg (pow x 2))"), ("(-x)^2", "(pow (neg x) 2)"),
+    ("2^-1", "(pow 2 (neg 1))"), ("x^-y^z", "(pow x (neg (pow y z)))"), ("--x", "(neg (neg x))"),
+    ("+x", "x"), ("-+-x", "(neg (neg x))"), ("a-b-c", "(add a (neg b) (neg c))"),
+    ("a-(b-c)", "(add a (neg (add b (neg c))))"), ("a/b/c", "(mul a (pow b (neg 1)) (pow c (neg 1)))"),
+    ("a/(b/c)", "(mul a (pow (mul b (pow c (neg 1))) (neg 1)))"), ("a*b/c*d", "(mul a b (pow c (neg 1)) d)"),
+    ("x/2y", "(mul x (pow 2 (neg 1)) y)"), ("1/2x", "(mul 1 (pow 2 (neg 1)) x)"), ("-2x", "(mul (neg 2) x)"),
+    ("x - -y", "(add x (neg (neg y)))"), ("n!", "(factorial n)"), ("n!!", "(factorial (factorial n))"),
+    ("x!^2", "(pow (factorial x) 2)"), ("(x^2)!", "(factorial (pow x 2))"), ("3!x", "(mul (factorial 3) x)"),
+    ("2^3!", "(pow 2 (factorial 3))"), ("x + y * z", "(add x (mul y z))"), ("(((x)))", "x"),
+    ("  x  +  1  ", "(add x 1)"), ("e^(i pi)", "(pow e (mul i pi))"), ("a*-b", "(mul a (neg b))"),
+    ("a^-b", "(pow a (neg b))"), ("a/-b", "(mul a (pow (neg b) (neg 1)))"), ("sqrt x", "(sqrt x)"),
+    ("sqrt(x)^2", "(pow (sqrt x) 2)"), ("abs(-x)", "(abs (neg x))"), ("ln x", "(ln x)"),
+    ("factorial(n)", "(factorial n)"), ("2..5", "(mul 2. .5)"), ("1.2.3", "(mul 1.2 .3)"),
+    # Scientific notation
+    ("1e5", "1e5"), ("2.5E-3", "2.5e-3"), (".5e+2", ".5e+2"), ("2e-1", "2e-1"), ("1e5x", "(mul 1e5 x)"),
+    ("2e", "(mul 2 e)"), ("2e^x", "(mul 2 (pow e x))"), ("2e-x", "(add (mul 2 e) (neg x))"),
+    ("2e - 1", "(add (mul 2 e) (neg 1))"), ("x2e-1", "(add x2e (neg 1))"), ("3e2²", "(pow 3e2 2)"),
+    # Pasted text
+    ("2πr", "(mul 2 pi r)"), ("αx", "(mul alpha x)"), ("ax", "ax"), ("Γ(x)", "(mul Gamma x)"),
+    ("x²", "(pow x 2)"), ("x²³", "(pow x 23)"), ("2x³y", "(mul 2 (pow x 3) y)"),
+    ("x²!", "(pow x (factorial 2))"), ("a × b", "(mul a b)"), ("a·b", "(mul a b)"),
+    ("a ÷ b", "(mul a (pow b (neg 1)))"), ("a − b", "(add a (neg b))"), ("√x", "(sqrt x)"),
+    ("√(x + 1)", "(sqrt (add x 1))"), ("2√x", "(mul 2 (sqrt x))"), ("∞", "oo"), ("−∞", "(neg oo)"),
+    ("µ", "mu"), ("ϕ + φ", "(add phi phi)"), ("πr²", "(mul pi (pow r 2))"), ("e^(iπ)", "(pow e (mul i pi))"),
+]
+
+# Texts that aren't valid, and the error
+ERRORS = [
+    ("sin -x", "Unexpected '-' at position 4."), ("x +", "Unexpected end of expression at position 3."),
+    ("x*", "Unexpected end of expression at position 2."), ("(x", "Unexpected end of expression at position 2."),
+    ("x)", "Unexpected ')' at position 1."), ("()", "Unexpected ')' at position 1."),
+    ("*x", "Unexpected '*' at position 0."), ("x $ y", "Unexpected character '$' at position 2."),
+    ("x,y", "Unexpected ',' at position 1."), ("sin()", "Unexpected ')' at position 4."),
+    ("sin(x,)", "Unexpected ')' at position 6."), ("x^", "Unexpected end of expression at position 2."),
+    (")", "Unexpected ')' at position 0."), ("", "Unexpected end of expression at position 0."),
+    ("x ** ** 2", "Unexpected '**' at position 5."), ("x² ×", "Unexpected end of expression at position 4."),
+    ("x ⁻ 1", "Unexpected character '⁻' at position 2."), ("x + €", "Unexpected character '€' at position 4."),
+    ("sin −x", "Unexpected '−' at position 4."), ("αβ²)", "Unexpected ')' at position 3."),
+    # Too many arguments, at the function
+    ("sin(x, y)", "Expected at most 1 argument for 'sin' at position 0."),
+    ("2 + factorial(x, y)", "Expected at most 1 argument for 'factorial' at position 4."),
+    ("log(x, 2, 3)", "Expected at most 2 arguments for 'log' at position 0."),
+    ("x √(x, 2)", "Expected at most 1 argument for '√' at position 2."),
+]
+
+def sexpr(tree) -> str:
+    kind = tree[0]
+
+    if kind in ("num", "sym"):
+        return tree[1]
+
+    if kind in ("add", "mul"):
+        return f"({kind} {' '.join(map(sexpr, tree[1]))})"
+
+    if kind == "neg":
+        return f"(neg {sexpr(tree[1])})"
+
+    if kind == "pow":
+        return f"(pow {sexpr(tree[1])} {sexpr(tree[2])})"
+
+    return f"({tree[1]} {' '.join(map(sexpr, tree[2]))})"
+
+class TestParserConformance(unittest.TestCase):
+    def test_corpus(self):
+        for text, expected in CORPUS:
+            with self.subTest(text=text):
+                self.assertEqual(sexpr(parse(text)), expected)
+
+    def test_errors(self):
+        for text, expected in ERRORS:
+            with self.subTest(text=text):
+                with self.assertRaises(ParseError) as context:
+                    parse(text)
+
+                self.assertEqual(str(context.exception), expected)
+
+    def test_pasted_operators(self):
+        pasted = str.maketrans({"*": "×", "/": "÷", "-": "−"})
+
+        for text in corpus(500):
+            with self.subTest(text=text):
+                self.assertEqual(parse(text.translate(pasted)), parse(text))
+
+    def test_greek_letters(self):
+        self.assertEqual(len(LETTERS), 2 * len(GREEK) + 7)
+
+        for letter, (kind, name) in LETTERS.items():
+            if kind == "sym":
+                with self.subTest(letter=letter):
+                    self.assertEqual(parse(f"2{letter}x"), ("mul", (("num", "2"), ("sym", name), ("sym", "x"))))
+                    self.assertEqual(parse(name), ("sym", name))
+
+        self.assertEqual(len(split_terms("2α + β² - 1")), 3)
+
+    def test_graded(self):
+        for text in ["sin(x, y)", "factorial(x, y)"]:
+            with self.subTest(text=text):
+                result = grading_function(text, "x", {})
+
+                self.assertFalse(result["is_correct"])
+                self.assertEqual(result["preview"]["position"], 0)
+
+        self.assertEqual(str(parse_expression("2.5e-3 + 1E5")), "100000.002500000")
+        self.assertEqual(grading_function("3e2x", "300.0x", {"equivalence": "symbolic"})["is_correct"], True)
+        self.assertEqual(len(split_terms("1e-5 + 2E+3x - 1")), 3)
+
+    def test_only_parse_errors(self):
+        rng = random.Random(0)
+        alphabet = list("xy2 .+-*/^()!,$e") + ["sin", "log", "√", "π", "²", "×", "−", "**"]
+
+        for _ in range(20000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+
+            try:
+                parse(text)
+            except ParseError as e:
+                with self.subTest(text=text):
+                    if e.message == "Unexpected end of expression":
+                        self.assertEqual(e.position, len(text.rstrip()))
+                    else:
+                        # The error points at what was written
+                        written = e.message.split("'", 1)[1][:-1]
+                        self.assertTrue(text.startswith(written, e.position))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+
+from ..algorithm import grading_function
+from ..tools.cache import DiskCache, LRUCache
+from ..tools.handler import handler
+from ..symbolic import render as render_module
+from ..symbolic.incremental import preview_incremental, session_cache
+from ..symbolic.normalize import parse_expression
+from ..symbolic.render import render, render_cache, render_options, render_text, render_uncached
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        render_cache.clear()
+        session_cache.clear()
+
+    def count_renders(self):
+        return mock.patch.object(render_module, "render_uncached", wraps=render_uncached)
+
+    def test_render_options(self):
+        self.assertEqual(render_options({}), ())
+        self.assertEqual(render_options({"render": "latex"}), ())
+        self.assertEqual(
+            render_options({"render": {"mul_symbol": "dot", "mathml": True, "colour": "red"}}),
+            (("mathml", True), ("mul_symbol", "dot")))
+
+        # Values that only compare equal to an allowed one are left out
+        self.assertEqual(render_options({"render": {"mathml": 1, "ln_notation": 0}}), ())
+        self.assertEqual(render_options({"render": {"mul_symbol": "cross"}}), ())
+
+    def test_spellings_share_a_render(self):
+        with self.count_renders() as uncached:
+            for text in ["x + 2y", "2y+x", "(x) + (2*y)", "2 y + x"]:
+                self.assertEqual(render(parse_expression(text)), {"latex": "x + 2 y", "sympy": "x + 2*y"})
+
+        self.assertEqual(uncached.call_count, 1)
+
+    def test_options_are_part_of_the_key(self):
+        expression = parse_expression("x y / 2")
+
+        with self.count_renders() as uncached:
+            self.assertEqual(render(expression)["latex"], "\\frac{x y}{2}")
+            self.assertEqual(render(expression, (("mul_symbol", "dot"),))["latex"], "\\frac{x \\cdot y}{2}")
+            self.assertNotIn("mathml", render(expression))
+            self.assertIn("<mfrac>", render(expression, (("mathml", True),))["mathml"])
+
+        self.assertEqual(uncached.call_count, 3)
+
+    def test_returns_copies(self):
+        expression = parse_expression("x + 1")
+        render(expression)["latex"] = "changed"
+
+        self.assertEqual(render(expression)["latex"], "x + 1")
+
+    def test_byte_accounting(self):
+        cache = LRUCache(maxsize=100, maxbytes=200)
+
+        with mock.patch.object(render_module, "render_cache", cache):
+            for n in range(40):
+                render(parse_expression(f"x^{n} + y"))
+
+                expected = sum(sum(len(text) for text in value[0].values()) for value in cache._entries.values())
+                self.assertEqual(cache.nbytes, expected)
+                self.assertLessEqual(cache.nbytes, 200)
+
+        self.assertGreater(cache.evictions, 0)
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk = DiskCache(directory)
+            expression = parse_expression("sin(x)^2 + 1")
+            options = (("mathml", True),)
+
+            with mock.patch.object(render_module, "disk_cache", disk), self.count_renders() as uncached:
+                rendered = render(expression, options)
+                self.assertEqual(len(os.listdir(directory)), 1)
+
+                # As after a restart, with only the files left
+                render_cache.clear()
+                self.assertEqual(render(expression, options), rendered)
+
+            self.assertEqual(uncached.call_count, 1)
+            self.assertEqual(disk.stats()["hits"], 1)
+
+            restarted = DiskCache(directory)
+            restarted.put("0" * 64, {"latex": "x"})
+            self.assertEqual(restarted.stats()["size"], 2)
+            self.assertEqual(restarted.stats()["bytes"], sum(
+                os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)))
+
+    def test_disk_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk = DiskCache(directory, maxbytes=100)
+
+            for n in range(20):
+                disk.put(f"{n:064x}", {"latex": "x" * 20})
+                os.utime(disk._path(f"{n:064x}"), (n, n))
+
+                self.assertLessEqual(disk.nbytes, 100)
+                self.assertEqual(disk.nbytes, sum(
+                    os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)))
+
+            # The most recently used are kept
+            self.assertEqual(disk.get(f"{19:064x}"), {"latex": "x" * 20})
+            self.assertIsNone(disk.get(f"{0:064x}"))
+            self.assertGreater(disk.stats()["evictions"], 0)
+
+    def test_disk_errors_are_misses(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk = DiskCache(directory)
+
+            with open(disk._path("ab" * 32), "w") as f:
+                f.write("{truncated")
+
+            self.assertIsNone(disk.get("ab" * 32))
+            self.assertEqual(disk.stats()["errors"], 1)
+
+            unwritable = DiskCache(os.path.join(directory, "ab" * 32 + ".json", "nested"))
+            unwritable.put("cd" * 32, {"latex": "x"})
+            self.assertEqual(unwritable.stats()["errors"], 1)
+
+    def test_incremental_mathml(self):
+        params = {"session": "mathml", "render": {"mathml": True}}
+
+        preview = grading_function("x - (y + 1) + 2", "x", params)["preview"]
+        self.assertEqual(preview["mathml"], render_text("x - (y + 1) + 2", (("mathml", True),))["mathml"])
+
+        # The terms of the session are rendered again with other options
+        self.assertNotIn("mathml", grading_function("x - (y + 1) + 3", "x", {"session": "mathml"})["preview"])
+        self.assertEqual(
+            preview_incremental("mathml", "x - (y + 1) + 3", (("mathml", True),))["mathml"],
+            preview_incremental("fresh", "x - (y + 1) + 3", (("mathml", True),))["mathml"])
+
+    def test_stats_in_healthcheck(self):
+        render(parse_expression("x + 1"))
+        render(parse_expression("1 + x"))
+
+        caches = handler({"headers": {"command": "healthcheck"}})["result"]["caches"]
+
+        self.assertIn("renders", caches)
+        self.assertGreater(caches["renders"]["hits"], 0)
+        self.assertGreater(caches["renders"]["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+import os
+import time
+from unittest import mock
+
+from ..tools import sandbox
+from ..tools.errors import GradingError
+from ..tools.sandbox import SandboxError, SandboxPool
+from ..tools.handler import handler
+
+def grade(response, answer, params):
+    if response == "raise":
+        raise ValueError("bad response")
+
+    if response == "reject":
+        raise GradingError({"message": "Rejected.", "reason": "test"})
+
+    if response == "crash":
+        os._exit(3)
+
+    if response == "memory":
+        return len(bytearray(512 * 1024 * 1024))
+
+    if response == "spin":
+        while True:
+            pass
+
+    if response == "sleep":
+        time.sleep(10)
+
+    return {"is_correct": response == answer, "pid": os.getpid()}
+
+def grade_unprivileged(response, answer, params):
+    if os.geteuid() == 0:
+        # As the user `nobody`, which can't raise a hard limit
+        os.setgid(65534)
+        os.setuid(65534)
+
+    if response == "first":
+        # Into the next second of CPU time, so the next call's limit is higher
+        used = sum(os.times()[:2])
+
+        while sum(os.times()[:2]) < int(used) + 1.05:
+            pass
+
+    return grade(response, answer, params)
+
+class TestSandboxPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = SandboxPool(
+            grade, workers=1, max_requests=3, memory_mb=256, cpu_seconds=1, timeout=5)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_grade(self):
+        result = self.pool.grade("x", "x", {})
+
+        self.assertTrue(result["is_correct"])
+        self.assertNotEqual(result["pid"], os.getpid())
+
+    def test_reuses_then_recycles_workers(self):
+        pids = [self.pool.grade("x", "x", {})["pid"] for _ in range(4)]
+
+        self.assertEqual(len(set(pids[:3])), 1)
+        self.assertNotEqual(pids[3], pids[0])
+        self.assertEqual(self.pool.recycles, 1)
+
+    def test_exception_description(self):
+        with self.assertRaises(SandboxError) as context:
+            self.pool.grade("raise", "x", {})
+
+        self.assertEqual(str(context.exception), "bad response")
+        self.assertTrue(self.pool.grade("x", "x", {})["is_correct"])
+
+    def test_grading_error(self):
+        with self.assertRaises(GradingError) as context:
+            self.pool.grade("reject", "x", {})
+
+        self.assertEqual(context.exception.error, {"message": "Rejected.", "reason": "test"})
+
+    def test_crashed_worker_is_replaced(self):
+        with self.assertRaises(SandboxError) as context:
+            self.pool.grade("crash", "x", {})
+
+        self.assertIn("exit code 3", str(context.exception))
+        self.assertEqual(self.pool.crashes, 1)
+        self.assertTrue(self.pool.grade("x", "x", {})["is_correct"])
+
+    def test_memory_limit(self):
+        with self.assertRaises(SandboxError) as context:
+            self.pool.grade("memory", "x", {})
+
+        self.assertIn("memory limit", str(context.exception))
+        self.assertTrue(self.pool.grade("x", "x", {})["is_correct"])
+
+    def test_cpu_limit(self):
+        with self.assertRaises(SandboxError) as context:
+            self.pool.grade("spin", "x", {})
+
+        self.assertIn("CPU time limit", str(context.exception))
+        self.assertTrue(self.pool.grade("x", "x", {})["is_correct"])
+
+    def test_unprivileged_worker(self):
+        self.pool.close()
+        self.pool = SandboxPool(grade_unprivileged, workers=1, max_requests=3, cpu_seconds=1, timeout=5)
+
+        pids = [self.pool.grade(response, "x", {})["pid"] for response in ("first", "x", "x")]
+        self.assertEqual(len(set(pids)), 1)
+
+        # The CPU time limit still applies
+        with self.assertRaises(SandboxError) as context:
+            self.pool.grade("spin", "x", {})
+
+        self.assertIn("CPU time limit", str(context.exception))
+
+    def test_timeout(self):
+        self.pool.timeout = 0.2
+
+        with self.assertRaises(SandboxError) as context:
+            self.pool.grade("sleep", "x", {})
+
+        self.assertIn("did not finish", str(context.exception))
+        self.assertTrue(self.pool.grade("x", "x", {})["is_correct"])
+
+    def test_handler_uses_sandbox(self):
+        event = {"body": {"response": "crash", "answer": "x"}}
+
+        with mock.patch.dict(os.environ, {"GRADING_SANDBOX": "1"}), \
+                mock.patch(f"{handler.__module__}.grading_function", grade):
+            response = handler(event)
+            stats = handler({"headers": {"command": "healthcheck"}})["result"]["sandbox"]
+
+        sandbox.close_pool()
+
+        self.assertIn("exit code 3", response["error"]["description"])
+        self.assertEqual(stats["crashes"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
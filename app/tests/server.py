@@ -0,0 +1,136 @@
+import unittest
+import json
+import time
+import threading
+import http.client
+
+from ..tools.server import GradingRequestHandler, GradingServer
+
+class TestGradingServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = GradingServer(("127.0.0.1", 0), workers=2, quiet=True)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+
+    def setUp(self):
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=30)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def post(self, body, headers={}):
+        self.connection.request("POST", "/", body=body, headers=headers)
+        response = self.connection.getresponse()
+
+        return response.status, json.loads(response.read())
+
+    def test_grade(self):
+        body = json.dumps({"response": "hello", "answer": "world!"})
+        status, response = self.post(body, {"command": "grade"})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response.get("command"), "grade")
+        self.assertTrue(response.get("result").get("is_correct"))
+
+    def test_default_command_is_grade(self):
+        status, response = self.post(json.dumps({"response": "hello", "answer": "world!"}))
+
+        self.assertEqual(response.get("command"), "grade")
+
+    def test_invalid_json(self):
+        status, response = self.post("{}}}{{{[][] this is not json.")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response.get("error").get("message"), "Request body is not valid JSON.")
+
+    def test_keep_alive(self):
+        body = json.dumps({"response": "hello", "answer": "world!"})
+
+        self.post(body)
+        socket = self.connection.sock
+        self.post(body)
+
+        self.assertIsNotNone(socket)
+        self.assertIs(self.connection.sock, socket)
+
+    def test_get_not_allowed(self):
+        self.connection.request("GET", "/")
+        response = self.connection.getresponse()
+        response.read()
+
+        self.assertEqual(response.status, 405)
+
+    def send_raw(self, content_length, body=b""):
+        self.connection.putrequest("POST", "/")
+        self.connection.putheader("Content-Length", content_length)
+        self.connection.endheaders(body)
+        response = self.connection.getresponse()
+
+        return response.status, response.getheader("Connection"), json.loads(response.read())
+
+    def test_bad_content_length(self):
+        for content_length in ("ten", "-1", "+2", "1_0", ""):
+            with self.subTest(content_length=content_length):
+                self.setUp()
+                status, connection, response = self.send_raw(content_length, b"{}")
+                self.tearDown()
+
+                self.assertEqual(status, 400)
+                self.assertEqual(connection, "close")
+                self.assertIn("Content-Length", response["error"]["message"])
+
+    def test_body_too_large(self):
+        status, connection, response = self.send_raw(str(GradingRequestHandler.max_body + 1))
+
+        self.assertEqual(status, 413)
+        self.assertEqual(connection, "close")
+        self.assertIn("larger than", response["error"]["message"])
+
+class TestWorkerCrash(unittest.TestCase):
+    def setUp(self):
+        self.server = GradingServer(("127.0.0.1", 0), workers=1, quiet=True)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def post(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=60)
+        connection.request("POST", "/", body=json.dumps({"response": "hello", "answer": "world!"}))
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+
+        return response.status
+
+    def test_pool_is_replaced_after_a_worker_dies(self):
+        self.assertEqual(self.post(), 200)
+
+        executor = self.server.executor
+
+        for process in list(executor._processes.values()):
+            process.kill()
+            process.join()
+
+        # Wait for the pool to notice, so the next request isn't sent to the dead worker
+        deadline = time.monotonic() + 10
+
+        while not executor._broken and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual([self.post() for _ in range(3)], [200, 200, 200])
+        self.assertIsNot(self.server.executor, executor)
+        self.assertEqual(self.server.restarts, 1)
+
+if __name__ == "__main__":
+    unittest.main()
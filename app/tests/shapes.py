@@ -0,0 +1,172 @@
+import unittest
+import random
+import jsonschema
+from unittest import mock
+
+from ..tools import validate as v
+from ..tools.cache import cache_stats
+from ..tools.shapes import analyse, fingerprint
+from .compiler import VALUES, mutated_bodies, random_bodies
+
+KEYS = ["a", "b", "c"]
+
+def random_schema(rng, depth):
+    """
+    Function to generate a schema from every Draft 7 keyword `shapes` supports.
+    """
+    if depth == 0 or rng.random() < 0.15:
+        return rng.choice([True, False, {}, {"type": rng.choice(["string", "integer", "number", "object"])}])
+
+    schema = {}
+
+    for keyword in rng.sample(KEYWORDS, rng.randint(1, 3)):
+        schema[keyword] = KEYWORDS_VALUES[keyword](rng, depth - 1)
+
+    return schema
+
+KEYWORDS_VALUES = {
+    "type": lambda rng, _: rng.choice(["object", "array", "string", "integer", "number", "boolean",
+                                       "null", ["integer", "null"], ["object", "array"]]),
+    "enum": lambda rng, _: rng.sample(VALUES, 3),
+    "const": lambda rng, _: rng.choice(VALUES),
+    "pattern": lambda rng, _: rng.choice(["^g", "x", "^$"]),
+    "minLength": lambda rng, _: rng.randint(0, 2),
+    "minimum": lambda rng, _: rng.choice([0, 1, 1.2]),
+    "exclusiveMaximum": lambda rng, _: rng.choice([1, 1.5]),
+    "multipleOf": lambda rng, _: rng.choice([1, 0.5]),
+    "required": lambda rng, _: rng.sample(KEYS, rng.randint(1, 2)),
+    "minProperties": lambda rng, _: rng.randint(1, 2),
+    "propertyNames": lambda rng, _: {"enum": rng.sample(KEYS, 2)},
+    "properties": lambda rng, depth: {key: random_schema(rng, depth) for key in rng.sample(KEYS, 2)},
+    "additionalProperties": lambda rng, depth: rng.choice([False, random_schema(rng, depth)]),
+    "patternProperties": lambda rng, depth: {"^[ab]": random_schema(rng, depth)},
+    "dependencies": lambda rng, depth: {"a": rng.choice([["b"], random_schema(rng, depth)])},
+    "items": lambda rng, depth: rng.choice([random_schema(rng, depth), [random_schema(rng, depth)]]),
+    "minItems": lambda rng, _: rng.randint(1, 2),
+    "uniqueItems": lambda rng, _: True,
+    "contains": lambda rng, depth: random_schema(rng, depth),
+    "allOf": lambda rng, depth: [random_schema(rng, depth), random_schema(rng, depth)],
+    "anyOf": lambda rng, depth: [random_schema(rng, depth), random_schema(rng, depth)],
+    "oneOf": lambda rng, depth: [random_schema(rng, depth), random_schema(rng, depth)],
+    "not": lambda rng, depth: random_schema(rng, depth),
+    "if": lambda rng, depth: random_schema(rng, depth),
+    "then": lambda rng, depth: random_schema(rng, depth),
+    "else": lambda rng, depth: random_schema(rng, depth),
+}
+
+KEYWORDS = sorted(KEYWORDS_VALUES)
+
+def random_value(rng, depth):
+    """
+    Function to generate a JSON value from a small pool, so bodies often share a shape.
+    """
+    if depth == 0 or rng.random() < 0.4:
+        return rng.choice(VALUES)
+
+    if rng.random() < 0.6:
+        return {key: random_value(rng, depth - 1) for key in rng.sample(KEYS, rng.randint(0, 3))}
+
+    return [random_value(rng, depth - 1) for _ in range(rng.randint(0, 3))]
+
+class TestShapeFingerprints(unittest.TestCase):
+    def assertNeverAccepts(self, schema, bodies):
+        """
+        Function to check that no body shares a fingerprint with a valid one unless it is valid.
+        ---
+        Returns the number of bodies the cache would have accepted.
+        """
+        shape = analyse(schema)
+        validator = jsonschema.Draft7Validator(schema)
+        accepted = set()
+        hits = 0
+
+        self.assertIsNotNone(shape)
+
+        for body in bodies:
+            key = fingerprint(body, shape)
+            valid = validator.is_valid(body)
+
+            if key in accepted:
+                with self.subTest(schema=schema, body=body):
+                    self.assertTrue(valid)
+
+                hits += 1
+            elif valid and key is not None:
+                accepted.add(key)
+
+        return hits
+
+    def test_random_schemas(self):
+        rng = random.Random(0)
+        hits = 0
+
+        for _ in range(300):
+            schema = random_schema(rng, 3)
+            hits += self.assertNeverAccepts(schema, [random_value(rng, 3) for _ in range(200)])
+
+        self.assertGreater(hits, 10000)
+
+    def test_bundled_schemas(self):
+        responses = [
+            {"command": "grade", "result": {"is_correct": True, "feedback": "x"}},
+            {"command": "healthcheck", "result": {
+                "tests_passed": True, "successes": [], "failures": [], "errors": []}},
+            {"error": {"message": "x", "error_thrown": {"message": "y"}}},
+            {"command": "grade_batch", "result": {"results": [
+                {"result": {"is_correct": False}}, {"error": {"message": "x"}}]}},
+        ]
+        bodies = mutated_bodies(5, responses, 5000) + random_bodies(6, ["command", "result", "error"], [
+            "message", "is_correct", "results", "tests_passed", "successes", "failures", "errors"], 5000)
+
+        self.assertGreater(self.assertNeverAccepts(v.get_schema("response"), bodies), 1000)
+        self.assertGreater(self.assertNeverAccepts(v.get_schema("batch_response"), bodies), 500)
+
+        requests = [{"response": "x", "answer": "y", "params": {"a": 1}}, {"response": 1, "answer": []}]
+        self.assertGreater(
+            self.assertNeverAccepts(v.get_schema("request"), mutated_bodies(7, requests, 2000)), 100)
+
+    def test_values_that_matter(self):
+        shape = analyse({"properties": {"n": {"type": "integer"}, "s": {"pattern": "^a"}}})
+
+        self.assertEqual(fingerprint({"n": 1, "s": "a"}, shape), fingerprint({"n": 2, "s": "a"}, shape))
+        self.assertNotEqual(fingerprint({"n": 1.0}, shape), fingerprint({"n": 1.5}, shape))
+        self.assertNotEqual(fingerprint({"n": True}, shape), fingerprint({"n": 1}, shape))
+        self.assertNotEqual(fingerprint({"s": "a"}, shape), fingerprint({"s": "b"}, shape))
+
+    def test_unsupported(self):
+        self.assertIsNone(analyse({"$ref": "#/definitions/a", "definitions": {"a": {}}}))
+        self.assertIsNone(analyse({"properties": {"a": {"unevaluatedProperties": False}}}))
+
+        shape = analyse(v.get_schema("batch_response"))
+        self.assertIsNone(fingerprint({"command": "grade_batch", "result": {"results": ()}}, shape))
+
+    def test_validate_without_compiled_check(self):
+        valid = {"command": "grade", "result": {"is_correct": True, "preview": {"latex": "x"}}}
+        same_shape = {"command": "grade", "result": {"is_correct": False, "preview": {"sympy": "y"}}}
+        invalid = {"command": "grade", "result": {"preview": {"latex": "x"}}}
+
+        with mock.patch.object(v, "get_check", return_value=None):
+            v.shape_cache.clear()
+            hits = v.shape_cache.hits
+
+            self.assertIsNone(v.validate_response(valid))
+            self.assertIsNone(v.validate_response(same_shape))
+            self.assertEqual(v.shape_cache.hits - hits, 1)
+
+            error = v.validate_response(invalid)
+            self.assertEqual(error["error_thrown"]["message"], "'is_correct' is a required property")
+
+            v.strict_mode(True)
+
+            try:
+                self.assertIsNone(v.validate_response(same_shape))
+                self.assertEqual(v.validate_response(invalid), error)
+            finally:
+                v.strict_mode(False)
+
+            self.assertEqual(v.shape_cache.hits - hits, 1)
+
+        self.assertEqual(cache_stats()["validation_shapes"]["size"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
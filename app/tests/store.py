@@ -0,0 +1,133 @@
+import unittest
+import os
+import contextlib
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from ..tools import store, validate
+from ..tools.handler import handler
+
+SCHEMA_FILES = {"REQUEST_SCHEMA_URL": "request.json", "RESPONSE_SCHEMA_URL": "response.json"}
+
+class TestSchemaStore(unittest.TestCase):
+    def setUp(self):
+        self.schema_dir = tempfile.mkdtemp()
+
+        for file_name in ("request.json", "response.json", store.CHECKSUM_FILE):
+            shutil.copy(os.path.join(store.SCHEMA_DIR, file_name), self.schema_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.schema_dir)
+
+    def test_bundled_checksums_match(self):
+        for file_name in store.load_checksums():
+            schema = store.load_local_schema(file_name)
+            self.assertEqual(schema.get("type"), "object")
+
+    def test_tampered_schema_is_rejected(self):
+        with open(os.path.join(self.schema_dir, "request.json"), "a") as f:
+            f.write(" ")
+
+        with self.assertRaises(store.SchemaIntegrityError):
+            store.load_local_schema("request.json", self.schema_dir)
+
+    def test_local_store_makes_no_request(self):
+        with mock.patch.object(store, "load_url_schema") as load_url_schema, \
+                mock.patch.dict(os.environ, {"SCHEMA_SOURCE": "local"}):
+            store.load_schema("request.json", "REQUEST_SCHEMA_URL")
+
+        load_url_schema.assert_not_called()
+
+    def test_url_source(self):
+        with mock.patch.object(store, "load_url_schema", return_value={}) as load_url_schema, \
+                mock.patch.dict(os.environ, {"SCHEMA_SOURCE": "url"}):
+            schema = store.load_schema("request.json", "REQUEST_SCHEMA_URL")
+
+        load_url_schema.assert_called_once_with("REQUEST_SCHEMA_URL")
+        self.assertEqual(schema, {})
+
+    def test_url_source_for_bundled_only_schema(self):
+        with mock.patch.object(store, "load_url_schema") as load_url_schema, \
+                mock.patch.dict(os.environ, {"SCHEMA_SOURCE": "url", "SCHEMA_URL_FALLBACK": "1"}):
+            schema = store.load_schema("batch.json", None)
+
+        load_url_schema.assert_not_called()
+        self.assertEqual(schema, store.load_local_schema("batch.json"))
+
+    def upstream_schemas(self):
+        """
+        Function to return the schemas served from the URLs, as the bundled copies.
+        ---
+        The validators are built again from them while the test runs, and afterwards.
+        """
+        for cached in (validate.get_schema, validate.get_validator, validate.get_check, validate.get_shape):
+            self.addCleanup(cached.cache_clear)
+            cached.cache_clear()
+
+        return {name: store.load_local_schema(file_name) for name, file_name in SCHEMA_FILES.items()}
+
+    @contextlib.contextmanager
+    def url_source(self, upstream):
+        with mock.patch.object(store, "load_url_schema", side_effect=upstream.get) as load_url_schema, \
+                mock.patch.dict(validate.preloaded_checks, clear=True), \
+                mock.patch.dict(os.environ, {"SCHEMA_SOURCE": "url", "REQUEST_SCHEMA_URL": "request",
+                                             "RESPONSE_SCHEMA_URL": "response"}):
+            yield load_url_schema
+
+    def test_url_source_grades_batches(self):
+        event = {
+            "body": {"answer": "x", "items": [{"response": "x"}, {"response": 1}]},
+            "headers": {"command": "grade_batch"}
+        }
+
+        # The upstream response schema doesn't know the grade_batch command
+        upstream = self.upstream_schemas()
+        upstream["RESPONSE_SCHEMA_URL"]["properties"]["command"]["enum"] = ["grade", "healthcheck"]
+
+        with self.url_source(upstream) as load_url_schema:
+            response = handler(event)
+
+        self.assertNotIn("error", response)
+        self.assertEqual(response["command"], "grade_batch")
+        self.assertEqual([list(item) for item in response["result"]["results"]], [["result"], ["result"]])
+        self.assertEqual({name for (name,), _ in load_url_schema.call_args_list}, set(SCHEMA_FILES))
+
+    def test_url_source_without_compiled_check(self):
+        # A keyword the compiler doesn't support, so bodies are fingerprinted instead
+        upstream = self.upstream_schemas()
+        upstream["RESPONSE_SCHEMA_URL"]["properties"]["error"]["properties"]["message"]["minLength"] = 1
+
+        with self.url_source(upstream), \
+                mock.patch.object(validate, "validate", wraps=validate.validate) as full_validation:
+            validate.shape_cache.clear()
+            hits = validate.shape_cache.hits
+            self.assertIsNone(validate.get_check("response"))
+
+            responses = [handler({"body": {"response": response, "answer": "x"}}) for response in ("x", "y")]
+
+        self.assertEqual([response["command"] for response in responses], ["grade", "grade"])
+        self.assertEqual(full_validation.call_count, 1)
+        self.assertEqual(validate.shape_cache.hits - hits, 1)
+
+    def test_missing_schema_without_fallback(self):
+        with mock.patch.dict(os.environ, {"SCHEMA_URL_FALLBACK": "0"}):
+            with self.assertRaises(OSError):
+                store.load_schema("missing.json", "REQUEST_SCHEMA_URL")
+
+    def test_missing_schema_with_fallback(self):
+        with mock.patch.object(store, "load_url_schema", return_value={}) as load_url_schema, \
+                mock.patch.dict(os.environ, {"SCHEMA_URL_FALLBACK": "1"}):
+            store.load_schema("missing.json", "REQUEST_SCHEMA_URL")
+
+        load_url_schema.assert_called_once_with("REQUEST_SCHEMA_URL")
+
+    def test_checksum_file_is_valid_json(self):
+        with open(os.path.join(self.schema_dir, store.CHECKSUM_FILE)) as f:
+            checksums = json.load(f)
+
+        self.assertEqual(set(checksums), {"batch.json", "batch_response.json", "request.json", "response.json"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import io
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+from ..tools.stream import grade_lines, grade_stream
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def request_lines(count):
+    for i in range(count):
+        yield (json.dumps({"response": f"x{i}", "answer": "x"}) + "\n").encode("utf-8")
+
+class RecordingSink(io.BytesIO):
+    """
+    Output stream that records how many input lines had been read at its first write.
+    """
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+        self.read_at_first_write = None
+
+    def write(self, data):
+        if self.read_at_first_write is None:
+            self.read_at_first_write = self.source.read
+        return super().write(data)
+
+class CountingSource:
+    def __init__(self, lines):
+        self.lines = lines
+        self.read = 0
+
+    def __iter__(self):
+        for line in self.lines:
+            self.read += 1
+            yield line
+
+def output_lines(sink):
+    return [json.loads(line) for line in sink.getvalue().splitlines()]
+
+class TestStreamGrading(unittest.TestCase):
+    def test_grade_lines(self):
+        output = grade_lines([(1, b'{"response": "a", "answer": "b"}'), (3, b"not json"), (4, b"\xff")])
+        results = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual([r["line"] for r in results], [1, 3, 4])
+        self.assertTrue(results[0]["result"]["is_correct"])
+        self.assertEqual(results[1]["error"]["message"], "Request body is not valid JSON.")
+        self.assertIn("error", results[2])
+
+    def test_ordered_output(self):
+        lines = list(request_lines(50))
+        lines.insert(10, b"\n")
+        sink = io.BytesIO()
+
+        graded = grade_stream(iter(lines), sink, workers=2, chunk_size=4, in_flight=2)
+        results = output_lines(sink)
+
+        self.assertEqual(graded, 50)
+        self.assertEqual([r["line"] for r in results], [n for n in range(1, 52) if n != 11])
+        self.assertTrue(all(r["result"]["is_correct"] for r in results))
+
+    def test_unordered_output(self):
+        sink = io.BytesIO()
+
+        grade_stream(request_lines(50), sink, workers=2, chunk_size=3, ordered=False)
+
+        self.assertEqual(sorted(r["line"] for r in output_lines(sink)), list(range(1, 51)))
+
+    def test_in_flight_work_is_bounded(self):
+        for ordered in (True, False):
+            with self.subTest(ordered=ordered):
+                source = CountingSource(request_lines(2000))
+                sink = RecordingSink(source)
+
+                grade_stream(source, sink, workers=2, chunk_size=10, in_flight=3, ordered=ordered)
+
+                self.assertEqual(source.read, 2000)
+                self.assertLessEqual(sink.read_at_first_write, (3 + 1) * 10 + 1)
+                self.assertEqual(len(output_lines(sink)), 2000)
+
+    def test_command_line(self):
+        with tempfile.NamedTemporaryFile("wb", suffix=".ndjson", delete=False) as f:
+            f.writelines(request_lines(20))
+
+        self.addCleanup(os.remove, f.name)
+
+        output = subprocess.run(
+            [sys.executable, "-m", "app.tools.stream", f.name, "--workers", "2"],
+            cwd=REPO_ROOT, check=True, capture_output=True, timeout=120)
+
+        results = [json.loads(line) for line in output.stdout.splitlines()]
+
+        self.assertEqual([r["line"] for r in results], list(range(1, 21)))
+        self.assertIn(b"Graded 20 requests", output.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import asyncio
+from unittest import mock
+
+from ..tools import timing
+from ..tools.handler import handler, async_handler
+
+GRADE_STAGES = {"parse_body", "validate_request", "grading_function", "validate_response", "total"}
+
+def grade_event(headers=None):
+    return {
+        "body": {"response": "x", "answer": "x"},
+        "headers": {"command": "grade", **(headers or {})}
+    }
+
+class TestStageTimings(unittest.TestCase):
+    def setUp(self):
+        self.log = mock.patch.object(timing, "log").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_debug_header_returns_timings(self):
+        response = handler(grade_event({"debug": "timings"}))
+
+        self.assertTrue(response["result"]["is_correct"])
+        self.assertEqual(set(response["timings"]), GRADE_STAGES)
+        self.assertTrue(all(isinstance(t, int) and t >= 0 for t in response["timings"].values()))
+        self.assertGreaterEqual(response["timings"]["total"], response["timings"]["grading_function"])
+
+    def test_no_timings_without_header(self):
+        response = handler(grade_event())
+
+        self.assertNotIn("timings", response)
+        self.log.assert_not_called()
+
+    def test_batch_stages_accumulate(self):
+        event = {
+            "body": {"items": [{"response": "x"}, {"response": "y"}], "answer": "x"},
+            "headers": {"command": "grade_batch", "debug": "timings"}
+        }
+
+        response = handler(event)
+
+        self.assertEqual(len(response["result"]["results"]), 2)
+        self.assertIn("validate_batch", response["timings"])
+        self.assertIn("grading_function", response["timings"])
+
+    def test_async_handler_returns_timings(self):
+        response = asyncio.run(async_handler(grade_event({"debug": "timings"})))
+
+        self.assertEqual(set(response["timings"]), GRADE_STAGES)
+
+    def test_enabled_timings_are_logged(self):
+        with mock.patch.object(timing, "_enabled", True):
+            response = handler(grade_event())
+
+        self.assertNotIn("timings", response)
+        self.log.assert_called_once()
+
+        record = self.log.call_args[0][0]
+        self.assertEqual(record["event"], "timings")
+        self.assertEqual(record["command"], "grade")
+        self.assertEqual(set(record["timings"]), GRADE_STAGES)
+
+    def test_stage_outside_request_is_a_no_op(self):
+        self.assertIs(timing.stage("anything"), timing.NULL_STAGE)
+
+        with timing.stage("anything"):
+            pass
+
+    def test_timer_is_cleared_after_request(self):
+        handler(grade_event({"debug": "timings"}))
+
+        self.assertIs(timing.stage("anything"), timing.NULL_STAGE)
+
+
+if __name__ == "__main__":
+    unittest.main()
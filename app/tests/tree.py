@@ -0,0 +1,90 @@
+import unittest
+import gc
+import copy
+import pickle
+
+import sympy
+
+from ..symbolic.normalize import parse_expression, parse_unevaluated, structural_key, to_sympy
+from ..symbolic.parser import parse
+from ..symbolic.tree import from_sympy, intern, node, nodes, to_tuple
+from .normalize import DIFFERENT, SAME, UNLIMITED, corpus
+
+x, y = sympy.symbols("x y")
+f = sympy.Function("f")
+
+# Expressions a node must keep exactly, which `parse` can't write
+EXPRESSIONS = [
+    sympy.Rational(-3, 7), sympy.Float("0.1", 30), sympy.Float(2.5), sympy.Symbol("x", positive=True),
+    sympy.Symbol("pi"), sympy.Dummy("d"), sympy.zoo, sympy.nan, sympy.I, -sympy.oo, sympy.EulerGamma,
+    f(x, 2), sympy.exp(x) * sympy.log(x, 2), sympy.Abs(x - 1) ** -2, sympy.Add(x, x, evaluate=False),
+    sympy.Mul(-1, x, y, evaluate=False), sympy.Mul(2, x + y, evaluate=False), sympy.sqrt(2) / 3,
+    sympy.Pow(x, -1, evaluate=False), sympy.factorial(x) + sympy.gamma(y),
+]
+
+class TestExpressionTree(unittest.TestCase):
+    def test_identical_subtrees_are_shared(self):
+        first, second = structural_key("2x^2 + sin(x)"), structural_key("sin(x) + 3x^2")
+        _, square = first.children[1].children
+        _, other_square = second.children[1].children
+
+        self.assertIs(square, other_square)
+        self.assertIs(first.children[0], second.children[0])
+        self.assertIs(structural_key("x+y"), structural_key("(y) + x"))
+        self.assertIs(intern(parse("x")), node("sym", "x"))
+
+        # Copies are interned again
+        self.assertIs(pickle.loads(pickle.dumps(first)), first)
+        self.assertIs(copy.deepcopy(first), first)
+
+    def test_keys_match_tuples(self):
+        for forms in SAME:
+            self.assertEqual(len({structural_key(form) for form in forms}), 1)
+
+        for text in corpus(500) + [text for pair in DIFFERENT for text in pair]:
+            with self.subTest(text=text):
+                key = structural_key(text, UNLIMITED)
+
+                self.assertIs(intern(to_tuple(key)), key)
+                self.assertEqual(to_sympy(key), to_sympy(parse(text)))
+
+    def test_unused_nodes_are_freed(self):
+        gc.collect()
+        count = len(nodes)
+        key = structural_key("unused_name^17 + 1")
+
+        self.assertGreater(len(nodes), count)
+
+        del key
+        gc.collect()
+
+        self.assertEqual(len(nodes), count)
+        self.assertNotIn(("sym", "unused_name", ()), nodes)
+
+    def test_sympy_round_trip(self):
+        texts = corpus(300) + ["e^(i pi)", "1/0", "sqrt(-4)", "x!/(2x)", "ln(x) - log(x, 10)", "oo - oo"]
+        expressions = [parse_expression(text, UNLIMITED) for text in texts] + [
+            parse_unevaluated(text, UNLIMITED) for text in texts]
+
+        for expression in expressions + EXPRESSIONS:
+            with self.subTest(expression=expression):
+                tree = from_sympy(expression)
+
+                self.assertEqual(sympy.srepr(to_sympy(tree, evaluate=False)), sympy.srepr(expression))
+                self.assertIs(from_sympy(to_sympy(tree, evaluate=False)), tree)
+
+        # Trees from SymPy share the nodes of trees from `parse`
+        self.assertIs(from_sympy(sympy.sin(x) ** 2), structural_key("sin(x)^2"))
+        self.assertIs(from_sympy(sympy.pi), structural_key("pi"))
+
+    def test_unsupported(self):
+        for expression in [sympy.Eq(x, 1), sympy.Matrix([x]), sympy.Piecewise((x, x > 0), (0, True))]:
+            with self.subTest(expression=expression):
+                with self.assertRaises(TypeError):
+                    from_sympy(expression)
+
+        with self.assertRaises(TypeError):
+            to_tuple(from_sympy(f(x)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import os
+import json
+import marshal
+import tempfile
+
+from ..tools import validate as v
+from ..tools import warmup
+from ..tools.handler import handler
+from ..tools.snapshot import build_snapshot, main
+from ..symbolic.normalize import parse_expression, structural_key
+from ..symbolic.render import render, render_text, snapshot_previews
+from .imports import PACKAGE, import_profile
+
+class TestWarmupSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "snapshot.bin")
+        cls.size = build_snapshot(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.status = dict(warmup.status)
+
+    def tearDown(self):
+        v.preloaded_checks.clear()
+        snapshot_previews.clear()
+        warmup.status.clear()
+        warmup.status.update(self.status)
+
+    def write(self, snapshot):
+        path = os.path.join(self.directory.name, "other.bin")
+
+        with open(path, "wb") as f:
+            marshal.dump(snapshot, f)
+
+        return path
+
+    def test_load_snapshot(self):
+        self.assertTrue(warmup.load_snapshot(self.path))
+
+        stats = handler({"headers": {"command": "healthcheck"}})["result"]["snapshot"]
+        self.assertTrue(stats["loaded"])
+        self.assertEqual(stats["checks"], sorted(v.preloaded_checks))
+        self.assertGreater(stats["providers"]["previews"], 0)
+
+        # The loaded checks give the same results as compiling the schemas again
+        for name, check in v.preloaded_checks.items():
+            for body in ({"response": "x", "answer": "x"}, {"response": 1}, {"answer": "x", "items": []}, {}):
+                self.assertEqual(bool(check(body)), bool(v.compile_schema(v.get_schema(name))(body)))
+
+    def test_snapshot_previews(self):
+        warmup.load_snapshot(self.path)
+
+        for text in ("x^2 + 1", "x^2+1", "(x^2) + 1"):
+            self.assertEqual(render_text(text), render(parse_expression("x^2 + 1")))
+
+        self.assertIn("sin", render_text("sin(q) + q^7")["latex"])
+
+    def test_rejects_unusable_snapshots(self):
+        with open(self.path, "rb") as f:
+            snapshot = marshal.load(f)
+
+        stale = dict(snapshot, header=dict(snapshot["header"], python="2.7"))
+        self.assertFalse(warmup.load_snapshot(self.write(stale)))
+        self.assertIn("another version", warmup.status["error"])
+
+        path = self.write(snapshot)
+
+        with open(path, "r+b") as f:
+            f.truncate(self.size // 2)
+
+        self.assertFalse(warmup.load_snapshot(path))
+        self.assertIn("Unreadable", warmup.status["error"])
+
+        self.assertFalse(warmup.load_snapshot(os.path.join(self.directory.name, "missing.bin")))
+        self.assertEqual((v.preloaded_checks, snapshot_previews), ({}, {}))
+
+    def test_schema_source_url(self):
+        os.environ["SCHEMA_SOURCE"] = "url"
+
+        try:
+            self.assertTrue(warmup.load_snapshot(self.path))
+        finally:
+            del os.environ["SCHEMA_SOURCE"]
+
+        self.assertEqual(v.preloaded_checks, {})
+        self.assertGreater(len(snapshot_previews), 0)
+
+    def test_requests_file(self):
+        requests = os.path.join(self.directory.name, "requests.ndjson")
+        path = os.path.join(self.directory.name, "requests.bin")
+
+        with open(requests, "w") as f:
+            f.write(json.dumps({"response": "w^7 - 3w", "answer": "w"}) + "\n\n")
+
+        main(["--output", path, "--requests", requests])
+        warmup.load_snapshot(path)
+
+        self.assertIn("w^{7}", render_text("w^7 - 3w")["latex"])
+        self.assertIn((structural_key("w^7 - 3w"), ()), snapshot_previews)
+
+    def test_first_response_from_snapshot(self):
+        code = (
+            "import os; os.environ['SNAPSHOT_FILE'] = {path!r}; os.environ['WARMUP'] = {mode!r}; "
+            f"from {PACKAGE}.tools.handler import handler; "
+            "handler({{'body': {{'response': 'x^2 + 1', 'answer': 'x'}}}})")
+
+        # The preview comes from the snapshot, so SymPy and jsonschema aren't imported
+        profile = import_profile(code.format(path=self.path, mode="snapshot"))
+        self.assertNotIn("sympy", profile)
+        self.assertNotIn("jsonschema", profile)
+
+        profile = import_profile(code.format(path=self.path, mode="off"))
+        self.assertIn("sympy", profile)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,422 @@
+import os
+import json
+import time
+import hashlib
+import functools
+import threading
+
+from collections import OrderedDict
+
+"""
+    Size-bounded LRU cache with an optional time-to-live.
+"""
+
+
+class LRUCache:
+    """
+    Class used to keep the most recently used values computed in a warm container.
+    ---
+    Once `maxsize` entries are stored, adding another evicts the least recently used
+    one. If `maxbytes` is set, entries are also evicted until the sizes given to `put`
+    add up to no more than `maxbytes`. If `ttl` is set, entries older than `ttl`
+    seconds are treated as missing. All operations hold a lock, so one cache can be
+    shared between threads.
+    """
+    def __init__(self, maxsize: int = 256, ttl: float = None, maxbytes: int = None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl or None
+        self.nbytes = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                value, expires, nbytes = entry
+
+                if expires is None or time.monotonic() < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._entries[key]
+                self.nbytes -= nbytes
+                self.expirations += 1
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value, nbytes: int = 0):
+        if self.maxsize <= 0 or (self.maxbytes is not None and nbytes > self.maxbytes):
+            return
+
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+
+            if previous is not None:
+                self.nbytes -= previous[2]
+
+            self._entries[key] = (value, expires, nbytes)
+            self.nbytes += nbytes
+
+            while len(self._entries) > self.maxsize or (
+                    self.maxbytes is not None and self.nbytes > self.maxbytes):
+                _, (_, _, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self) -> list:
+        """
+        Function to return the (key, value) of every entry, from least to most recently used.
+        """
+        with self._lock:
+            return [(key, value) for key, (value, _, _) in self._entries.items()]
+
+    def stats(self) -> dict:
+        """
+        Function to return the counters of the cache in a JSON-encodable format.
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "bytes": self.nbytes,
+            "maxbytes": self.maxbytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class DiskCache:
+    """
+    Class used to keep JSON-encodable values in files, so they outlive the process.
+    ---
+    Each value is written to its own file in `directory`, named after its key, which
+    must be a hex digest (e.g. from `canonical_key`). Files are written under a
+    temporary name and renamed, so other processes sharing the directory never read
+    half of one. Once the files add up to more than `maxbytes`, the least recently
+    used are deleted, going by their modification time, which `get` updates.
+
+    The cache is only an optimisation, so errors reading or writing files are counted
+    and otherwise treated as misses. The size of the directory is counted on first
+    use and then kept up to date with this process's writes.
+    """
+    def __init__(self, directory: str, maxbytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.maxbytes = maxbytes
+        self.nbytes = None
+        self.count = None
+
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def _files(self) -> list:
+        """
+        Function to return the (modification time, size, path) of every stored file.
+        """
+        files = []
+
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return files
+
+        for entry in entries:
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return files
+
+    def _count(self):
+        if self.nbytes is None:
+            files = self._files()
+            self.nbytes = sum(size for (_, size, _) in files)
+            self.count = len(files)
+
+    def get(self, key, default=None):
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as f:
+                value = json.loads(f.read())
+
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except (OSError, ValueError):
+            self.errors += 1
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        encoded = json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+        if len(encoded) > self.maxbytes:
+            return
+
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with self._lock:
+            self._count()
+
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+
+                with open(temporary, "wb") as f:
+                    f.write(encoded)
+
+                try:
+                    previous = os.stat(path).st_size
+                except FileNotFoundError:
+                    previous = None
+
+                os.replace(temporary, path)
+            except OSError:
+                self.errors += 1
+                return
+
+            self.writes += 1
+            self.nbytes += len(encoded) - (previous or 0)
+            self.count += previous is None
+
+            if self.nbytes > self.maxbytes:
+                self._evict()
+
+    def _evict(self):
+        files = sorted(self._files())
+        self.nbytes = sum(size for (_, size, _) in files)
+        self.count = len(files)
+
+        for (_, size, path) in files:
+            if self.nbytes <= self.maxbytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self.errors += 1
+                continue
+
+            self.nbytes -= size
+            self.count -= 1
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for (_, _, path) in self._files():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+            self.nbytes = self.count = 0
+
+    def stats(self) -> dict:
+        """
+        Function to return the counters of the cache in a JSON-encodable format.
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "directory": self.directory,
+            "size": self.count,
+            "bytes": self.nbytes,
+            "maxbytes": self.maxbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors
+        }
+
+
+"""
+    Cache keys and configuration.
+"""
+
+
+def canonical_key(*values) -> str:
+    """
+    Function to hash JSON-like values so that equal values always give the same key.
+    ---
+    Dictionaries are serialised with sorted keys, so `{"a": 1, "b": 2}` and
+    `{"b": 2, "a": 1}` share a key. Values that aren't JSON-encodable fall back to
+    their repr.
+    """
+    text = json.dumps(values, sort_keys=True, separators=(",", ":"), default=repr)
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def env_number(name: str, default, cast=int):
+    """
+    Function to read a number from the environment, using `default` if it isn't set.
+    """
+    value = os.environ.get(name, "").strip()
+
+    return cast(value) if value else default
+
+
+# Every cache created with `register` is reported in the healthcheck
+caches = {}
+
+
+def register(name: str, cache: LRUCache) -> LRUCache:
+    caches[name] = cache
+
+    return cache
+
+
+def cache_stats() -> dict:
+    """
+    Function to return the counters of every registered cache, keyed by name.
+    """
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+# Params that only change how one request is handled, not its result, e.g. the session
+# of a student's preview, which are left out of the keys of the answer and result caches
+REQUEST_PARAMS = frozenset(["session", "grading_timeout"])
+
+
+def shared_params(params):
+    """
+    Function to return the params without those in REQUEST_PARAMS, for a cache key.
+    """
+    if not isinstance(params, dict) or REQUEST_PARAMS.isdisjoint(params):
+        return params
+
+    return {name: value for name, value in params.items() if name not in REQUEST_PARAMS}
+
+
+answer_cache = register("answers", LRUCache(
+    maxsize=env_number("ANSWER_CACHE_SIZE", 256),
+    ttl=env_number("ANSWER_CACHE_TTL", None, float)))
+
+
+def memoize_answer(function):
+    """
+    Decorator used to reuse the value computed from an `answer` and its `params`.
+    ---
+    The decorated function must only depend on its two arguments, as its result is
+    stored in `answer_cache` under a canonical hash of them (without the params in
+    REQUEST_PARAMS) and returned directly to later calls. The result is shared between those calls, so it shouldn't be
+    modified by the caller.
+    """
+    missing = object()
+
+    @functools.wraps(function)
+    def wrapper(answer, params):
+        key = canonical_key(function.__qualname__, answer, shared_params(params))
+        value = answer_cache.get(key, missing)
+
+        if value is missing:
+            value = function(answer, params)
+            answer_cache.put(key, value)
+
+        return value
+
+    return wrapper
+
+
+result_cache = register("results", LRUCache(
+    maxsize=env_number("RESULT_CACHE_SIZE", 4096),
+    maxbytes=env_number("RESULT_CACHE_BYTES", 16 * 1024 * 1024),
+    ttl=env_number("RESULT_CACHE_TTL", None, float)))
+
+
+def deterministic(function):
+    """
+    Decorator used to mark a grading function as deterministic.
+    ---
+    A deterministic grading function always returns the same result for the same
+    response, answer and params, so the handler may return a stored result instead of
+    calling it again. Grading functions that aren't marked are never cached.
+    """
+    function.deterministic = True
+
+    return function
+
+
+def is_deterministic(function) -> bool:
+    return getattr(function, "deterministic", False) is True
+
+
+def call_memoized(function, response, answer, params, runner=None):
+    """
+    Function to call a grading function, reusing its result for a repeated request.
+    ---
+    Results are stored in `result_cache` under a canonical hash of the response,
+    answer and params (without those in REQUEST_PARAMS), JSON-encoded so their size can be counted against the memory
+    budget and every hit returns a fresh copy. Only deterministic grading functions
+    are memoized, and a call that raises stores nothing.
+
+    If `runner` is given, it is called with the same arguments to compute the result
+    in place of `function`, e.g. to run it in another process.
+    """
+    runner = runner or function
+
+    if not is_deterministic(function):
+        return runner(response, answer, params)
+
+    key = canonical_key(function.__module__, function.__qualname__, response, answer, shared_params(params))
+    encoded = result_cache.get(key)
+
+    if encoded is not None:
+        return json.loads(encoded)
+
+    result = runner(response, answer, params)
+
+    try:
+        encoded = json.dumps(result, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return result
+
+    result_cache.put(key, encoded, len(key) + len(encoded))
+
+    return result
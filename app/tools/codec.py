@@ -0,0 +1,71 @@
+"""
+    Pluggable JSON backend.
+
+    `loads` and `dumps` use orjson when it is installed and fall back to the standard
+    library's json module otherwise. The backend can be forced with the
+    `JSON_BACKEND` environment variable ("orjson" or "json").
+
+    The fast backend is only used where it gives exactly the same result as `json`:
+    any input it rejects is decoded again by `json`, so accepted inputs (NaN, huge
+    numbers, lone surrogates) and the message, line and column of a JSONDecodeError
+    are the same whichever backend is installed.
+"""
+import os
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Integers with 19 or more digits may not fit in 64 bits, which orjson reads as
+# floats. Mapping every digit to "0" lets a plain substring search find them.
+DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+LONG_INTEGER = b"0" * 19
+
+
+def select_backend() -> str:
+    requested = os.environ.get("JSON_BACKEND", "").strip().lower()
+
+    if requested == "json" or orjson is None:
+        return "json"
+
+    return "orjson"
+
+
+BACKEND = select_backend()
+
+
+def loads(text):
+    """
+    Function to decode a JSON document, raising the same errors as `json.loads`.
+    """
+    if BACKEND == "orjson" and isinstance(text, (str, bytes)):
+        # Lone surrogates are kept, so orjson rejects them and json decides
+        data = text.encode("utf-8", "surrogatepass") if isinstance(text, str) else text
+
+        if LONG_INTEGER not in data.translate(DIGITS_TO_ZERO):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+
+    return json.loads(text)
+
+
+def dumps(content) -> bytes:
+    """
+    Function to encode a JSON-encodable value as UTF-8 bytes.
+    ---
+    orjson writes compact JSON without escaping non-ASCII characters, so the bytes
+    differ from `json.dumps` but decode to the same value. Values orjson can't encode,
+    such as non-string keys or integers over 64 bits, go through `json` instead. NaN
+    and infinity, which aren't valid JSON, are written as null by orjson.
+    """
+    if BACKEND == "orjson":
+        try:
+            return orjson.dumps(content)
+        except TypeError:
+            pass
+
+    return json.dumps(content).encode("utf-8")
@@ -0,0 +1,252 @@
+"""
+    Schema compiler for the validation fast path.
+
+    A JSON schema is translated into the source of a plain Python function that
+    returns True when a body is valid, which is then compiled once with `exec`. Only
+    the Draft 7 keywords used by the request/response schemas are supported; any other
+    keyword makes `compile_schema` return None so callers fall back to jsonschema.
+
+    For the supported keywords the generated check agrees exactly with jsonschema. It
+    only says whether a body is valid: when it isn't, the body still goes through the
+    full validator, which produces the error message and paths returned to the
+    requester.
+"""
+import numbers
+
+from typing import Callable, Optional
+
+# Keywords that don't affect validation and can be skipped
+ANNOTATIONS = {"$schema", "$id", "$comment", "title", "description", "default", "examples"}
+
+TYPE_CHECKS = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+    "number": "(isinstance({v}, _Number) and not isinstance({v}, bool))",
+    "integer": "(isinstance({v}, int) and not isinstance({v}, bool)"
+               " or isinstance({v}, float) and {v}.is_integer())",
+}
+
+
+class UnsupportedSchema(Exception):
+    pass
+
+
+class SchemaCompiler:
+    """
+    Class used to generate the source of the checking functions for a schema.
+    ---
+    Every subschema that is used as a condition (`not`, `if`) becomes its own function
+    so it can be called as an expression. Everything else is inlined as a series of
+    early `return False` statements.
+    """
+    def __init__(self):
+        self.functions = []
+        self.constants = {}
+
+    def constant(self, value) -> str:
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+
+        return name
+
+    def function(self, schema) -> str:
+        name = f"_s{len(self.functions)}"
+        self.functions.append(None)
+
+        lines = [f"def {name}(v0):"]
+        lines += self.statements(schema, "v0", 1)
+        lines.append("    return True")
+
+        self.functions[int(name[2:])] = "\n".join(lines)
+
+        return name
+
+    def statements(self, schema, v, depth, is_object=False) -> list:
+        """
+        Function to create the statements checking `v` against `schema`.
+        ---
+        `is_object` is set once `v` is known to be a dict, so the keywords that only
+        apply to objects don't need to check its type again.
+        """
+        if schema is True or schema == {}:
+            return []
+
+        if schema is False:
+            return [self.indent(depth, "return False")]
+
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(f"Schema must be an object or boolean, got {schema!r}")
+
+        unknown = set(schema) - ANNOTATIONS - {
+            "type", "enum", "const", "not", "allOf", "if", "then", "else",
+            "properties", "required", "additionalProperties", "items"}
+
+        if unknown:
+            raise UnsupportedSchema(f"Unsupported keywords: {sorted(unknown)}")
+
+        lines = self.value_statements(schema, v, depth)
+        is_object = is_object or schema.get("type") in ("object", ["object"])
+
+        for subschema in schema.get("allOf", []):
+            lines += self.statements(subschema, v, depth, is_object)
+
+        lines += self.condition_statements(schema, v, depth, is_object)
+
+        if "items" in schema:
+            lines += self.array_statements(schema["items"], v, depth)
+
+        object_lines = self.object_statements(schema, v, depth if is_object else depth + 1)
+
+        if object_lines and not is_object:
+            lines.append(self.indent(depth, f"if isinstance({v}, dict):"))
+
+        return lines + object_lines
+
+    def value_statements(self, schema, v, depth) -> list:
+        """
+        Function to create the statements for `type`, `enum`, `const` and `not`.
+        """
+        lines = []
+
+        if "type" in schema:
+            types = schema["type"]
+            types = [types] if isinstance(types, str) else list(types)
+
+            if any(t not in TYPE_CHECKS for t in types):
+                raise UnsupportedSchema(f"Unsupported type: {types!r}")
+
+            condition = " or ".join(TYPE_CHECKS[t].format(v=v) for t in types)
+            lines.append(self.indent(depth, f"if not ({condition}): return False"))
+
+        if "enum" in schema:
+            lines.append(self.indent(depth, self.membership(v, schema["enum"])))
+
+        if "const" in schema:
+            lines.append(self.indent(depth, self.membership(v, [schema["const"]])))
+
+        if "not" in schema:
+            lines.append(self.indent(depth, f"if {self.function(schema['not'])}({v}): return False"))
+
+        return lines
+
+    def condition_statements(self, schema, v, depth, is_object) -> list:
+        """
+        Function to create the statements for `if`, `then` and `else`.
+        """
+        if "if" not in schema or ("then" not in schema and "else" not in schema):
+            return []
+
+        condition = self.function(schema["if"])
+        then_lines = self.statements(schema.get("then", True), v, depth + 1, is_object)
+        else_lines = self.statements(schema.get("else", True), v, depth + 1, is_object)
+
+        lines = [self.indent(depth, f"if {condition}({v}):")]
+        lines += then_lines or [self.indent(depth + 1, "pass")]
+
+        if else_lines:
+            lines.append(self.indent(depth, "else:"))
+            lines += else_lines
+
+        return lines
+
+    def object_statements(self, schema, v, depth) -> list:
+        lines = []
+        properties = schema.get("properties", {})
+
+        if schema.get("required"):
+            keys = self.constant(frozenset(schema["required"]))
+            lines.append(self.indent(depth, f"if not {keys} <= {v}.keys(): return False"))
+
+        additional = schema.get("additionalProperties", True)
+
+        if additional is False:
+            keys = self.constant(frozenset(properties))
+            lines.append(self.indent(depth, f"if not {v}.keys() <= {keys}: return False"))
+        elif additional is not True:
+            raise UnsupportedSchema("Only boolean additionalProperties are supported")
+
+        child = f"v{depth + 1}"
+
+        for key, subschema in properties.items():
+            body = self.statements(subschema, child, depth + 1)
+
+            if body:
+                lines.append(self.indent(depth, f"if {key!r} in {v}:"))
+                lines.append(self.indent(depth + 1, f"{child} = {v}[{key!r}]"))
+                lines += body
+
+        return lines
+
+    def array_statements(self, items, v, depth) -> list:
+        if not isinstance(items, (dict, bool)):
+            raise UnsupportedSchema("Only a single schema for array items is supported")
+
+        child = f"v{depth + 2}"
+        body = self.statements(items, child, depth + 2)
+
+        if not body:
+            return []
+
+        return [
+            self.indent(depth, f"if isinstance({v}, list):"),
+            self.indent(depth + 1, f"for {child} in {v}:"),
+        ] + body
+
+    def membership(self, v, values) -> str:
+        """
+        Function to create the statement for an `enum` or `const` keyword.
+        ---
+        Only string values are supported, since `==` would treat True, 1 and 1.0 as
+        equal where jsonschema doesn't.
+        """
+        if not all(isinstance(value, str) for value in values):
+            raise UnsupportedSchema("Only string enum and const values are supported")
+
+        values = self.constant(frozenset(values))
+
+        return f"if not (isinstance({v}, str) and {v} in {values}): return False"
+
+    @staticmethod
+    def indent(depth, line) -> str:
+        return "    " * depth + line
+
+
+def compile_schema(schema) -> Optional[Callable[[object], bool]]:
+    """
+    Function to compile a schema into a function that accepts valid bodies quickly.
+    ---
+    Returns None if the schema uses a keyword that isn't supported, in which case
+    every body should be checked by the full validator.
+    """
+    compiler = SchemaCompiler()
+
+    try:
+        entry = compiler.function(schema)
+    except UnsupportedSchema:
+        return None
+
+    source = "\n\n".join(compiler.functions)
+    check = load_check(compile(source, "<compiled schema>", "exec"), entry, compiler.constants)
+    check.source = source
+
+    return check
+
+
+def load_check(code, entry, constants) -> Callable[[object], bool]:
+    """
+    Function to create the check from the code compiled by `compile_schema`.
+    ---
+    The check keeps its `code`, `entry` and `constants`, so it can be saved (e.g. with
+    `marshal`) and loaded again without compiling the schema.
+    """
+    namespace = dict(constants, _Number=numbers.Number)
+
+    exec(code, namespace)
+
+    check = namespace[entry]
+    check.code, check.entry, check.constants = code, entry, constants
+
+    return check
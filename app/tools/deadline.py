@@ -0,0 +1,133 @@
+import os
+import threading
+
+"""
+    Exceptions raised when grading takes too long.
+"""
+
+
+class GradingCancelled(BaseException):
+    """
+    Raised by `checkpoint` in the thread running a grading function once its deadline has passed.
+    ---
+    This derives from BaseException so that an `except Exception` in the grading
+    function doesn't stop it from being cancelled.
+    """
+    pass
+
+
+class GradingTimeout(Exception):
+    def __init__(self, timeout):
+        super().__init__(f"Grading did not finish within {timeout} seconds.")
+        self.timeout = timeout
+
+
+"""
+    Cancellable calls.
+"""
+
+# The CancellableCall running in each thread, if any
+_local = threading.local()
+
+
+def checkpoint():
+    """
+    Function to stop the grading call running in this thread if it has been cancelled.
+    ---
+    Grading code calls this between stages, where no lock is held and no cache is
+    half updated, so a cancelled call stops at the next one. Outside a
+    CancellableCall it does nothing.
+    """
+    call = getattr(_local, "call", None)
+
+    if call is not None and call.state == call.CANCELLED:
+        raise GradingCancelled()
+
+
+class CancellableCall:
+    """
+    Class used to run a function in an executor thread in a way that can be stopped.
+    ---
+    `run` is submitted to the executor and `cancel` can be called from any other
+    thread. A call cancelled before it starts never runs, and one that is running
+    raises GradingCancelled at its next `checkpoint`, so it is never stopped halfway
+    through updating a cache. The work between two checkpoints (e.g. one long call
+    into C code) still runs to the end; the sandbox's worker is killed instead.
+    """
+    PENDING, RUNNING, DONE, CANCELLED = range(4)
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+        self.state = self.PENDING
+        self._lock = threading.Lock()
+
+    def run(self):
+        with self._lock:
+            if self.state == self.CANCELLED:
+                raise GradingCancelled()
+
+            self.state = self.RUNNING
+
+        previous = getattr(_local, "call", None)
+        _local.call = self
+
+        try:
+            return self.function(*self.args)
+        finally:
+            _local.call = previous
+
+            with self._lock:
+                self.state = self.DONE
+
+    def cancel(self) -> bool:
+        """
+        Function to stop the call, returning False if it had already finished.
+        """
+        with self._lock:
+            if self.state == self.DONE:
+                return False
+
+            self.state = self.CANCELLED
+
+            return True
+
+
+"""
+    Deadlines.
+"""
+
+
+def get_deadline(params) -> float:
+    """
+    Function to return the number of seconds grading may take, or None for no limit.
+    ---
+    A positive number under `grading_timeout` in the request params takes
+    precedence over the `GRADING_TIMEOUT` environment variable.
+    """
+    timeout = params.get("grading_timeout") if isinstance(params, dict) else None
+
+    if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+        timeout = float(os.environ.get("GRADING_TIMEOUT", 0) or 0)
+
+    return timeout or None
+
+
+async def run_with_deadline(function, *args, timeout=None, executor=None):
+    """
+    Function to run `function(*args)` in an executor, stopping it after `timeout` seconds.
+    ---
+    GradingTimeout is raised if the deadline passes, after the call has been
+    cancelled. If `timeout` is None the call can take as long as it needs.
+    """
+    import asyncio
+
+    call = CancellableCall(function, *args)
+    future = asyncio.get_running_loop().run_in_executor(executor, call.run)
+
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        call.cancel()
+        raise GradingTimeout(timeout)
@@ -0,0 +1,18 @@
+"""
+    Exceptions a grading function can raise to return a specific error.
+"""
+
+
+class GradingError(Exception):
+    """
+    Raised by a grading function to return `error` as the error of the response.
+    ---
+    `error` must be a JSON-encodable dictionary with a `message`. Any other exception
+    raised while grading is returned as a generic error with its description.
+    """
+    def __init__(self, error: dict):
+        super().__init__(error["message"])
+        self.error = error
+
+    def __reduce__(self):
+        return (type(self), (self.error,))
@@ -1,9 +1,22 @@
+import functools
+from typing import Tuple
+
 from ..algorithm import grading_function
 
 from .parse import parse_body
-from .healthcheck import healthcheck
+from .cache import cache_stats, call_memoized
+from .deadline import GradingTimeout
+from .errors import GradingError
+from .store import env_flag
+from .timing import stage
+from . import memory
+from . import timing
+from . import warmup
 
 from . import validate as v
+
+# The healthcheck (which loads the unittests), the sandbox and asyncio are imported
+# by the functions that use them, to keep cold starts short.
 """
     Command Handler Functions.
 """
@@ -20,19 +33,83 @@ def handle_unknown_command(command):
     return {
         "error": {
             "message":
-            f"Unknown command '{command}'. Only 'grade' and 'healthcheck' are allowed."
+            f"Unknown command '{command}'. Only 'grade', 'grade_batch' and 'healthcheck' are allowed."
         }
     }
 
 
-def handle_healthcheck_command():
+def handle_healthcheck_command(headers={}):
     """
     Function to create the response when commanded to perform a healthcheck.
     ---
     This function does not handle any of the request body so it is neither parsed or
-    validated against a schema.
+    validated against a schema. The counters of the caches kept in the container are
+    included in the result under `caches`, those of the grading sandbox under
+    `sandbox` once it has started, and how the container was warmed up under
+    `snapshot`. With a `debug: memory` header, the memory report (see `memory`) is
+    included under `memory`.
     """
-    return {"command": "healthcheck", "result": healthcheck()}
+    from .healthcheck import healthcheck
+    from . import sandbox
+
+    result = healthcheck()
+    result["caches"] = cache_stats()
+    result["snapshot"] = warmup.stats()
+
+    if memory.requested(headers):
+        result["memory"] = memory.report()
+
+    sandbox_stats = sandbox.pool_stats()
+
+    if sandbox_stats is not None:
+        result["sandbox"] = sandbox_stats
+
+    return {"command": "healthcheck", "result": result}
+
+
+def run_grading_function(body: dict, timeout: float = None) -> Tuple[dict, dict]:
+    """
+    Function to run the grading function on a request body that has been validated.
+    ---
+    Returns a tuple, first element of which is the result of the grading function,
+    second of which is a JSON-encodable dictionary describing the exception raised
+    while grading, if there was one.
+
+    A GradingError raised by the grading function is returned as its own error, with
+    any other fields it has.
+
+    If the grading function is marked as deterministic, the result of a request that
+    has been graded before is returned from the result cache instead. If the
+    `GRADING_SANDBOX` environment variable is set, grading runs in the sandbox's
+    worker processes rather than in this one, and a worker still grading after
+    `timeout` seconds is killed and GradingTimeout raised.
+    """
+    try:
+        response = body["response"]
+        answer = body["answer"]
+
+        params = body.get("params", dict())
+
+        runner = None
+
+        if env_flag("GRADING_SANDBOX"):
+            from . import sandbox
+            runner = functools.partial(sandbox.get_pool(grading_function).grade, timeout=timeout)
+
+        return call_memoized(grading_function, response, answer, params, runner), None
+
+    except GradingError as e:
+        return None, dict(e.error)
+
+    except Exception as e:
+        if timeout is not None and isinstance(e, GradingTimeout):
+            raise
+
+        return None, {
+            "message":
+            "An exception was raised while executing the grading function.",
+            "description": str(e) if str(e) != "" else repr(e)
+        }
 
 
 def handle_grade_command(event):
@@ -45,36 +122,157 @@ def handle_grade_command(event):
     If any of these fail, a message is returned and an error field is passed if more
     information can be provided.
     """
-    body, parse_error = parse_body(event)
+    with stage("parse_body"):
+        body, parse_error = parse_body(event)
 
     if parse_error:
         return {"error": parse_error}
 
-    request_error = v.validate_request(body)
+    with stage("validate_request"):
+        request_error = v.validate_request(body)
 
     if request_error:
         return {"error": request_error}
 
-    try:
-        response = body["response"]
-        answer = body["answer"]
+    with stage("grading_function"):
+        result, grading_error = run_grading_function(body)
 
-        params = body.get("params", dict())
+    if grading_error:
+        return {"error": grading_error}
 
-        return {
-            "command": "grade",
-            "result": grading_function(response, answer, params)
-        }
+    return {"command": "grade", "result": result}
 
-    except Exception as e:
+
+async def handle_grade_command_async(event):
+    """
+    Function to create the response when commanded to grade an answer, with a deadline.
+    ---
+    This works like `handle_grade_command`, except the grading function is run in an
+    executor thread. If it takes longer than the deadline set by `grading_timeout` in
+    the params or the `GRADING_TIMEOUT` environment variable, it is cancelled and an
+    error with the `timeout` in seconds is returned instead.
+
+    A cancelled thread only stops at the next checkpoint between grading stages (see
+    `deadline.checkpoint`), so it never leaves a cache half updated. With the sandbox,
+    the worker is killed at the deadline instead, which also stops one long call into
+    C code. Responses that would make such a call (e.g. `9^9^9^9`) are rejected by the
+    complexity limits before grading starts.
+    """
+    from ..symbolic.complexity import check_response
+    from .deadline import get_deadline, run_with_deadline
+
+    with stage("parse_body"):
+        body, parse_error = parse_body(event)
+
+    if parse_error:
+        return {"error": parse_error}
+
+    with stage("validate_request"):
+        request_error = v.validate_request(body)
+
+    if request_error:
+        return {"error": request_error}
+
+    params = body.get("params", dict())
+    timeout = get_deadline(params)
+
+    try:
+        check_response(body["response"], params)
+    except GradingError as e:
+        return {"error": dict(e.error)}
+
+    try:
+        with stage("grading_function"):
+            result, grading_error = await run_with_deadline(
+                run_grading_function, body, timeout, timeout=timeout)
+    except GradingTimeout as e:
         return {
             "error": {
-                "message":
-                "An exception was raised while executing the grading function.",
-                "description": str(e) if str(e) != "" else repr(e)
+                "message": "The grading function did not finish before the deadline.",
+                "description": str(e),
+                "timeout": e.timeout
             }
         }
 
+    if grading_error:
+        return {"error": grading_error}
+
+    return {"command": "grade", "result": result}
+
+
+def merge_shared_fields(shared: dict, item: dict) -> dict:
+    """
+    Function to merge the shared `answer` and `params` of a batch into one of its items.
+    ---
+    Params that aren't an object on either side are left for `validate_request` to
+    report, with the item's own taking precedence.
+    """
+    merged = {**shared, **item}
+
+    if isinstance(shared.get("params"), dict) and isinstance(item.get("params"), dict):
+        merged["params"] = {**shared["params"], **item["params"]}
+
+    return merged
+
+
+def handle_grade_batch_command(event):
+    """
+    Function to create the response when commanded to grade a batch of answers.
+    ---
+    The body contains a list of `items`, each of which is a grading request, and
+    optionally an `answer` and `params` shared by every item. An item without its own
+    `answer` gets the shared one, which `parse_answer` parses once and reuses for every
+    item with the same params (see `memoize_answer`). An item's `params` are merged into the shared params key by key, with the
+    item's values taking precedence.
+
+    Every item is validated and graded on its own, and the results are returned in
+    the same order as the items. An item that fails gets an `error` in place of its
+    `result`, so one bad item doesn't fail the rest of the batch.
+    """
+    with stage("parse_body"):
+        body, parse_error = parse_body(event)
+
+    if parse_error:
+        return {"error": parse_error}
+
+    with stage("validate_batch"):
+        batch_error = v.validate_batch(body)
+
+    if batch_error:
+        return {"error": batch_error}
+
+    shared = {key: body[key] for key in ("answer", "params") if key in body}
+    results = []
+
+    for item in body["items"]:
+        if isinstance(item, dict):
+            item = merge_shared_fields(shared, item)
+
+        with stage("validate_request"):
+            request_error = v.validate_request(item)
+
+        if request_error:
+            results.append({"error": request_error})
+            continue
+
+        with stage("grading_function"):
+            result, grading_error = run_grading_function(item)
+
+        if grading_error:
+            results.append({"error": grading_error})
+            continue
+
+        # Validate each result on its own, so a bad one doesn't fail the whole response
+        with stage("validate_response"):
+            response_error = v.validate_response({"command": "grade", "result": result})
+
+        if response_error:
+            results.append({"error": response_error})
+        else:
+            results.append({"result": result})
+
+    return {"command": "grade_batch", "result": {"results": results}}
+
 
 """
     Main Handler Function
@@ -88,20 +286,65 @@ def handler(event, context={}):
     This function invokes the handler function for that particular command and returns
     the result. It also performs validation on the response body to make sure it follows
     the schema set out in the request-response-schema repo.
+
+    If timing is switched on (see `timing`), the time spent in each stage is logged,
+    and returned under `timings` when the request has a `debug: timings` header. The
+    memory used is measured the same way (see `memory`), and returned under `memory`
+    with a `debug: memory` header.
     """
     headers = event.get("headers", dict())
     command = headers.get("command", "grade")
 
+    timer = timing.start(headers)
+
     if command == "healthcheck":
-        response = handle_healthcheck_command()
+        with stage("healthcheck"):
+            response = handle_healthcheck_command(headers)
     elif command == "grade":
         response = handle_grade_command(event)
+    elif command == "grade_batch":
+        response = handle_grade_batch_command(event)
     else:
         response = handle_unknown_command(command)
 
-    response_error = v.validate_response(response)
+    with stage("validate_response"):
+        if command == "grade_batch":
+            response_error = v.validate_batch_response(response)
+        else:
+            response_error = v.validate_response(response)
+
+    if response_error:
+        response = {"error": response_error}
+
+    return timing.finish(timer, command, response)
+
+
+async def async_handler(event, context={}):
+    """
+    Variant of `handler` for use in an asyncio event loop.
+    ---
+    The `grade` command is handled by `handle_grade_command_async`, so grading is
+    subject to a deadline; every other command is passed to `handler` in an executor
+    thread. A synchronous caller can use it with `asyncio.run(async_handler(event))`.
+    """
+    headers = event.get("headers", dict())
+    command = headers.get("command", "grade")
+
+    if command != "grade":
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, handler, event, context)
+
+    timer = timing.start(headers)
+    response = await handle_grade_command_async(event)
+
+    with stage("validate_response"):
+        response_error = v.validate_response(response)
 
     if response_error:
-        return {"error": response_error}
+        response = {"error": response_error}
+
+    return timing.finish(timer, command, response)
+
 
-    return response
+# Load the snapshot built into the image, if there is one, as `WARMUP` says
+warmup.start()
@@ -1,9 +1,17 @@
 import unittest
 import time
 import os
-import sys
+import json
+import fnmatch
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
 
 from .. import tests
+from .cache import env_number
+
+# The suites are independent of each other, so they can run at the same time
+SUITES = (tests.TestRequestValidation, tests.TestResponseValidation, tests.TestGradingFunction)
 
 """
     Extension of the default TestResult class with timing information.
@@ -15,12 +23,12 @@ class HealthcheckResult(unittest.TextTestResult):
         self.test_timings = []
 
     def startTest(self, test):
-        self._start_time = time.time()
+        self._start_time = time.perf_counter_ns()
         super().startTest(test)
 
     def addSuccess(self, test):
-        elapsed_time_s = time.time() - self._start_time
-        elapsed_time_us = round(1000000 * elapsed_time_s)
+        elapsed_time_ns = time.perf_counter_ns() - self._start_time
+        elapsed_time_us = round(elapsed_time_ns / 1000)
         self.test_timings.append((test.id(), elapsed_time_us))
 
         super().addSuccess(test)
@@ -49,7 +57,15 @@ class HealthcheckRunner(unittest.TextTestRunner):
             - `errors` (list): A list of all tests that caused an error, including the
                 name and traceback of failures.
         """
-        result = super().run(test)
+        # TextTestRunner.run changes the global warning filters and prints a summary,
+        # neither of which is safe while other suites run in other threads
+        result = self._makeResult()
+        result.startTestRun()
+
+        try:
+            test(result)
+        finally:
+            result.stopTestRun()
 
         results = {
             "tests_passed": result.wasSuccessful(),
@@ -60,32 +76,238 @@ class HealthcheckRunner(unittest.TextTestRunner):
 
         return results
 
-def healthcheck() -> dict:
+"""
+    Benchmark runner, which runs each test many times and reports latency percentiles.
+"""
+
+def iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+def percentiles(samples_ns) -> dict:
+    """
+    Function to summarise a list of timings in nanoseconds as percentiles in microseconds.
+    ---
+    Percentiles use the nearest-rank method, so each one is a time that was measured.
+    """
+    samples = sorted(samples_ns)
+
+    def rank(p):
+        return samples[max(0, -(-p * len(samples) // 100) - 1)]
+
+    summary = {
+        "min": samples[0],
+        "median": rank(50),
+        "p95": rank(95),
+        "p99": rank(99)
+    }
+
+    return {name: round(value / 1000, 3) for (name, value) in summary.items()}
+
+def measure_memory(test, result) -> dict:
+    """
+    Function to run a test once under tracemalloc and return its memory use in bytes.
+    ---
+    `delta` is the memory still allocated after the test, `peak` the most allocated
+    while it ran. If tracemalloc was already tracing, it is left running.
+    """
+    tracing = tracemalloc.is_tracing()
+
+    if not tracing:
+        tracemalloc.start()
+
+    # Python 3.8 can't reset the peak, which is only exact there if tracing starts here
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+
+    before, _ = tracemalloc.get_traced_memory()
+
+    test(result)
+
+    after, peak = tracemalloc.get_traced_memory()
+
+    if not tracing:
+        tracemalloc.stop()
+
+    return {"delta": after - before, "peak": peak - before}
+
+def load_budgets() -> dict:
+    """
+    Function to read the latency budgets from `HEALTHCHECK_BUDGETS`.
+    ---
+    The budgets are a JSON object mapping test ids, which may contain shell-style
+    wildcards, to the maximum of each percentile in microseconds, e.g.
+    `{"*": {"p95": 5000}, "*TestGradingFunction*": {"p99": 20000}}`.
+    """
+    budgets = os.environ.get("HEALTHCHECK_BUDGETS", "").strip()
+
+    return json.loads(budgets) if budgets else {}
+
+class BenchmarkRunner:
+    """
+    Class used to run each test `runs` times after `warmup` untimed runs.
+    ---
+    The result has the same fields as HealthcheckRunner's, where `time` is the median
+    and each success also has `latency_us`, its percentiles in microseconds, and
+    `memory_bytes`. A test whose percentiles go over one of the `budgets` is added to
+    `failures` instead, with the same fields and a message saying which budget it broke.
+    """
+    def __init__(self, runs=10, warmup=1, budgets=None):
+        self.runs = max(1, runs)
+        self.warmup = max(0, warmup)
+        self.budgets = budgets or {}
+
+    def check_budgets(self, name, latency) -> list:
+        messages = []
+
+        for (pattern, budget) in self.budgets.items():
+            if not fnmatch.fnmatchcase(name, pattern):
+                continue
+
+            for (percentile, limit) in budget.items():
+                if percentile in latency and latency[percentile] > limit:
+                    messages.append(
+                        f"{percentile} latency of {latency[percentile]}us is over the "
+                        f"budget of {limit}us.")
+
+        return messages
+
+    def run(self, suite) -> dict:
+        successes, failures, errors = [], [], []
+
+        for test in iter_tests(suite):
+            name = test.id()
+            result = unittest.TestResult()
+            samples = []
+
+            for _ in range(self.warmup):
+                test(result)
+
+            for _ in range(self.runs):
+                if not result.wasSuccessful():
+                    break
+
+                start = time.perf_counter_ns()
+                test(result)
+                samples.append(time.perf_counter_ns() - start)
+
+            if result.wasSuccessful():
+                memory = measure_memory(test, result)
+
+            if result.errors:
+                errors.append({"name": name})
+                continue
+
+            if result.failures:
+                failures.append({"name": name})
+                continue
+
+            latency = percentiles(samples)
+            measured = {
+                "name": name,
+                "time": round(latency["median"]),
+                "runs": len(samples),
+                "latency_us": latency,
+                "memory_bytes": memory
+            }
+
+            messages = self.check_budgets(name, latency)
+
+            if messages:
+                failures.append({**measured, "message": " ".join(messages)})
+            else:
+                successes.append(measured)
+
+        return {
+            "tests_passed": not failures and not errors,
+            "successes": successes,
+            "failures": failures,
+            "errors": errors
+        }
+
+def merge_results(results) -> dict:
+    return {
+        "tests_passed": all(r["tests_passed"] for r in results),
+        "successes": [t for r in results for t in r["successes"]],
+        "failures": [t for r in results for t in r["failures"]],
+        "errors": [t for r in results for t in r["errors"]]
+    }
+
+def run_healthcheck(runs=1, warmup=1, budgets=None, workers=None) -> dict:
+    """
+    Function used to run the unittests and return the results in a JSON-encodable format.
+    ---
+    Each suite is run by its own HealthcheckRunner in a pool of `workers` threads, and
+    the results are merged in the order of SUITES. Benchmarks run one test at a time,
+    so that the tests don't slow each other down.
+    """
+    loader = unittest.TestLoader()
+    suites = [loader.loadTestsFromTestCase(case) for case in SUITES]
+
+    if runs > 1:
+        runner = BenchmarkRunner(runs=runs, warmup=warmup, budgets=budgets)
+        return runner.run(unittest.TestSuite(suites))
+
+    workers = len(suites) if workers is None else max(1, workers)
+
+    if workers == 1:
+        return merge_results([HealthcheckRunner(verbosity=0).run(s) for s in suites])
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="healthcheck") as pool:
+        return merge_results(list(pool.map(HealthcheckRunner(verbosity=0).run, suites)))
+
+"""
+    Cache of the most recent healthcheck.
+"""
+
+_cached = None
+_cached_lock = threading.Lock()
+
+def healthcheck(runs=None, warmup=None, budgets=None, max_age=None) -> dict:
     """
     Function used to return the results of the unittests in a JSON-encodable format.
     ---
     Therefore, this can be used as a healthcheck to make sure the algorithm is 
     running as expected, and isn't taking too long to complete due to, e.g., issues 
     with load balancing.
+
+    Each test is run once, unless `runs` (or `HEALTHCHECK_RUNS`) is more than one, in
+    which case it is benchmarked by BenchmarkRunner after `warmup` (or
+    `HEALTHCHECK_WARMUP`, 1 by default) untimed runs and checked against `budgets`
+    (or `HEALTHCHECK_BUDGETS`). The suites run in `HEALTHCHECK_WORKERS` threads.
+
+    The result is reused for `max_age` (or `HEALTHCHECK_CACHE_SECONDS`, 5 by default)
+    seconds, so frequent probes don't run the tests every time. Probes arriving while
+    the tests run wait for that run instead of starting their own.
     """
-    # Redirect stderr stream to a null stream so the unittests are not logged on the console.
-    no_stream = open(os.devnull, 'w')
-    sys.stderr = no_stream
+    global _cached
 
-    # Create a test loader and test runner instance
-    loader = unittest.TestLoader()
+    runs = env_number("HEALTHCHECK_RUNS", 1) if runs is None else runs
+    warmup = env_number("HEALTHCHECK_WARMUP", 1) if warmup is None else warmup
+    budgets = load_budgets() if budgets is None else budgets
+    max_age = env_number("HEALTHCHECK_CACHE_SECONDS", 5, float) if max_age is None else max_age
+
+    key = (runs, warmup, json.dumps(budgets, sort_keys=True))
+
+    with _cached_lock:
+        if _cached is not None:
+            (cached_key, checked_at, result) = _cached
 
-    request_tests = loader.loadTestsFromTestCase(tests.TestRequestValidation)
-    response_tests = loader.loadTestsFromTestCase(tests.TestResponseValidation)
-    grading_tests = loader.loadTestsFromTestCase(tests.TestGradingFunction)
+            if cached_key == key and time.monotonic() - checked_at < max_age:
+                return dict(result)
 
-    suite = unittest.TestSuite([request_tests, response_tests, grading_tests])
-    runner = HealthcheckRunner(verbosity=0)
+        result = run_healthcheck(
+            runs, warmup, budgets, workers=env_number("HEALTHCHECK_WORKERS", None))
+        _cached = (key, time.monotonic(), result)
 
-    result = runner.run(suite)
+    # The handler adds its own fields to the result, which mustn't end up in the cache
+    return dict(result)
 
-    # Reset stderr and close the null stream
-    sys.stderr = sys.__stderr__
-    no_stream.close()
+def clear_cache():
+    global _cached
 
-    return result
\ No newline at end of file
+    with _cached_lock:
+        _cached = None
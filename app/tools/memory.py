@@ -0,0 +1,246 @@
+"""
+    Opt-in memory profiling of the handler with tracemalloc.
+
+    A warm container keeps growing as expressions and caches build up, until Lambda
+    kills it. To find what grows, memory can be measured for every request with
+    `enable()` or the `HANDLER_MEMORY` environment variable, or for a single request
+    by sending a `debug` header containing "memory", in which case the measurements
+    are also returned in the response under `memory`. For the request, and for each
+    stage measured with `timing.stage`, they are:
+        peak (int): the most bytes allocated at once, above what was allocated when
+            it started. On Python 3.8, which can't reset the peak, the peak is only
+            sampled at the start and end of each stage.
+        net (int): the bytes still allocated when it ended, e.g. added to caches.
+        blocks (int): the change in the number of allocated memory blocks.
+    Each measured request is logged as one JSON line, with `over_budget` set when its
+    peak is over `MEMORY_BUDGET_BYTES`, if that is set.
+
+    When memory is measured for every request, tracing stays on between requests
+    (keeping `MEMORY_TRACE_FRAMES` frames of each allocation, 1 by default), and a
+    healthcheck sent with a `debug: memory` header reports under `memory` the
+    `MEMORY_TOP_SITES` lines of code (10 by default) that hold the most memory, and
+    those that grew the most since the previous report. For a single request, tracing
+    is stopped again once it and every other request measured at the same time are
+    done, so it costs nothing afterwards.
+
+    tracemalloc traces the whole process, so requests handled at the same time in
+    other threads are counted together. It is only imported when memory is measured.
+"""
+import sys
+import threading
+
+from .cache import env_number
+from .store import env_flag
+
+_enabled = env_flag("HANDLER_MEMORY")
+
+BUDGET_BYTES = env_number("MEMORY_BUDGET_BYTES", 0)
+TOP_SITES = env_number("MEMORY_TOP_SITES", 10)
+TRACE_FRAMES = env_number("MEMORY_TRACE_FRAMES", 1)
+
+# Counters of every measured request, reported in the healthcheck
+counters = {"requests": 0, "over_budget": 0, "largest_peak": None}
+
+# Snapshot taken by the previous report, which the next one is compared to
+_previous = None
+
+# Set while tracing is only on for the requests being measured
+_request_only = False
+
+# Requests measured with the tracing they started, which is stopped when the last one ends
+_active = 0
+_active_lock = threading.Lock()
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def requested(headers) -> bool:
+    return "memory" in str(headers.get("debug", "")).lower()
+
+
+"""
+    Trackers.
+"""
+
+
+class Tracker:
+    """
+    Class used to measure the memory used by one request and each of its stages.
+    ---
+    The peak of tracemalloc is reset when each stage starts, so it only covers that
+    stage. The peak reached before is first added to the request's and to any stage
+    that is still open, so resetting doesn't lose it.
+
+    A tracker that starts tracing, or starts while another one that did is still
+    measuring, is counted in `_active`, and tracing is only stopped by the last of
+    them to finish.
+    """
+    __slots__ = ("tracemalloc", "started", "attach", "start_bytes", "start_blocks",
+                 "peak", "open", "stages")
+
+    def __init__(self, attach=False):
+        global _request_only, _active
+
+        import tracemalloc
+
+        self.tracemalloc = tracemalloc
+        self.attach = attach
+
+        with _active_lock:
+            self.started = _active > 0 or not tracemalloc.is_tracing()
+
+            if self.started:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(TRACE_FRAMES)
+                    _request_only = not _enabled
+
+                _active += 1
+
+        self.open = []
+        self.stages = {}
+        self.start_bytes, _ = self.sample()
+        self.peak = self.start_bytes
+        self.start_blocks = sys.getallocatedblocks()
+
+    def sample(self):
+        """
+        Function to return the bytes allocated now and the peak since the last sample.
+        """
+        current, peak = self.tracemalloc.get_traced_memory()
+
+        if hasattr(self.tracemalloc, "reset_peak"):
+            self.tracemalloc.reset_peak()
+        else:
+            peak = current
+
+        for entry in self.open:
+            entry[2] = max(entry[2], peak)
+
+        return current, peak
+
+    def enter(self):
+        current, peak = self.sample()
+        self.peak = max(self.peak, peak)
+        self.open.append([current, sys.getallocatedblocks(), current])
+
+    def exit(self, name):
+        current, peak = self.sample()
+        self.peak = max(self.peak, peak)
+
+        start_bytes, start_blocks, stage_peak = self.open.pop()
+        usage = self.stages.setdefault(name, {"peak": 0, "net": 0, "blocks": 0})
+
+        usage["peak"] = max(usage["peak"], stage_peak - start_bytes)
+        usage["net"] += current - start_bytes
+        usage["blocks"] += sys.getallocatedblocks() - start_blocks
+
+    def result(self) -> dict:
+        global _request_only, _active
+
+        current, peak = self.sample()
+        self.peak = max(self.peak, peak)
+
+        if self.started:
+            with _active_lock:
+                _active -= 1
+
+                if _active == 0 and not _enabled:
+                    self.tracemalloc.stop()
+                    _request_only = False
+
+        return {
+            "peak": self.peak - self.start_bytes,
+            "net": current - self.start_bytes,
+            "blocks": sys.getallocatedblocks() - self.start_blocks,
+            "stages": self.stages
+        }
+
+
+def start(headers):
+    """
+    Function to start measuring a request, returning None if memory isn't measured for it.
+    """
+    attach = requested(headers)
+
+    return Tracker(attach=attach) if _enabled or attach else None
+
+
+def finish(tracker, command) -> dict:
+    """
+    Function to stop measuring a request, log its usage and return it.
+    ---
+    `over_budget` is set if the peak of the request was over `MEMORY_BUDGET_BYTES`.
+    """
+    from .timing import log
+
+    usage = tracker.result()
+    usage["over_budget"] = bool(BUDGET_BYTES) and usage["peak"] > BUDGET_BYTES
+
+    counters["requests"] += 1
+    counters["over_budget"] += usage["over_budget"]
+
+    if counters["largest_peak"] is None or usage["peak"] > counters["largest_peak"]["peak"]:
+        counters["largest_peak"] = {"command": command, "peak": usage["peak"]}
+
+    log({"event": "memory", "command": command, "unit": "bytes",
+         "budget": BUDGET_BYTES or None, "memory": usage})
+
+    return usage
+
+
+"""
+    Allocation sites.
+"""
+
+
+def site(statistic) -> dict:
+    frame = statistic.traceback[0]
+
+    return {"site": f"{frame.filename}:{frame.lineno}", "bytes": statistic.size, "blocks": statistic.count}
+
+
+def report(top: int = None) -> dict:
+    """
+    Function to return the counters, and the `top` lines of code holding the most memory.
+    ---
+    `growth` has the lines whose memory grew the most since the previous report, so
+    calling it every so often shows what leaks. Lines are only reported while tracing
+    is on for every request (or was started with `PYTHONTRACEMALLOC`).
+    """
+    global _previous
+
+    import tracemalloc
+
+    top = top or TOP_SITES
+    result = {"tracing": tracemalloc.is_tracing() and not _request_only,
+              "budget": BUDGET_BYTES or None, **counters}
+
+    if not result["tracing"]:
+        return result
+
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ])
+
+    result["traced_bytes"], _ = tracemalloc.get_traced_memory()
+    result["top"] = [site(statistic) for statistic in snapshot.statistics("lineno")[:top]]
+
+    if _previous is not None:
+        grown = [difference for difference in snapshot.compare_to(_previous, "lineno")
+                 if difference.size_diff > 0][:top]
+        result["growth"] = [
+            {**site(difference), "bytes": difference.size_diff, "blocks": difference.count_diff}
+            for difference in grown]
+
+    _previous = snapshot
+
+    return result
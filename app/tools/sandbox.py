@@ -0,0 +1,317 @@
+"""
+    Process-isolated grading sandbox.
+
+    Grading calls are sent to a pool of worker processes, so a grading function that
+    exhausts memory or loops forever only takes down its worker instead of the whole
+    container. Workers are forked from a forkserver process, which has imported the
+    module of the grading function, and are reused between calls, which keeps the
+    overhead per call to a round trip over a pipe. The forkserver is a new process
+    with a single thread, so unlike forking the handler's process (which may have
+    other threads, e.g. the healthcheck's), a worker can't start with a lock held.
+    Each worker is limited in memory and in CPU time per call, replaced if it
+    crashes and recycled after a fixed number of calls.
+
+    The sandbox is switched on for `handler()` with the `GRADING_SANDBOX` environment
+    variable and configured with `SANDBOX_WORKERS`, `SANDBOX_MAX_REQUESTS`,
+    `SANDBOX_MEMORY_MB` and `SANDBOX_CPU_SECONDS`.
+"""
+import queue
+import atexit
+import signal
+import threading
+import multiprocessing
+
+from .cache import env_number
+from .deadline import GradingTimeout
+from .errors import GradingError
+from .store import env_flag
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, where limits aren't applied
+    resource = None
+
+
+class SandboxError(Exception):
+    pass
+
+
+class SandboxTimeout(SandboxError, GradingTimeout):
+    """
+    Raised when a worker is killed because the grading function went past its timeout.
+    """
+    pass
+
+
+"""
+    Worker process.
+"""
+
+
+def set_memory_limit(memory_mb):
+    if resource is not None and memory_mb:
+        limit = int(memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def set_cpu_limit(cpu_seconds):
+    """
+    Function to limit the CPU time of the next call in this process.
+    ---
+    RLIMIT_CPU counts the CPU time used by the process so far, so the soft limit is
+    moved on before every call. Going over it sends SIGXCPU, which ends the process.
+    The hard limit is left as it was, since a process that isn't privileged (e.g. on
+    Lambda) can lower it but never raise it again.
+    """
+    if resource is None or not cpu_seconds:
+        return
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    limit = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+
+def worker_main(connection, function, memory_mb, cpu_seconds):
+    """
+    Function run by each worker process: grade requests until told to stop.
+    ---
+    Every reply is a tuple of a status and a value. The status is "ok" with the
+    result, "error" with the description of an exception raised by the grading
+    function, "grading_error" with the error of a GradingError, or "memory" if it ran
+    out of memory, after which the worker exits.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_memory_limit(memory_mb)
+
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+
+        # Other workers may hold copies of this pipe, so stopping can't rely on EOF
+        if message is None:
+            return
+
+        response, answer, params = message
+
+        set_cpu_limit(cpu_seconds)
+
+        try:
+            reply = ("ok", function(response, answer, params))
+        except MemoryError:
+            connection.send(("memory", None))
+            return
+        except GradingError as e:
+            reply = ("grading_error", e.error)
+        except Exception as e:
+            reply = ("error", str(e) if str(e) != "" else repr(e))
+
+        connection.send(reply)
+
+
+"""
+    Worker pool.
+"""
+
+
+class Worker:
+    def __init__(self, context, function, memory_mb, cpu_seconds):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=worker_main,
+            args=(child_connection, function, memory_mb, cpu_seconds),
+            daemon=True)
+        self.process.start()
+        child_connection.close()
+
+        self.requests = 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self):
+        if self.connection.closed:
+            return
+
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+
+        self.connection.close()
+        self.process.join(1)
+
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class SandboxPool:
+    """
+    Class used to run a grading function in a pool of reusable worker processes.
+    ---
+    `grade` takes an idle worker, blocking until one is free, so the pool can be
+    shared between threads. A worker is replaced whenever it crashes, runs out of
+    memory or is killed for going past the timeout, and after `max_requests` calls.
+    """
+    def __init__(self, function, workers=1, max_requests=1000, memory_mb=None,
+                 cpu_seconds=None, timeout=None):
+        self.function = function
+        self.size = workers
+        self.max_requests = max_requests
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.timeout = timeout
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self.context = multiprocessing.get_context("forkserver")
+            self.context.set_forkserver_preload([function.__module__])
+        else:
+            self.context = multiprocessing.get_context("spawn")
+
+        self.crashes = 0
+        self.recycles = 0
+
+        self._idle = queue.Queue()
+
+        for _ in range(workers):
+            self._idle.put(self.start_worker())
+
+    def start_worker(self) -> Worker:
+        return Worker(self.context, self.function, self.memory_mb, self.cpu_seconds)
+
+    def grade(self, response, answer, params, timeout=None):
+        """
+        Function to call the grading function in a worker and return its result.
+        ---
+        Raises SandboxError with the description of the exception if the grading
+        function raised one, or with the reason if the worker had to be stopped. A
+        GradingError is raised again as it was. The worker is killed if the call takes
+        longer than `timeout` seconds, or the pool's own timeout if that is shorter,
+        raising SandboxTimeout.
+        """
+        if timeout is None or (self.timeout is not None and self.timeout < timeout):
+            timeout = self.timeout
+
+        worker = self._idle.get()
+        replace = True
+
+        try:
+            worker.connection.send((response, answer, params))
+
+            if not worker.connection.poll(timeout):
+                worker.kill()
+                raise SandboxTimeout(timeout)
+
+            status, value = worker.connection.recv()
+            worker.requests += 1
+
+            if status == "memory":
+                raise SandboxError(
+                    f"The grading function exceeded the memory limit of {self.memory_mb} MB.")
+
+            replace = worker.requests >= self.max_requests
+
+            if replace:
+                self.recycles += 1
+
+            if status == "error":
+                raise SandboxError(value)
+
+            if status == "grading_error":
+                raise GradingError(value)
+
+            return value
+
+        except (EOFError, OSError):
+            self.crashes += 1
+            raise SandboxError(self.describe_crash(worker))
+
+        finally:
+            if replace:
+                worker.stop()
+                worker = self.start_worker()
+
+            self._idle.put(worker)
+
+    def describe_crash(self, worker) -> str:
+        worker.process.join(1)
+
+        if worker.process.exitcode == -getattr(signal, "SIGXCPU", 0):
+            return f"The grading function exceeded the CPU time limit of {self.cpu_seconds} seconds."
+
+        return f"The grading process stopped unexpectedly (exit code {worker.process.exitcode})."
+
+    def close(self):
+        for _ in range(self.size):
+            self._idle.get().stop()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "crashes": self.crashes,
+            "recycles": self.recycles
+        }
+
+
+"""
+    Pool used by the handler.
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    """
+    Function to return whether `handler()` should grade in the sandbox.
+    """
+    return env_flag("GRADING_SANDBOX")
+
+
+def pool_stats() -> dict:
+    """
+    Function to return the counters of the handler's pool, or None if it hasn't started.
+    """
+    with _pool_lock:
+        return _pool.stats() if _pool is not None else None
+
+
+def get_pool(function) -> SandboxPool:
+    """
+    Function to return the pool running `function`, starting it on first use.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None or _pool.function is not function:
+            if _pool is not None:
+                _pool.close()
+
+            _pool = SandboxPool(
+                function,
+                workers=env_number("SANDBOX_WORKERS", 1),
+                max_requests=env_number("SANDBOX_MAX_REQUESTS", 1000),
+                memory_mb=env_number("SANDBOX_MEMORY_MB", 1024),
+                cpu_seconds=env_number("SANDBOX_CPU_SECONDS", 10, float),
+                timeout=env_number("SANDBOX_TIMEOUT", None, float))
+
+        return _pool
+
+
+@atexit.register
+def close_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,211 @@
+"""
+    Local HTTP server for running the grading function outside of AWS Lambda.
+
+    Each POST is turned into the same event dictionary Lambda would pass to
+    `handler()`: the request headers (lower-cased, so the `command` header selects
+    the command) and the request body as text. The event is handled by a pool of
+    worker processes, so one host can use every core, and the result of `handler()`
+    is returned as JSON. If a worker dies (e.g. killed for using too much memory),
+    the pool is replaced and only the requests it was handling fail.
+
+    Usage (from the repository root):
+        python -m app.tools.server [--host HOST] [--port PORT] [--workers N]
+"""
+import os
+import signal
+import argparse
+import threading
+import multiprocessing
+import http.server
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import codec
+from . import warmup
+from .handler import handler
+
+
+def warm_up():
+    """
+    Function run once in each worker process when it starts.
+    ---
+    Builds the schema checks and validators and runs the providers' warm-up (see
+    `warmup.py`), which importing the handler leaves to the first request, so a
+    worker is ready before it is sent one.
+    """
+    warmup.warm_up()
+
+
+class GradingRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Class used to convert HTTP requests into events for the worker pool.
+    ---
+    HTTP/1.1 is used so clients can keep connections alive between requests. An idle
+    connection is closed after `timeout` seconds so it can't hold up a shutdown.
+    A request without a valid Content-Length is answered with 400, and one with a
+    body over `max_body` bytes with 413, without reading the body.
+    """
+    protocol_version = "HTTP/1.1"
+    server_version = "GradingServer"
+    timeout = float(os.environ.get("SERVER_KEEPALIVE_TIMEOUT", 15))
+    max_body = int(os.environ.get("SERVER_MAX_BODY_BYTES", 6 * 1024 * 1024))
+
+    def do_POST(self):
+        length = self.content_length()
+
+        if length is None:
+            return self.reject(400, "The Content-Length header is not a valid length.")
+
+        if length > self.max_body:
+            return self.reject(413, f"The request body is larger than {self.max_body} bytes.")
+
+        body = self.rfile.read(length).decode("utf-8", errors="replace")
+
+        event = {
+            "headers": {key.lower(): value for key, value in self.headers.items()},
+            "body": body
+        }
+
+        try:
+            response = self.server.submit(event).result()
+            self.send_json(200, response)
+        except Exception as e:
+            self.send_json(500, {
+                "error": {
+                    "message": "The server failed to handle the request.",
+                    "description": str(e) if str(e) != "" else repr(e)
+                }
+            })
+
+    def content_length(self):
+        """
+        Function to return the length of the request body, or None if it isn't valid.
+        ---
+        Only digits are accepted, unlike `int()`, which also reads signs, spaces and
+        underscores. A request without the header has no body.
+        """
+        value = self.headers.get("Content-Length", "0")
+
+        if not (value.isascii() and value.isdigit()):
+            return None
+
+        return int(value)
+
+    def reject(self, status, message):
+        # The body is left unread, so the connection can't be used for another request
+        self.close_connection = True
+        self.send_json(status, {"error": {"message": message}})
+
+    def do_GET(self):
+        self.send_json(405, {"error": {"message": "Only POST requests are allowed."}})
+
+    def send_json(self, status, content):
+        encoded = codec.dumps(content)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+
+        if self.close_connection:
+            self.send_header("Connection", "close")
+
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class GradingServer(http.server.ThreadingHTTPServer):
+    """
+    Class used to serve `handler()` over HTTP with a pool of worker processes.
+    ---
+    Requests are read on threads and handled in the worker processes. Closing the
+    server waits for the requests in flight to finish before the workers are stopped.
+    A pool that is broken because a worker died is replaced by the next request.
+    """
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, address, workers=None, quiet=False):
+        super().__init__(address, GradingRequestHandler)
+
+        self.quiet = quiet
+        self.workers = workers or os.cpu_count()
+        self.restarts = 0
+        self.executor_lock = threading.Lock()
+        self.executor = self.start_executor()
+
+    def start_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_up)
+
+    def submit(self, event):
+        """
+        Function to send an event to the worker pool, replacing the pool if it is broken.
+        ---
+        A pool breaks when one of its workers dies, and then fails every call. The
+        requests that were in flight fail with it, but a request submitted afterwards
+        didn't cause it, so it is sent to a new pool instead.
+        """
+        executor = self.executor
+
+        try:
+            return executor.submit(handler, event)
+        except BrokenProcessPool:
+            with self.executor_lock:
+                # Unless another request has already replaced it
+                if self.executor is executor:
+                    self.executor = self.start_executor()
+                    self.restarts += 1
+                    executor.shutdown(wait=False)
+
+                executor = self.executor
+
+            return executor.submit(handler, event)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+def serve(host="127.0.0.1", port=8080, workers=None):
+    """
+    Function to run the server until it receives SIGINT or SIGTERM.
+    ---
+    On either signal the server stops accepting connections, finishes the requests
+    in flight and stops its worker processes before returning.
+    """
+    server = GradingServer((host, port), workers=workers)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"Serving on http://{host}:{server.server_port} "
+          f"with {server.workers} workers")
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("--host", default=os.environ.get("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SERVER_PORT", 8080)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SERVER_WORKERS", 0)))
+    args = parser.parse_args(argv)
+
+    serve(args.host, args.port, args.workers or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+    Shape fingerprints of bodies, for caching validation results.
+
+    Whether a body is valid against a schema usually depends only on its keys and the
+    types of its values, and only where the schema looks: a grading function returns
+    the same few shapes of result over and over. `analyse` walks a schema once and
+    records, for every place in a body the schema constrains:
+        - whether its keys matter (e.g. `required`, `properties`),
+        - which of its values are constrained in turn (`properties`, `items`, ...),
+        - whether the length of an array matters (`minItems`, `maxItems`),
+        - whether the value itself matters (e.g. `enum`, `pattern`, `minimum`), in
+            which case it is part of the fingerprint.
+
+    `fingerprint` then reduces a body to a hashable value that is the same for two
+    bodies only if the schema can't tell them apart, so one that validated stands for
+    all of them. Numbers are fingerprinted by type, with floats split by whether they
+    are whole numbers, which is all `"type": "integer"` looks at. Arrays are
+    fingerprinted by the set of their items' fingerprints, as `items` applies the same
+    schema to each of them.
+
+    Only Draft 7 keywords whose effect is understood are supported: any other keyword
+    (e.g. `$ref`) makes `analyse` return None, and bodies are then always validated.
+"""
+from typing import Optional
+
+# Keywords that don't affect validation
+ANNOTATIONS = {"$schema", "$id", "$comment", "title", "description", "default", "examples",
+               "definitions", "readOnly", "writeOnly"}
+
+# Keywords that constrain the value itself, which is then part of the fingerprint
+VALUE_KEYWORDS = {"enum", "const", "pattern", "format", "minLength", "maxLength", "minimum",
+                  "maximum", "exclusiveMinimum", "exclusiveMaximum", "multipleOf",
+                  "uniqueItems", "contains", "contentMediaType", "contentEncoding"}
+
+# Keywords that look at the keys of an object
+KEY_KEYWORDS = {"required", "minProperties", "maxProperties", "propertyNames", "dependencies",
+                "properties", "patternProperties", "additionalProperties"}
+
+# Keywords whose subschemas apply to the same value
+COMBINATORS = {"allOf", "anyOf", "oneOf", "not", "if", "then", "else"}
+
+TYPES = {bool: "boolean", int: "integer", str: "string", type(None): "null", dict: "object", list: "array"}
+
+
+class UnsupportedSchema(Exception):
+    pass
+
+
+class Unfingerprintable(Exception):
+    pass
+
+
+class Shape:
+    """
+    Class used to record what a schema constrains at one place in a body.
+    ---
+    `properties` maps keys to the shapes of their values, and `other` is the shape of
+    the values of any key (from `additionalProperties` and `patternProperties`), which
+    `analyse` also merges into every shape in `properties`. `items` is the shape of the
+    items of an array.
+    """
+    __slots__ = ("exact", "keys", "length", "properties", "other", "items")
+
+    def __init__(self):
+        self.exact = False
+        self.keys = False
+        self.length = False
+        self.properties = {}
+        self.other = None
+        self.items = None
+
+    def child(self, key) -> "Shape":
+        if key not in self.properties:
+            self.properties[key] = Shape()
+
+        return self.properties[key]
+
+    def merge(self, shape: "Shape"):
+        self.exact = self.exact or shape.exact
+        self.keys = self.keys or shape.keys
+        self.length = self.length or shape.length
+
+        for key, child in shape.properties.items():
+            self.child(key).merge(child)
+
+        if shape.other is not None:
+            self.other = self.other or Shape()
+            self.other.merge(shape.other)
+
+        if shape.items is not None:
+            self.items = self.items or Shape()
+            self.items.merge(shape.items)
+
+    def finish(self):
+        """
+        Function to merge the shape of any key's value into the shapes of named keys.
+        """
+        for child in self.properties.values():
+            if self.other is not None:
+                child.merge(self.other)
+
+            child.finish()
+
+        for child in (self.other, self.items):
+            if child is not None:
+                child.finish()
+
+
+def visit(schema, shape: Shape):
+    """
+    Function to record what `schema` constrains in `shape`, and its subschemas in its children.
+    """
+    if isinstance(schema, bool):
+        return
+
+    if not isinstance(schema, dict):
+        raise UnsupportedSchema(f"Schema must be an object or boolean, got {schema!r}")
+
+    unknown = set(schema) - ANNOTATIONS - VALUE_KEYWORDS - KEY_KEYWORDS - COMBINATORS - {
+        "type", "items", "additionalItems", "minItems", "maxItems"}
+
+    if unknown:
+        raise UnsupportedSchema(f"Unsupported keywords: {sorted(unknown)}")
+
+    if VALUE_KEYWORDS & schema.keys():
+        shape.exact = True
+
+    if KEY_KEYWORDS & schema.keys():
+        shape.keys = True
+
+    if "minItems" in schema or "maxItems" in schema:
+        shape.length = True
+
+    visit_combinators(schema, shape)
+    visit_properties(schema, shape)
+
+    if "items" in schema:
+        if isinstance(schema["items"], list):
+            # Each position has its own schema
+            shape.exact = True
+        else:
+            shape.items = shape.items or Shape()
+            visit(schema["items"], shape.items)
+
+
+def visit_combinators(schema: dict, shape: Shape):
+    """
+    Function to record the subschemas that apply to the same value as `schema`.
+    """
+    for keyword in ("not", "if", "then", "else"):
+        if keyword in schema:
+            visit(schema[keyword], shape)
+
+    for keyword in ("allOf", "anyOf", "oneOf"):
+        for subschema in schema.get(keyword, []):
+            visit(subschema, shape)
+
+    for subschema in schema.get("dependencies", {}).values():
+        if not isinstance(subschema, list):
+            visit(subschema, shape)
+
+
+def visit_properties(schema: dict, shape: Shape):
+    """
+    Function to record the subschemas of the values of an object's keys.
+    """
+    for key, subschema in schema.get("properties", {}).items():
+        visit(subschema, shape.child(key))
+
+    for subschema in list(schema.get("patternProperties", {}).values()) + [
+            schema.get("additionalProperties", True)]:
+        # Keys that aren't allowed are in the fingerprint already
+        if not isinstance(subschema, bool):
+            shape.other = shape.other or Shape()
+            visit(subschema, shape.other)
+
+
+def analyse(schema) -> Optional[Shape]:
+    """
+    Function to return the shape of what `schema` constrains, or None if it isn't supported.
+    """
+    shape = Shape()
+
+    try:
+        visit(schema, shape)
+    except UnsupportedSchema:
+        return None
+
+    shape.finish()
+
+    return shape
+
+
+def freeze(value):
+    """
+    Function to return a hashable copy of a JSON value that keeps the types of its values.
+    ---
+    `True`, `1` and `1.0` are equal in Python, but not to a schema, so every value is
+    tagged with its type.
+    """
+    kind = type(value)
+
+    if kind is dict:
+        return (dict, frozenset((key, freeze(item)) for key, item in value.items()))
+
+    if kind is list:
+        return (list, tuple(freeze(item) for item in value))
+
+    if kind in TYPES or kind is float:
+        return (kind, value)
+
+    raise Unfingerprintable(kind)
+
+
+def walk(value, shape: Shape):
+    if shape.exact:
+        return freeze(value)
+
+    kind = type(value)
+
+    if kind is dict:
+        if not shape.keys:
+            return dict
+
+        properties, other = shape.properties, shape.other
+
+        if other is None:
+            # Only the values of named keys are constrained, in a fixed order
+            return (dict, frozenset(value), tuple(
+                walk(value[key], child) if key in value else None
+                for key, child in properties.items()))
+
+        return (dict, frozenset(
+            (key, walk(item, properties.get(key, other))) for key, item in value.items()))
+
+    if kind is list:
+        items = frozenset(walk(item, shape.items) for item in value) if shape.items is not None else None
+
+        return (list, len(value) if shape.length else None, items)
+
+    if kind is float:
+        return (float, value.is_integer())
+
+    if kind in TYPES:
+        return kind
+
+    raise Unfingerprintable(kind)
+
+
+def fingerprint(body, shape: Shape):
+    """
+    Function to return the fingerprint of a body for a shape from `analyse`.
+    ---
+    Returns None if the body has values of other types than those decoded from JSON
+    (e.g. a tuple, or a NumPy number returned by a grading function).
+    """
+    try:
+        return walk(body, shape)
+    except (Unfingerprintable, RecursionError):
+        return None
@@ -0,0 +1,83 @@
+"""
+    Builder of the warm-up snapshot loaded by new containers (see `warmup.py`).
+
+    Run when the image is built, with the same Python version as the container:
+        python -m app.tools.snapshot [--output FILE] [--requests FILE]
+
+    `--requests` is an NDJSON file of request bodies (e.g. the answers of a question
+    bank), which are graded before the snapshot is taken, so the providers dump what
+    they computed for them too.
+"""
+import os
+import sys
+import time
+import marshal
+import argparse
+
+from . import codec
+from . import validate as v
+from . import warmup
+from .handler import handler
+
+
+def build_snapshot(path: str = None, requests=()) -> int:
+    """
+    Function to warm up this process, grade `requests`, and write the snapshot.
+    ---
+    Returns the size of the snapshot in bytes. The file is written under a temporary
+    name and renamed, so a container starting meanwhile never reads half of it.
+    """
+    path = path or warmup.snapshot_path()
+
+    warmup.warm_up()
+
+    for body in requests:
+        handler({"body": body})
+
+    checks = {}
+
+    for name in v.SCHEMAS:
+        check = v.get_check(name)
+
+        if check is not None:
+            checks[name] = (check.code, check.entry, check.constants)
+
+    data = marshal.dumps({
+        "header": warmup.header(),
+        "checks": checks,
+        "providers": {name: dump() for name, (dump, _, _) in warmup.providers.items()}
+    })
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+
+    with open(temporary, "wb") as f:
+        f.write(data)
+
+    os.replace(temporary, path)
+
+    return len(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the warm-up snapshot.")
+    parser.add_argument("--output", default=None,
+                        help=f"Snapshot file (default: {warmup.snapshot_path()}).")
+    parser.add_argument("--requests", default=None, help="NDJSON file of request bodies to grade.")
+    args = parser.parse_args(argv)
+
+    requests = []
+
+    if args.requests is not None:
+        with open(args.requests, "rb") as f:
+            requests = [codec.loads(line) for line in f if line.strip()]
+
+    began = time.perf_counter()
+    path = args.output or warmup.snapshot_path()
+    size = build_snapshot(path, requests)
+
+    print(f"Wrote a snapshot of {size} bytes to {path} in {time.perf_counter() - began:.2f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+from typing import Optional
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas")
+CHECKSUM_FILE = "checksums.json"
+
+"""
+    Exceptions raised by the schema store.
+"""
+
+
+class SchemaStoreError(Exception):
+    pass
+
+
+class SchemaIntegrityError(SchemaStoreError):
+    pass
+
+
+"""
+    Schema loading functions.
+"""
+
+
+def env_flag(name: str) -> bool:
+    """
+    Function to read a boolean switch from the environment.
+    ---
+    Anything other than an empty string, "0", "false" or "no" counts as switched on.
+    """
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def load_checksums(schema_dir: str = SCHEMA_DIR) -> dict:
+    """
+    Function to read the expected SHA-256 digest of every bundled schema file.
+    """
+    with open(os.path.join(schema_dir, CHECKSUM_FILE), "r") as f:
+        return json.load(f)
+
+
+def load_local_schema(file_name: str, schema_dir: str = SCHEMA_DIR) -> dict:
+    """
+    Function to load a schema from the files bundled with the image.
+    ---
+    The raw bytes are hashed and compared against `checksums.json` before being
+    decoded, so a truncated or edited schema file is never used silently. A
+    SchemaIntegrityError is raised if the digest doesn't match.
+    """
+    with open(os.path.join(schema_dir, file_name), "rb") as f:
+        raw = f.read()
+
+    expected = load_checksums(schema_dir).get(file_name)
+    actual = hashlib.sha256(raw).hexdigest()
+
+    if expected != actual:
+        raise SchemaIntegrityError(
+            f"Bundled schema '{file_name}' has digest {actual}, expected {expected}.")
+
+    return json.loads(raw)
+
+
+def load_url_schema(uri_env_name: str) -> dict:
+    """
+    Function to load a schema by making a get request to the URL in an environment variable.
+    ---
+    `requests` is only imported here, so containers using the bundled schemas never
+    pay for importing it.
+    """
+    import requests
+
+    schema_uri = os.environ.get(uri_env_name)
+
+    if not schema_uri:
+        raise SchemaStoreError(f"Environment variable '{uri_env_name}' is not set.")
+
+    return requests.get(schema_uri).json()
+
+
+def load_schema(file_name: str, uri_env_name: Optional[str]) -> dict:
+    """
+    Function to load a schema, preferring the copy bundled with the image.
+    ---
+    The source is controlled by two environment variables:
+        - `SCHEMA_SOURCE`: set to "url" to always fetch the schema from the URL in
+            `uri_env_name`, bypassing the bundled files (defaults to "local").
+        - `SCHEMA_URL_FALLBACK`: when switched on, the URL is used if the bundled
+            file is missing or fails its integrity check. Otherwise the error is raised.
+    A schema with no `uri_env_name`, which isn't published at a URL, is always read
+    from its bundled file.
+    """
+    if uri_env_name is not None and os.environ.get("SCHEMA_SOURCE", "local").strip().lower() == "url":
+        return load_url_schema(uri_env_name)
+
+    try:
+        return load_local_schema(file_name)
+    except (OSError, ValueError, SchemaIntegrityError):
+        if uri_env_name is not None and env_flag("SCHEMA_URL_FALLBACK"):
+            return load_url_schema(uri_env_name)
+        raise
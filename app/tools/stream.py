@@ -0,0 +1,151 @@
+"""
+    Streaming grader for newline-delimited JSON (NDJSON).
+
+    Each line of the input is a request body, as it would be sent to `handler()` with
+    the `grade` command. Every line gets one line of output: the response of
+    `handler()` with the number of the input line added under `line`. Blank lines are
+    skipped.
+
+    Lines are read in chunks and graded by a pool of worker processes. At most
+    `--in-flight` chunks are being graded at any time, so memory use stays the same
+    however large the input is. Results are written in input order, or as soon as
+    they are ready with `--unordered`, which keeps every worker busy when some
+    requests take much longer than others.
+
+    Usage (from the repository root):
+        python -m app.tools.stream [FILE] [--workers N] [--chunk-size N]
+                                   [--in-flight N] [--unordered]
+
+    The requests are read from FILE, or from stdin if it is missing or "-".
+"""
+import os
+import sys
+import time
+import argparse
+import itertools
+import collections
+import multiprocessing
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import codec
+from .handler import handler
+
+
+def grade_lines(lines) -> bytes:
+    """
+    Function run in a worker process to grade a chunk of numbered input lines.
+    ---
+    Returns the NDJSON output for the chunk, so the parent only has to write it.
+    """
+    output = []
+
+    for (number, line) in lines:
+        event = {
+            "headers": {"command": "grade"},
+            "body": line.decode("utf-8", errors="replace")
+        }
+
+        output.append(codec.dumps({"line": number, **handler(event)}))
+
+    output.append(b"")
+
+    return b"\n".join(output)
+
+
+def read_chunks(stream, chunk_size):
+    """
+    Function to lazily split a binary stream into chunks of numbered, non-blank lines.
+    """
+    lines = ((number, line) for (number, line) in enumerate(stream, start=1) if line.strip())
+
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def write_results(pending, sink, ordered, keep=0):
+    """
+    Function to write the results of `pending` chunks to `sink` until at most `keep` are left.
+    ---
+    In order, `pending` is a deque and the oldest chunk is waited for first.
+    Otherwise, it is a set, and the chunks that finish first are written first.
+    """
+    while len(pending) > keep:
+        if ordered:
+            sink.write(pending.popleft().result())
+            continue
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            pending.remove(future)
+            sink.write(future.result())
+
+
+def grade_stream(source, sink, workers=None, chunk_size=64, in_flight=None, ordered=True) -> int:
+    """
+    Function to grade every request in the binary stream `source` and write the
+    results to the binary stream `sink`.
+    ---
+    At most `in_flight` chunks (four per worker by default) are submitted to the pool
+    at once. Returns the number of requests graded.
+    """
+    workers = workers or os.cpu_count()
+    in_flight = in_flight or 4 * workers
+    graded = 0
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"))
+
+    with executor:
+        pending = collections.deque() if ordered else set()
+        add = pending.append if ordered else pending.add
+
+        for chunk in read_chunks(source, chunk_size):
+            write_results(pending, sink, ordered, keep=in_flight - 1)
+            add(executor.submit(grade_lines, chunk))
+            graded += len(chunk)
+
+        write_results(pending, sink, ordered)
+
+    sink.flush()
+
+    return graded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].strip())
+    parser.add_argument("file", nargs="?", default="-")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("STREAM_WORKERS", 0)))
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--in-flight", type=int, default=0)
+    parser.add_argument("--unordered", action="store_true")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+    start = time.perf_counter()
+
+    try:
+        graded = grade_stream(
+            source, sys.stdout.buffer,
+            workers=args.workers or None,
+            chunk_size=max(1, args.chunk_size),
+            in_flight=args.in_flight or None,
+            ordered=not args.unordered)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Graded {graded} requests in {elapsed:.2f}s "
+          f"({graded / elapsed if elapsed else 0:.0f}/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
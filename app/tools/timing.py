@@ -0,0 +1,183 @@
+"""
+    Per-stage latency instrumentation for the handler.
+
+    While a request is being handled, `stage(name)` measures a block of code with
+    `time.perf_counter_ns` and adds it to the request's timer. Timing is switched on
+    for every request with `enable()` or the `HANDLER_TIMINGS` environment variable,
+    and for a single request by sending a `debug` header containing "timings", in
+    which case the timings are also returned in the response.
+
+    The same stages are used to measure memory when that is on for a request (see
+    `memory`), in which case the request's timer carries its memory tracker.
+
+    When timing and memory measurement are off, `stage` returns a shared no-op
+    context manager, so each measured stage costs one context variable lookup.
+"""
+import sys
+import json
+import time
+import contextvars
+
+from . import memory
+from .store import env_flag
+
+_enabled = env_flag("HANDLER_TIMINGS")
+_current = contextvars.ContextVar("timer", default=None)
+_logger = None
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+"""
+    Timers.
+"""
+
+
+class Timer:
+    """
+    Class used to collect the time spent in each stage of one request, in nanoseconds.
+    ---
+    A stage measured more than once, e.g. grading every item of a batch, accumulates.
+    `timed` is False when the timer only carries the `memory` tracker of a request.
+    """
+    __slots__ = ("stages", "start_ns", "attach", "timed", "memory")
+
+    def __init__(self, attach=False, timed=True, memory=None):
+        self.stages = {}
+        self.attach = attach
+        self.timed = timed
+        self.memory = memory
+        self.start_ns = time.perf_counter_ns()
+
+    def add(self, name, elapsed_ns):
+        self.stages[name] = self.stages.get(name, 0) + elapsed_ns
+
+    def result(self) -> dict:
+        result = dict(self.stages)
+        result["total"] = time.perf_counter_ns() - self.start_ns
+
+        return result
+
+
+class Stage:
+    __slots__ = ("timer", "name", "start_ns")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        if self.timer.memory is not None:
+            self.timer.memory.enter()
+
+        self.start_ns = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info):
+        self.timer.add(self.name, time.perf_counter_ns() - self.start_ns)
+
+        if self.timer.memory is not None:
+            self.timer.memory.exit(self.name)
+
+
+class NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+def stage(name):
+    """
+    Function to return a context manager measuring a stage of the current request.
+    """
+    timer = _current.get()
+
+    return NULL_STAGE if timer is None else Stage(timer, name)
+
+
+"""
+    Request lifecycle.
+"""
+
+
+def start(headers) -> Timer:
+    """
+    Function to start timing a request, returning None if timing and memory are off for it.
+    """
+    debug = "timings" in str(headers.get("debug", "")).lower()
+    tracker = memory.start(headers)
+
+    if _enabled or debug or tracker is not None:
+        timer = Timer(attach=debug, timed=_enabled or debug, memory=tracker)
+    else:
+        timer = None
+
+    _current.set(timer)
+
+    return timer
+
+
+def finish(timer, command, response) -> dict:
+    """
+    Function to stop timing a request, log its timings and return the response.
+    ---
+    The timings are added to the response under `timings` if they were requested
+    with the `debug` header, and likewise its memory use under `memory`.
+    """
+    if timer is None:
+        return response
+
+    _current.set(None)
+
+    if timer.timed:
+        timings = timer.result()
+        log({"event": "timings", "command": command, "unit": "ns", "timings": timings})
+
+        if timer.attach:
+            response["timings"] = timings
+
+    if timer.memory is not None:
+        usage = memory.finish(timer.memory, command)
+
+        if timer.memory.attach:
+            response["memory"] = usage
+
+    return response
+
+
+def log(record):
+    """
+    Function to write a record to stdout as one JSON line.
+    ---
+    logging is only imported the first time a record is written.
+    """
+    global _logger
+
+    if _logger is None:
+        import logging
+
+        logger = logging.getLogger(__name__)
+
+        if not logger.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+        _logger = logger
+
+    _logger.info(json.dumps(record))
@@ -1,34 +1,105 @@
-import os
-import requests
-import jsonschema
+import functools
 
-def load_validator_from_url(uri_env_name):
+from . import store
+from .cache import LRUCache, env_number, register
+from .compiler import compile_schema
+from .shapes import analyse, fingerprint
+
+# Schemas known to the validator, with their bundled file and URL environment variable.
+# The batch schemas are only bundled, so they are read from their files even with
+# SCHEMA_SOURCE=url: the upstream response schema only knows `grade` and `healthcheck`.
+SCHEMAS = {
+    "request": ("request.json", "REQUEST_SCHEMA_URL"),
+    "response": ("response.json", "RESPONSE_SCHEMA_URL"),
+    "batch": ("batch.json", None),
+    "batch_response": ("batch_response.json", None),
+}
+
+"""
+    Schemas, validators and compiled checks, each created on first use.
+"""
+
+@functools.lru_cache(maxsize=None)
+def get_schema(name):
+    return store.load_schema(*SCHEMAS[name])
+
+@functools.lru_cache(maxsize=None)
+def get_validator(name):
     """
-    Function to create a validator by pulling the schema from a url.
+    Function to return the jsonschema validator for one of the SCHEMAS.
     ---
-    This function makes a get request to the URL and converts the body to a JSON schema.
-    This is then loaded into jsonschema validator and returned.
+    jsonschema is only imported here, so a container that only sees valid bodies
+    never imports it.
     """
-    schema_uri = os.environ.get(uri_env_name)
-    schema = requests.get(schema_uri).json()
+    import jsonschema
 
-    return jsonschema.Draft7Validator(schema)
+    return jsonschema.Draft7Validator(get_schema(name))
 
-request_validator = load_validator_from_url("REQUEST_SCHEMA_URL")
-response_validator = load_validator_from_url("RESPONSE_SCHEMA_URL")
+# Compiled checks loaded from the warm-up snapshot (see `warmup`), used before compiling
+preloaded_checks = {}
 
-#with open('/Users/louismanestar/OneDrive - Imperial College London/Jobs/Lambda Feedback/repos/lambda-feedback/request-response-schemas/request.json', 'r') as f:
-#    request_schema = json.load(f)
-#    request_validator = jsonschema.Draft7Validator(request_schema)
+@functools.lru_cache(maxsize=None)
+def get_check(name):
+    """
+    Function to return the compiled fast path for one of the SCHEMAS.
+    ---
+    Returns None if the schema uses keywords the compiler doesn't support.
+    """
+    if name in preloaded_checks:
+        return preloaded_checks[name]
 
-#with open('/Users/louismanestar/OneDrive - Imperial College London/Jobs/Lambda Feedback/repos/lambda-feedback/request-response-schemas/response.json', 'r') as f:
-#    response_schema = json.load(f)
-#    response_validator = jsonschema.Draft7Validator(response_schema)
+    return compile_schema(get_schema(name))
+
+@functools.lru_cache(maxsize=None)
+def get_shape(name):
+    """
+    Function to return what one of the SCHEMAS constrains, for fingerprinting bodies.
+    ---
+    Returns None if the schema uses keywords the fingerprints don't support.
+    """
+    return analyse(get_schema(name))
+
+# Fingerprints of the bodies that were valid, for schemas without a compiled check (see `shapes`).
+# The bundled schemas all compile, so this is for those fetched with SCHEMA_SOURCE=url.
+shape_cache = register("validation_shapes", LRUCache(maxsize=env_number("SHAPE_CACHE_SIZE", 1024)))
+
+# Set to validate every body in full, e.g. while testing a schema change
+strict = store.env_flag("VALIDATION_STRICT")
+
+def strict_mode(on: bool = True):
+    global strict
+    strict = on
+
+def __getattr__(attribute):
+    """
+    Function to create `request_validator`, `response_check`, etc. when first accessed.
+    """
+    name, _, kind = attribute.rpartition("_")
+
+    if name in SCHEMAS and kind == "validator":
+        return get_validator(name)
+
+    if name in SCHEMAS and kind == "check":
+        return get_check(name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {attribute!r}")
+
+def validate(validator, body, check=None):
+    """
+    Function to return the first error in the body, or None if it is valid.
+    ---
+    If a compiled `check` is given and accepts the body, the full validator is
+    skipped. Otherwise the body is validated by jsonschema, so the reported message
+    and paths are always the ones jsonschema produces.
+    """
+    if check is not None and check(body):
+        return None
+
+    from jsonschema.exceptions import ValidationError
 
-def validate(validator, body):
     try:
         validator.validate(body)
-    except jsonschema.exceptions.ValidationError as e:
+    except ValidationError as e:
         
         return {
             "message": e.message,
@@ -38,6 +109,36 @@ def validate(validator, body):
     
     return None
 
+def validate_schema(name, body):
+    """
+    Function to validate the body against one of the SCHEMAS by name.
+    ---
+    The jsonschema validator is only created if the compiled check rejects the body.
+    For a schema the compiler doesn't support, a body with the same shape fingerprint
+    as one that was valid before is accepted without validating it, unless `strict`
+    is set.
+    """
+    check = get_check(name)
+
+    if check is not None:
+        if check(body):
+            return None
+
+        return validate(get_validator(name), body)
+
+    shape = None if strict else get_shape(name)
+    key = None if shape is None else (name, fingerprint(body, shape))
+
+    if key is not None and key[1] is not None and shape_cache.get(key):
+        return None
+
+    error = validate(get_validator(name), body)
+
+    if error is None and key is not None and key[1] is not None:
+        shape_cache.put(key, True)
+
+    return error
+
 def validate_request(body):
     """    
     Function to return any errors in the request body based on its schema.
@@ -47,7 +148,7 @@ def validate_request(body):
     element in the list of errors is a dictionary containing the error message and the
     path to the rule in the schema that has thrown the error.
     """
-    request_error = validate(request_validator, body)
+    request_error = validate_schema("request", body)
 
     if request_error:
         return {
@@ -57,6 +158,24 @@ def validate_request(body):
 
     return None
 
+def validate_batch(body):
+    """
+    Function to return any errors in the body of a batch request based on its schema.
+    ---
+    Only the envelope is checked here: the list of items and the shared answer and
+    params. Each item is validated separately with `validate_request`, so one bad item
+    doesn't fail the whole batch.
+    """
+    batch_error = validate_schema("batch", body)
+
+    if batch_error:
+        return {
+            "message": "Schema threw an error when validating the batch request body.",
+            "error_thrown": batch_error
+        }
+
+    return None
+
 def validate_response(body):
     """    
     Function to return any errors in the response body based on its schema.
@@ -66,7 +185,25 @@ def validate_response(body):
     element in the list of errors is a dictionary containing the error message and the
     path to the rule in the schema that has thrown the error.
     """
-    response_error = validate(response_validator, body)
+    response_error = validate_schema("response", body)
+
+    if response_error:
+        return {
+            "message": "Schema threw an error when validating the response body.",
+            "error_thrown": response_error
+        }
+
+    return None
+
+def validate_batch_response(body):
+    """
+    Function to return any errors in the response body of a batch request.
+    ---
+    A `grade_batch` response is validated against the bundled `batch_response.json` in
+    every mode, as the response schema from `RESPONSE_SCHEMA_URL` doesn't allow it. The
+    result of each item has already been validated with `validate_response`.
+    """
+    response_error = validate_schema("batch_response", body)
 
     if response_error:
         return {
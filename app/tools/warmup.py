@@ -0,0 +1,137 @@
+"""
+    Warm-up of new containers, and the snapshot that speeds it up.
+
+    A cold container loads and compiles the schemas, and the grading function sets
+    itself up on its first request (e.g. importing SymPy and rendering its first
+    expressions). Most of this gives the same result in every container, so it can be
+    done once when the image is built and saved to a snapshot file, with
+    `python -m app.tools.snapshot` (see `snapshot.py`).
+
+    The snapshot has the compiled schema checks, and the data dumped by every provider
+    registered with `register_snapshot` (e.g. the previews of common expressions from
+    `symbolic/render.py`). It is written with `marshal`, which loads in about a
+    millisecond, and is only used by the same Python version with the same bundled
+    schemas.
+
+    When the handler is imported, `start` reads the `WARMUP` environment variable:
+        - "snapshot" (the default): load the snapshot file, if there is one.
+        - "full": also build the validators and run the providers' warm-up. This is
+            for Lambda SnapStart or provisioned concurrency, where init doesn't delay
+            the first request.
+        - "off": do neither.
+    The snapshot file is `snapshot.bin` in the package, or `SNAPSHOT_FILE` if it is set.
+"""
+import os
+import sys
+import time
+import marshal
+
+from . import store
+from . import validate as v
+from .compiler import load_check
+
+FORMAT = 1
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshot.bin")
+
+# Providers of data to keep in the snapshot, by name: (dump, load, warm)
+providers = {}
+
+status = {"loaded": False}
+
+
+def register_snapshot(name: str, dump, load, warm=None):
+    """
+    Function to keep data in the snapshot.
+    ---
+    `dump()` returns the data, which `marshal` must be able to write, when the
+    snapshot is built, and `load(data)` is given it back when the snapshot is loaded.
+    `warm()`, if given, is called to warm up a container, before `dump` when building.
+    """
+    providers[name] = (dump, load, warm)
+
+
+def snapshot_path() -> str:
+    return os.environ.get("SNAPSHOT_FILE", "").strip() or DEFAULT_PATH
+
+
+def header() -> dict:
+    """
+    Function to return what a snapshot must have been built with to be used here.
+    """
+    return {"format": FORMAT, "python": sys.version, "checksums": store.load_checksums()}
+
+
+def warm_up():
+    """
+    Function to build the checks and validators of every schema, and warm up the providers.
+    """
+    for name in v.SCHEMAS:
+        v.get_check(name)
+        v.get_validator(name)
+
+    for (_, _, warm) in providers.values():
+        if warm is not None:
+            warm()
+
+
+def load_snapshot(path: str = None) -> bool:
+    """
+    Function to load the snapshot, if there is a usable one.
+    ---
+    Returns whether it was loaded. The compiled checks are only used with the bundled
+    schemas, as those are what they were compiled from.
+    """
+    path = path or snapshot_path()
+    start = time.perf_counter()
+
+    try:
+        with open(path, "rb") as f:
+            snapshot = marshal.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        status.update(loaded=False, path=path, error=f"Unreadable snapshot: {e}")
+        return False
+
+    if not isinstance(snapshot, dict) or snapshot.get("header") != header():
+        status.update(loaded=False, path=path, error="Snapshot built for another version.")
+        return False
+
+    if os.environ.get("SCHEMA_SOURCE", "local").strip().lower() != "url":
+        for name, (code, entry, constants) in snapshot["checks"].items():
+            v.preloaded_checks[name] = load_check(code, entry, constants)
+
+    for name, data in snapshot["providers"].items():
+        if name in providers:
+            providers[name][1](data)
+
+    status.clear()
+    status.update(
+        loaded=True, path=path,
+        checks=sorted(v.preloaded_checks),
+        providers={name: len(data) for name, data in snapshot["providers"].items()},
+        load_ms=round(1000 * (time.perf_counter() - start), 3))
+
+    return True
+
+
+def start():
+    """
+    Function to warm up a new container as the `WARMUP` environment variable says.
+    """
+    mode = os.environ.get("WARMUP", "snapshot").strip().lower()
+
+    if mode in ("off", "0", "false", "no"):
+        return
+
+    load_snapshot()
+
+    if mode == "full":
+        warm_start = time.perf_counter()
+        warm_up()
+        status["warm_up_ms"] = round(1000 * (time.perf_counter() - warm_start), 3)
+
+
+def stats() -> dict:
+    return dict(status)